@@ -0,0 +1,23 @@
+"""Add items (created_at, id) index for keyset pagination
+
+Revision ID: 3f1c9a7d2e41
+Revises: b020a082a7ae
+Create Date: 2026-10-17 09:12:03.114207
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c9a7d2e41'
+down_revision = 'b020a082a7ae'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_items_created_at_id', 'items', ['created_at', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_items_created_at_id', table_name='items')
@@ -0,0 +1,46 @@
+"""Add materialized item rating stats
+
+Revision ID: 8a2d4e6b1c90
+Revises: 3f1c9a7d2e41
+Create Date: 2026-10-17 10:02:45.518330
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8a2d4e6b1c90'
+down_revision = '3f1c9a7d2e41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('item_rating_stats',
+    sa.Column('item_id', sa.Integer(), nullable=False),
+    sa.Column('rating_sum', sa.Float(), nullable=False),
+    sa.Column('rating_count', sa.Integer(), nullable=False),
+    sa.Column('rating_min', sa.Float(), nullable=True),
+    sa.Column('rating_max', sa.Float(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['item_id'], ['items.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('item_id')
+    )
+    # Backfill from the existing ratings
+    op.execute("""
+        INSERT INTO item_rating_stats (item_id, rating_sum, rating_count, rating_min, rating_max, updated_at)
+        SELECT items.id,
+               COALESCE(SUM(ratings.value), 0),
+               COUNT(ratings.id),
+               MIN(ratings.value),
+               MAX(ratings.value),
+               CURRENT_TIMESTAMP
+        FROM items
+        LEFT OUTER JOIN ratings ON ratings.item_id = items.id
+        GROUP BY items.id
+    """)
+
+
+def downgrade():
+    op.drop_table('item_rating_stats')
@@ -0,0 +1,29 @@
+"""Add the catalog write counters
+
+Revision ID: a4f8c2d6e193
+Revises: f1d6b9e3c582
+Create Date: 2026-10-17 22:14:05.203614
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4f8c2d6e193'
+down_revision = 'f1d6b9e3c582'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('catalog_versions',
+    sa.Column('name', sa.String(length=32), nullable=False),
+    sa.Column('version', sa.Integer(), server_default='0', nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    # No backfill : a missing counter reads as 0, the first write creates it
+
+
+def downgrade():
+    op.drop_table('catalog_versions')
@@ -0,0 +1,29 @@
+"""Add the ratings and users indexes of the hot queries
+
+Revision ID: b7d4f0c2e935
+Revises: a6c2e9f4b811
+Create Date: 2026-10-17 17:03:52.114906
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d4f0c2e935'
+down_revision = 'a6c2e9f4b811'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_ratings_item_id_created_at', 'ratings', ['item_id', 'created_at'], unique=False)
+    op.create_index('ix_ratings_user_id_created_at', 'ratings', ['user_id', 'created_at'], unique=False)
+    op.create_index('ix_ratings_created_at', 'ratings', ['created_at'], unique=False)
+    op.create_index('ix_users_created_at', 'users', ['created_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_users_created_at', table_name='users')
+    op.drop_index('ix_ratings_created_at', table_name='ratings')
+    op.drop_index('ix_ratings_user_id_created_at', table_name='ratings')
+    op.drop_index('ix_ratings_item_id_created_at', table_name='ratings')
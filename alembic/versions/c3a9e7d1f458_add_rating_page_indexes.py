@@ -0,0 +1,36 @@
+"""Serve the rating page filters from the ratings indexes
+
+Revision ID: c3a9e7d1f458
+Revises: b7d4f0c2e935
+Create Date: 2026-10-17 17:48:20.672391
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3a9e7d1f458'
+down_revision = 'b7d4f0c2e935'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The value joins the item and user indexes, for min_value / max_value
+    op.drop_index('ix_ratings_item_id_created_at', table_name='ratings')
+    op.create_index('ix_ratings_item_id_created_at', 'ratings', ['item_id', 'created_at', 'value'], unique=False)
+    op.drop_index('ix_ratings_user_id_created_at', table_name='ratings')
+    op.create_index('ix_ratings_user_id_created_at', 'ratings', ['user_id', 'created_at', 'value'], unique=False)
+    op.create_index(
+        'ix_ratings_item_id_commented', 'ratings', ['item_id', 'created_at'], unique=False,
+        sqlite_where=sa.text('comment IS NOT NULL'), postgresql_where=sa.text('comment IS NOT NULL')
+    )
+
+
+def downgrade():
+    op.drop_index('ix_ratings_item_id_commented', table_name='ratings')
+    op.drop_index('ix_ratings_user_id_created_at', table_name='ratings')
+    op.create_index('ix_ratings_user_id_created_at', 'ratings', ['user_id', 'created_at'], unique=False)
+    op.drop_index('ix_ratings_item_id_created_at', table_name='ratings')
+    op.create_index('ix_ratings_item_id_created_at', 'ratings', ['item_id', 'created_at'], unique=False)
@@ -0,0 +1,34 @@
+"""Add version markers used by conditional GETs
+
+Revision ID: c4e7f1a9b352
+Revises: 8a2d4e6b1c90
+Create Date: 2026-10-17 11:20:13.402118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4e7f1a9b352'
+down_revision = '8a2d4e6b1c90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('items') as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+    with op.batch_alter_table('item_rating_stats') as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), nullable=False, server_default='0'))
+    op.create_index('ix_items_updated_at', 'items', ['updated_at'], unique=False)
+    op.create_index('ix_item_rating_stats_updated_at', 'item_rating_stats', ['updated_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_item_rating_stats_updated_at', table_name='item_rating_stats')
+    op.drop_index('ix_items_updated_at', table_name='items')
+    with op.batch_alter_table('item_rating_stats') as batch_op:
+        batch_op.drop_column('version')
+    with op.batch_alter_table('items') as batch_op:
+        batch_op.drop_column('version')
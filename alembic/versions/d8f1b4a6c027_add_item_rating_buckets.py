@@ -0,0 +1,56 @@
+"""Add per-item rating histograms
+
+Revision ID: d8f1b4a6c027
+Revises: c3a9e7d1f458
+Create Date: 2026-10-17 19:24:51.302118
+
+"""
+import math
+from collections import Counter
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8f1b4a6c027'
+down_revision = 'c3a9e7d1f458'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('item_rating_buckets',
+    sa.Column('item_id', sa.Integer(), nullable=False),
+    sa.Column('bucket', sa.SmallInteger(), autoincrement=False, nullable=False),
+    sa.Column('rating_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['item_id'], ['items.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('item_id', 'bucket')
+    )
+    with op.batch_alter_table('item_rating_stats') as batch_op:
+        batch_op.add_column(sa.Column('last_rated_at', sa.DateTime(), nullable=True))
+
+    # Backfill from the existing ratings
+    op.execute("""
+        UPDATE item_rating_stats
+        SET last_rated_at = (SELECT MAX(ratings.updated_at) FROM ratings WHERE ratings.item_id = item_rating_stats.item_id)
+    """)
+    # Grouped by value in SQL, bucketed here like item_rating_bucket.bucket_of :
+    # one bucket per half star from 0 to 5, FLOOR and integer casts differ between databases
+    connection = op.get_bind()
+    counts = Counter()
+    for item_id, value, count in connection.execute(
+        sa.text("SELECT item_id, value, COUNT(*) FROM ratings GROUP BY item_id, value")
+    ):
+        counts[item_id, min(max(math.floor(value * 2), 0), 10)] += count
+    if counts:
+        buckets = sa.table('item_rating_buckets', sa.column('item_id'), sa.column('bucket'), sa.column('rating_count'))
+        connection.execute(buckets.insert(), [
+            {"item_id": item_id, "bucket": bucket, "rating_count": count}
+            for (item_id, bucket), count in counts.items()
+        ])
+
+
+def downgrade():
+    with op.batch_alter_table('item_rating_stats') as batch_op:
+        batch_op.drop_column('last_rated_at')
+    op.drop_table('item_rating_buckets')
@@ -0,0 +1,55 @@
+"""Add the item full-text search index
+
+Revision ID: d91b3e5f7a20
+Revises: c4e7f1a9b352
+Create Date: 2026-10-17 12:05:41.118207
+
+"""
+from alembic import op
+
+# The DDL of app.domain.item_search at this revision
+SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5("
+    "name, description, content='items', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS items_fts_ai AFTER INSERT ON items BEGIN "
+    "INSERT INTO items_fts(rowid, name, description) VALUES (new.id, new.name, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS items_fts_ad AFTER DELETE ON items BEGIN "
+    "INSERT INTO items_fts(items_fts, rowid, name, description) VALUES ('delete', old.id, old.name, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS items_fts_au AFTER UPDATE OF name, description ON items BEGIN "
+    "INSERT INTO items_fts(items_fts, rowid, name, description) VALUES ('delete', old.id, old.name, old.description); "
+    "INSERT INTO items_fts(rowid, name, description) VALUES (new.id, new.name, new.description); END",
+]
+
+POSTGRESQL_DDL = [
+    "CREATE INDEX IF NOT EXISTS ix_items_search ON items USING gin "
+    "(to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(description, '')))",
+]
+
+
+# revision identifiers, used by Alembic.
+revision = 'd91b3e5f7a20'
+down_revision = 'c4e7f1a9b352'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        for statement in SQLITE_DDL:
+            op.execute(statement)
+        # Index the existing items
+        op.execute("INSERT INTO items_fts(items_fts) VALUES ('rebuild')")
+    elif dialect == 'postgresql':
+        for statement in POSTGRESQL_DDL:
+            op.execute(statement)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        for trigger in ('items_fts_ai', 'items_fts_ad', 'items_fts_au'):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS items_fts")
+    elif dialect == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_items_search")
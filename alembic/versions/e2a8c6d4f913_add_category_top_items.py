@@ -0,0 +1,66 @@
+"""Add precomputed per-category leaderboards
+
+Revision ID: e2a8c6d4f913
+Revises: d91b3e5f7a20
+Create Date: 2026-10-17 13:12:09.640551
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# Leaderboard prior when this revision was written : later changes to app.config must not alter it
+PRIOR_WEIGHT = 10.0
+PRIOR_MEAN = 3.0
+LEADERBOARD_SIZE = 100
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2a8c6d4f913'
+down_revision = 'd91b3e5f7a20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('category_top_items',
+    sa.Column('category_id', sa.Integer(), nullable=False),
+    sa.Column('item_id', sa.Integer(), nullable=False),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.Column('rating_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['item_id'], ['items.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('category_id', 'item_id')
+    )
+    op.create_index('ix_category_top_items_rank', 'category_top_items', ['category_id', 'score', 'item_id'], unique=False)
+
+    # Backfill from the item rating stats with the configured prior, ranked like
+    # LeaderboardRepository (category 0 : every item)
+    op.get_bind().execute(
+        sa.text("""
+            INSERT INTO category_top_items (category_id, item_id, score, rating_count)
+            SELECT category_id, item_id, score, rating_count FROM (
+                SELECT boards.category_id, stats.item_id, stats.rating_count,
+                       (:weight * :mean + stats.rating_sum) / (:weight + stats.rating_count) AS score,
+                       ROW_NUMBER() OVER (
+                           PARTITION BY boards.category_id
+                           ORDER BY (:weight * :mean + stats.rating_sum) / (:weight + stats.rating_count) DESC, stats.item_id
+                       ) AS position
+                FROM item_rating_stats AS stats
+                JOIN (
+                    SELECT 0 AS category_id, id AS item_id FROM items
+                    UNION ALL SELECT category_id, item_id FROM item_category
+                ) AS boards ON boards.item_id = stats.item_id
+                WHERE stats.rating_count > 0
+            ) AS ranked
+            WHERE position <= :size
+        """),
+        {
+            "weight": PRIOR_WEIGHT,
+            "mean": PRIOR_MEAN,
+            "size": LEADERBOARD_SIZE,
+        }
+    )
+
+
+def downgrade():
+    op.drop_index('ix_category_top_items_rank', table_name='category_top_items')
+    op.drop_table('category_top_items')
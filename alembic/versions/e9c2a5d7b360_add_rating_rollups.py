@@ -0,0 +1,58 @@
+"""Add hourly and daily rating rollups
+
+Revision ID: e9c2a5d7b360
+Revises: d8f1b4a6c027
+Create Date: 2026-10-17 20:41:07.815264
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e9c2a5d7b360'
+down_revision = 'd8f1b4a6c027'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('rating_rollups',
+    sa.Column('granularity', sa.String(length=8), nullable=False),
+    sa.Column('period_start', sa.DateTime(), nullable=False),
+    sa.Column('item_id', sa.Integer(), nullable=False),
+    sa.Column('bucket', sa.SmallInteger(), autoincrement=False, nullable=False),
+    sa.Column('rating_count', sa.Integer(), nullable=False),
+    sa.Column('rating_sum', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['item_id'], ['items.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('granularity', 'period_start', 'item_id', 'bucket')
+    )
+    op.create_table('user_rating_rollups',
+    sa.Column('granularity', sa.String(length=8), nullable=False),
+    sa.Column('period_start', sa.DateTime(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('rating_count', sa.Integer(), nullable=False),
+    sa.Column('last_rated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('granularity', 'period_start', 'user_id')
+    )
+    op.create_table('rollup_watermarks',
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('watermark', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.create_table('rollup_dirty_hours',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('period_start', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_ratings_updated_at', 'ratings', ['updated_at'], unique=False)
+    # No backfill : without a watermark, the first run of the rollup job rolls up every rating
+
+
+def downgrade():
+    op.drop_index('ix_ratings_updated_at', table_name='ratings')
+    op.drop_table('rollup_dirty_hours')
+    op.drop_table('rollup_watermarks')
+    op.drop_table('user_rating_rollups')
+    op.drop_table('rating_rollups')
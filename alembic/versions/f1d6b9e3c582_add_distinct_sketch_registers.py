@@ -0,0 +1,33 @@
+"""Add the daily distinct count sketches
+
+Revision ID: f1d6b9e3c582
+Revises: e9c2a5d7b360
+Create Date: 2026-10-17 21:36:52.417903
+
+The sketches of the existing ratings are not backfilled here : run
+python -m app.manage rebuild-distinct-counts after the upgrade.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1d6b9e3c582'
+down_revision = 'e9c2a5d7b360'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('distinct_sketch_registers',
+    sa.Column('metric', sa.String(length=32), nullable=False),
+    sa.Column('scope_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('register', sa.SmallInteger(), autoincrement=False, nullable=False),
+    sa.Column('rank', sa.SmallInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('metric', 'scope_id', 'day', 'register')
+    )
+
+
+def downgrade():
+    op.drop_table('distinct_sketch_registers')
@@ -0,0 +1,79 @@
+"""Add a unique (user_id, item_id) index on ratings
+
+Revision ID: f5b3d8e1a726
+Revises: e2a8c6d4f913
+Create Date: 2026-10-17 15:02:41.218734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# Leaderboard prior when this revision was written : later changes to app.config must not alter it
+PRIOR_WEIGHT = 10.0
+PRIOR_MEAN = 3.0
+LEADERBOARD_SIZE = 100
+
+
+# revision identifiers, used by Alembic.
+revision = 'f5b3d8e1a726'
+down_revision = 'e2a8c6d4f913'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Duplicates let through by concurrent submits : keep the latest rating of each pair
+    connection = op.get_bind()
+    duplicates = "SELECT id FROM ratings WHERE id NOT IN (SELECT MAX(id) FROM ratings GROUP BY user_id, item_id)"
+    item_ids = list(connection.scalars(sa.text(
+        f"SELECT DISTINCT item_id FROM ratings WHERE id IN ({duplicates})"
+    )))
+    if item_ids:
+        # Self-contained SQL : the app repositories expect columns added by later migrations
+        connection.execute(sa.text(f"DELETE FROM ratings WHERE id IN ({duplicates})"))
+        connection.execute(
+            sa.text("""
+                UPDATE item_rating_stats
+                SET rating_sum = COALESCE((SELECT SUM(value) FROM ratings WHERE ratings.item_id = item_rating_stats.item_id), 0),
+                    rating_count = (SELECT COUNT(*) FROM ratings WHERE ratings.item_id = item_rating_stats.item_id),
+                    rating_min = (SELECT MIN(value) FROM ratings WHERE ratings.item_id = item_rating_stats.item_id),
+                    rating_max = (SELECT MAX(value) FROM ratings WHERE ratings.item_id = item_rating_stats.item_id),
+                    updated_at = CURRENT_TIMESTAMP,
+                    version = version + 1
+                WHERE item_id IN :item_ids
+            """).bindparams(sa.bindparam("item_ids", expanding=True)),
+            {"item_ids": item_ids}
+        )
+        # Every leaderboard again, ranked like LeaderboardRepository (category 0 : every item)
+        op.execute("DELETE FROM category_top_items")
+        connection.execute(
+            sa.text("""
+                INSERT INTO category_top_items (category_id, item_id, score, rating_count)
+                SELECT category_id, item_id, score, rating_count FROM (
+                    SELECT boards.category_id, stats.item_id, stats.rating_count,
+                           (:weight * :mean + stats.rating_sum) / (:weight + stats.rating_count) AS score,
+                           ROW_NUMBER() OVER (
+                               PARTITION BY boards.category_id
+                               ORDER BY (:weight * :mean + stats.rating_sum) / (:weight + stats.rating_count) DESC, stats.item_id
+                           ) AS position
+                    FROM item_rating_stats AS stats
+                    JOIN (
+                        SELECT 0 AS category_id, id AS item_id FROM items
+                        UNION ALL SELECT category_id, item_id FROM item_category
+                    ) AS boards ON boards.item_id = stats.item_id
+                    WHERE stats.rating_count > 0
+                ) AS ranked
+                WHERE position <= :size
+            """),
+            {
+                "weight": PRIOR_WEIGHT,
+                "mean": PRIOR_MEAN,
+                "size": LEADERBOARD_SIZE,
+            }
+        )
+
+    op.create_index('uq_ratings_user_item', 'ratings', ['user_id', 'item_id'], unique=True)
+
+
+def downgrade():
+    op.drop_index('uq_ratings_user_item', table_name='ratings')
@@ -0,0 +1,68 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Optional
+from fastapi import Request
+from starlette.responses import Response
+
+
+def make_etag(*parts: Any) -> str:
+    """
+    Strong validator built from cheap version markers, never from the body
+
+    Responses are serialized deterministically, so equal markers mean byte
+    identical bodies.
+    """
+    digest = hashlib.sha1("|".join(map(str, parts)).encode(), usedforsecurity=False).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def _as_utc(value: datetime) -> datetime:
+    # Timestamps are stored naive in UTC
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).replace(microsecond=0)
+
+
+def latest(*values: Optional[datetime]) -> Optional[datetime]:
+    values = [_as_utc(v) for v in values if v is not None]
+    return max(values) if values else None
+
+
+def validator_headers(etag: str, last_modified: Optional[datetime] = None) -> dict:
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(_as_utc(last_modified), usegmt=True)
+    return headers
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison (RFC 9110 13.1.2)
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in header.split(","))
+
+
+def not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> Optional[Response]:
+    """
+    Return a 304 response if the client copy is still fresh, None otherwise
+
+    If-None-Match takes precedence over If-Modified-Since, as required by RFC 9110.
+    """
+    headers = validator_headers(etag, last_modified)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return Response(status_code=304, headers=headers) if _etag_matches(if_none_match, etag) else None
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return None
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        if _as_utc(last_modified) <= since:
+            return Response(status_code=304, headers=headers)
+    return None
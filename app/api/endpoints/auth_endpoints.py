@@ -6,6 +6,7 @@ from app.application.schemas.user_dto import UserCreateDTO, UserResponse, UserUp
 from app.application.schemas.auth_dto import TokenResponse, RefreshTokenRequest
 from app.application.services.user_service import UserService
 from app.infrastructure.repositories.refresh_token_repository import RefreshTokenRepository
+from app.infrastructure.unit_of_work import UnitOfWork
 import secrets
 
 from app.infrastructure.database import get_db
@@ -144,17 +145,17 @@ async def refresh_token(
                 headers={"WWW-Authenticate": "Bearer"},
             )
         
-        # Revoke the old token
-        token_repo = RefreshTokenRepository(db)
-        token_repo.revoke(token_data.refresh_token)
+        # Rotate the refresh token : the old one is revoked only if the new one is stored
+        with UnitOfWork(db):
+            token_repo = RefreshTokenRepository(db)
+            token_repo.revoke(token_data.refresh_token)
+            new_refresh_token = create_refresh_token(user.id, db)
         
         # Generate new tokens
         access_token = create_access_token(
             data={"sub": user.email, "role": user.role, "user_id": user.id}
         )
         
-        new_refresh_token = create_refresh_token(user.id, db)
-        
         return {
             "access_token": access_token,
             "refresh_token": new_refresh_token,
@@ -1,62 +1,198 @@
-from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime
+from typing import Any, Dict, List, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.params import Query
 from pydantic import conlist
 from sqlalchemy.orm import Session
-from app.application.schemas.item_dto import ItemCreateDTO, ItemUpdateDTO, ItemResponse
-from app.application.schemas.rating_dto import RatingResponse
-from app.application.services.item_service import ItemService
+from app.application.schemas.item_dto import (
+    ItemBatchResponse, ItemCreateDTO, ItemUpdateDTO, ItemResponse, ItemPageResponse, TopItemResponse
+)
+from app.application.schemas.rating_dto import DistinctCountResponse, ItemRatingSummaryResponse, RatingPageResponse
+from app.application.services.export_service import ExportService
+from app.application.services.item_service import ItemService, parse_fields
 from app.application.services.rating_service import RatingService
-from app.infrastructure.database import get_db
+from app.infrastructure.database import get_db, get_read_db
+from app.api.conditional import latest, make_etag, not_modified, validator_headers
+from app.api.pagination import rating_page, rating_page_params
+from app.api.responses import TOP_ITEM_LIST, ValidatedJSONResponse, export_response
 from app.api.security import oauth2_scheme, require_role, verify_token
+from app.config import settings
 
 router = APIRouter(prefix="/items", tags=["Items"])
 
+FIELDS_DESCRIPTION = "Comma separated fields to return (e.g. id,name,avg_rating), every field if omitted"
+
+
+def parse_fields_param(fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION)):
+    try:
+        return parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def item_page(items, next_cursor: Optional[str], fields):
+    # Sparse items are plain dicts, serialized as they are
+    if fields is None:
+        return ItemPageResponse(items=items, next_cursor=next_cursor)
+    return {"items": items, "next_cursor": next_cursor}
+
 
 @router.post("", response_model=ItemResponse, status_code=201)
 def create_item(item_data: ItemCreateDTO, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
     # Vérifie le token ; renvoie le nom d'utilisateur ou lève une exception
     verify_token(token)
     item_service = ItemService(db)
-    item = item_service.create_item(item_data)
+    try:
+        item = item_service.create_item(item_data)
+    except ValueError as e:
+        # Nothing of the item was committed
+        raise HTTPException(status_code=400, detail=str(e))
     return item
 
+@router.post("/batch", response_model=ItemBatchResponse)
+def create_items(
+    items: conlist(Dict[str, Any], min_length=1, max_length=settings.ITEM_BATCH_MAX),
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db)
+):
+    # Items are validated one by one so that a bad item does not reject the batch
+    verify_token(token)
+    return ValidatedJSONResponse(ItemService(db).create_items(items))
+
+@router.get("/search", response_model=ItemPageResponse)
+def search_items(
+    q: str = Query(..., min_length=1, max_length=200, description="Words to look for in the name and description"),
+    limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
+    after: Optional[str] = Query(None, description="Cursor returned as next_cursor by the previous page"),
+    fields=Depends(parse_fields_param),
+    db: Session = Depends(get_read_db)
+):
+    try:
+        items, next_cursor = ItemService(db).search_items(q, limit, after, fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return ValidatedJSONResponse(item_page(items, next_cursor, fields))
+
+@router.get("/top", response_model=List[TopItemResponse])
+def top_items(
+    category_id: Optional[int] = Query(None, description="Leaderboard of this category, of every item if omitted"),
+    limit: int = Query(10, ge=1, le=settings.LEADERBOARD_SIZE),
+    db: Session = Depends(get_read_db)
+):
+    return ValidatedJSONResponse(ItemService(db).top_items(category_id, limit), TOP_ITEM_LIST)
+
+@router.get("/export")
+def export_items(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    since: Optional[datetime] = Query(None, description="Only items created at or after this date"),
+    until: Optional[datetime] = Query(None, description="Only items created before this date"),
+    category_id: Optional[int] = None,
+    db: Session = Depends(get_read_db),
+    role: str = Depends(require_role(["admin"]))
+):
+    stream = ExportService(db).export_items(format, since, until, category_id)
+    return export_response(stream, format, "items")
+
 @router.get("/{item_id}", response_model=ItemResponse)
-def get_item(item_id: int, db: Session = Depends(get_db)):
+def get_item(item_id: int, request: Request, fields=Depends(parse_fields_param), db: Session = Depends(get_db)):
+    item_service = ItemService(db)
+    # Revalidation only reads the version markers of the item
+    marker = item_service.get_item_marker(item_id)
+    headers = None
+    if marker:
+        etag = make_etag("item", item_id, marker.version, marker.rating_version, sorted(fields or ()))
+        last_modified = latest(marker.updated_at, marker.ratings_updated_at)
+        unchanged = not_modified(request, etag, last_modified)
+        if unchanged:
+            return unchanged
+        headers = validator_headers(etag, last_modified)
     try:
-        item, avg, count = ItemService(db).get_item(item_id)
-        return serialize_item(item, avg, count)
+        return ValidatedJSONResponse(item_service.get_item(item_id, fields), headers=headers)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-def serialize_item(item, avg, count):
-    return ItemResponse.model_validate({
-        k: v for k, v in vars(item).items() if not k.startswith('_')
-    } | {
-        "avg_rating": avg,
-        "count_rating": count
-    })
-
-@router.get("", response_model=list[ItemResponse])
+@router.get("", response_model=ItemPageResponse)
 def list_items(
+    request: Request,
     category_id: Optional[int] = None,
-    tags: Optional[List[str]] = Query(None, description="Filter by tag names"),
-    db: Session = Depends(get_db)
+    tags: Optional[List[str]] = Query(None, description="Keep items having at least one of these tags"),
+    all_tags: Optional[List[str]] = Query(None, description="Keep items having all of these tags"),
+    exclude_tags: Optional[List[str]] = Query(None, description="Drop items having any of these tags"),
+    limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
+    after: Optional[str] = Query(None, description="Cursor returned as next_cursor by the previous page"),
+    fields=Depends(parse_fields_param),
+    db: Session = Depends(get_read_db)
 ):
+    item_service = ItemService(db)
+    items_version, items_updated_at, ratings_updated_at = item_service.get_catalog_marker()
+    etag = make_etag("items", items_version, items_updated_at, ratings_updated_at, request.url.query)
+    last_modified = latest(items_updated_at, ratings_updated_at)
+    unchanged = not_modified(request, etag, last_modified)
+    if unchanged:
+        return unchanged
     try:
-        items = ItemService(db).list_items(category_id, tags)
-        # items: List[Tuple[Item, avg, count]]
-        return [serialize_item(item, avg, count) for item, avg, count in items]
+        items, next_cursor = item_service.list_items(category_id, tags, limit, after, all_tags, exclude_tags, fields)
+        return ValidatedJSONResponse(
+            item_page(items, next_cursor, fields),
+            headers=validator_headers(etag, last_modified)
+        )
     except Exception as e:
         print(e)
         raise HTTPException(status_code=400, detail=str(e))
 
 # Endpoint pour récupérer tous les ratings d’un item donné
-@router.get("/{item_id}/ratings", response_model=list[RatingResponse])
-def get_ratings_by_item(item_id: int, db: Session = Depends(get_db), token: str = Depends(oauth2_scheme), role: str = Depends(require_role(["user"]))):
+@router.get("/{item_id}/ratings", response_model=RatingPageResponse)
+def get_ratings_by_item(
+    item_id: int,
+    request: Request,
+    page_params: Dict[str, Any] = Depends(rating_page_params),
+    db: Session = Depends(get_db),
+    token: str = Depends(oauth2_scheme),
+    role: str = Depends(require_role(["user"]))
+):
     verify_token(token)
-    rating_service = RatingService(db)
-    return rating_service.get_ratings_by_item_id(item_id)
+    # Every rating write on the item bumps its stats version, each page and filter has its own tag
+    marker = ItemService(db).get_item_marker(item_id)
+    headers = None
+    if marker:
+        etag = make_etag("ratings", item_id, marker.rating_version, request.url.query)
+        unchanged = not_modified(request, etag, marker.ratings_updated_at)
+        if unchanged:
+            return unchanged
+        headers = validator_headers(etag, marker.ratings_updated_at)
+    response = rating_page(db, page_params, item_id=item_id)
+    if headers:
+        response.headers.update(headers)
+    return response
+
+# Résumé des notes d'un item : nombre, moyenne, histogramme par demi-étoile
+@router.get("/{item_id}/summary", response_model=ItemRatingSummaryResponse)
+def get_item_summary(item_id: int, request: Request, db: Session = Depends(get_db)):
+    marker = ItemService(db).get_item_marker(item_id)
+    if not marker:
+        raise HTTPException(status_code=404, detail="Item not found")
+    etag = make_etag("summary", item_id, marker.rating_version)
+    unchanged = not_modified(request, etag, marker.ratings_updated_at)
+    if unchanged:
+        return unchanged
+    try:
+        summary = RatingService(db).get_item_summary(item_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return ValidatedJSONResponse(summary, headers=validator_headers(etag, marker.ratings_updated_at))
+
+
+# Utilisateurs distincts ayant noté l'item sur 1, 7, 30 et 90 jours, estimés par HyperLogLog
+@router.get("/{item_id}/raters", response_model=DistinctCountResponse)
+def get_item_raters(
+    item_id: int,
+    exact: bool = Query(False, description="Count from the ratings instead of estimating, for verification"),
+    db: Session = Depends(get_db)
+):
+    try:
+        return RatingService(db).get_item_raters(item_id, exact)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
 
 
 @router.put("/{item_id}/categories", status_code=204)
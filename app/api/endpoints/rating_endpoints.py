@@ -1,30 +1,62 @@
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime
+from typing import Any, Dict, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import ORJSONResponse
+from pydantic import conlist
 from sqlalchemy.orm import Session
 from app.api.endpoints.auth_endpoints import get_current_user
 from app.application.schemas.rating_dto import (
-    RatingCreateDTO, RatingUpdateDTO, RatingResponse,
+    RatingCreateDTO, RatingUpdateDTO, RatingResponse, RatingPageResponse, RatingBatchResponse,
     RatingDistributionDTO, RecentRatingDTO, RatingStatsDTO
 )
 from app.application.schemas.user_dto import UserResponse
+from app.application.analytics_snapshots import analytics_snapshots
+from app.application.rating_buffer import rating_buffer
+from app.application.services.export_service import ExportService
 from app.application.services.rating_service import RatingService
-from app.infrastructure.database import get_db
+from app.infrastructure.database import get_db, get_read_db
+from app.config import settings
+from app.api.pagination import rating_page, rating_page_params
+from app.api.responses import ValidatedJSONResponse, export_response, snapshot_response
 from app.api.security import oauth2_scheme, require_role, verify_token
 
 router = APIRouter(prefix="/ratings", tags=["Ratings"])
 
+
+def analytics_params(
+    start: Optional[datetime] = Query(None, alias="from", description="Start of the period, rounded down to the granularity"),
+    end: Optional[datetime] = Query(None, alias="to", description="End of the period (excluded)"),
+    granularity: Literal["hour", "day"] = Query("day", description="Rollups the period is read from")
+) -> Dict[str, Any]:
+    """Period of the analytics endpoints, answered from the rating rollups"""
+    return {"start": start, "end": end, "granularity": granularity}
+
+
+# The period of the dashboard, served from the analytics snapshots
+DASHBOARD_PERIOD = {"start": None, "end": None, "granularity": "day"}
+REFRESH_DESCRIPTION = "Recompute the dashboard snapshot now instead of serving the background one"
+
+
 # Analytics Endpoints - moved to the top to avoid route conflicts
 @router.get("/distribution", response_model=list[RatingDistributionDTO])
 def get_rating_distribution(
-    db: Session = Depends(get_db),
+    period: Dict[str, Any] = Depends(analytics_params),
+    refresh: bool = Query(False, description=REFRESH_DESCRIPTION),
+    db: Session = Depends(get_read_db),
     role: str = Depends(require_role(["admin"]))
 ):
+    if period == DASHBOARD_PERIOD:
+        return snapshot_response(*analytics_snapshots.get("rating-distribution", db, refresh))
     rating_service = RatingService(db)
-    return rating_service.get_rating_distribution()
+    try:
+        return rating_service.get_rating_distribution(**period)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/recent", response_model=list[RecentRatingDTO])
 def get_recent_ratings(
     limit: int = 10,
-    db: Session = Depends(get_db), 
+    db: Session = Depends(get_read_db), 
     role: str = Depends(require_role(["admin"]))
 ):
     rating_service = RatingService(db)
@@ -32,11 +64,31 @@ def get_recent_ratings(
 
 @router.get("/stats", response_model=RatingStatsDTO)
 def get_rating_stats(
-    db: Session = Depends(get_db), 
+    period: Dict[str, Any] = Depends(analytics_params),
+    refresh: bool = Query(False, description=REFRESH_DESCRIPTION),
+    db: Session = Depends(get_read_db), 
     role: str = Depends(require_role(["admin"]))
 ):
+    if period == DASHBOARD_PERIOD:
+        return snapshot_response(*analytics_snapshots.get("rating-stats", db, refresh))
     rating_service = RatingService(db)
-    return rating_service.get_rating_stats()
+    try:
+        return rating_service.get_rating_stats(**period)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/export")
+def export_ratings(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    since: Optional[datetime] = Query(None, description="Only ratings created at or after this date"),
+    until: Optional[datetime] = Query(None, description="Only ratings created before this date"),
+    item_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    db: Session = Depends(get_read_db),
+    role: str = Depends(require_role(["admin"]))
+):
+    stream = ExportService(db).export_ratings(format, since, until, item_id, user_id)
+    return export_response(stream, format, "ratings")
 
 @router.get("/{item_id}/my-rating", response_model=RatingResponse)
 def get_my_rating_for_item(
@@ -54,12 +106,37 @@ def get_my_rating_for_item(
         raise HTTPException(status_code=404, detail="No rating found for this item")
     
 # Endpoint pour créer un nouveau rating
-@router.post("", response_model=RatingResponse, status_code=201)
-def create_rating(rating_dto: RatingCreateDTO, db: Session = Depends(get_db), token: str = Depends(oauth2_scheme), role: str = Depends(require_role(["user"]))):
+@router.post(
+    "",
+    response_model=RatingResponse,
+    status_code=201,
+    responses={
+        202: {"description": "Write-behind mode : the rating is queued and written shortly after"},
+        503: {"description": "Write-behind mode : the rating buffer is full, retry later"},
+    }
+)
+def create_rating(
+    rating_dto: RatingCreateDTO,
+    response: Response,
+    upsert: bool = Query(False, description="Overwrite the user's existing rating of the item instead of failing with 409"),
+    db: Session = Depends(get_db),
+    token: str = Depends(oauth2_scheme),
+    role: str = Depends(require_role(["user"]))
+):
     verify_token(token)
+    if settings.RATING_WRITE_BEHIND and not upsert:
+        # Duplicates are only detected when the buffer is flushed
+        if not rating_buffer.offer(rating_dto):
+            raise HTTPException(status_code=503, detail="Too many pending ratings", headers={"Retry-After": "1"})
+        return ORJSONResponse(status_code=202, content={"status": "accepted"})
     rating_service = RatingService(db)
     try:
-        rating = rating_service.create_rating(rating_dto)
+        if upsert:
+            rating, created = rating_service.upsert_rating(rating_dto)
+            if not created:
+                response.status_code = 200
+        else:
+            rating = rating_service.create_rating(rating_dto)
     except ValueError as e:
         # duplicate → 409 Conflict
         if "already rated" in str(e):
@@ -70,6 +147,18 @@ def create_rating(rating_dto: RatingCreateDTO, db: Session = Depends(get_db), to
         raise HTTPException(status_code=400, detail=str(e))
     return rating
 
+# Bulk ingestion of partner feeds
+@router.post("/batch", response_model=RatingBatchResponse)
+def ingest_ratings(
+    ratings: conlist(Dict[str, Any], min_length=1, max_length=settings.RATING_BATCH_MAX),
+    db: Session = Depends(get_db),
+    token: str = Depends(oauth2_scheme),
+    role: str = Depends(require_role(["admin"]))
+):
+    # Rows are validated by the service so that a bad row does not reject the batch
+    verify_token(token)
+    return ValidatedJSONResponse(RatingService(db).ingest_ratings(ratings))
+
 # Endpoint pour récupérer un rating par ID
 @router.get("/{rating_id}", response_model=RatingResponse)
 def get_rating(rating_id: int, db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)):
@@ -81,11 +170,17 @@ def get_rating(rating_id: int, db: Session = Depends(get_db), token: str = Depen
     return rating
 
 # Endpoint pour lister tous les ratings
-@router.get("", response_model=list[RatingResponse])
-def list_ratings(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme), role: str = Depends(require_role(["admin"]))):
+@router.get("", response_model=RatingPageResponse)
+def list_ratings(
+    item_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    page_params: Dict[str, Any] = Depends(rating_page_params),
+    db: Session = Depends(get_db),
+    token: str = Depends(oauth2_scheme),
+    role: str = Depends(require_role(["admin"]))
+):
     verify_token(token)
-    rating_service = RatingService(db)
-    return rating_service.list_ratings()
+    return rating_page(db, page_params, item_id=item_id, user_id=user_id)
 
 # Endpoint pour mettre à jour un rating existant
 @router.put("/{rating_id}", response_model=RatingResponse)
@@ -1,19 +1,22 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, Path
+from typing import Any, Dict, List
+from fastapi import APIRouter, Depends, HTTPException, Path, Query
 from sqlalchemy.orm import Session
 from app.api.endpoints.auth_endpoints import get_current_user
+from app.api.endpoints.rating_endpoints import REFRESH_DESCRIPTION, analytics_params
+from app.api.pagination import rating_page, rating_page_params
+from app.api.responses import item_list_response, snapshot_response
+from app.application.analytics_snapshots import analytics_snapshots
 from app.api.security import require_role
 from app.application.schemas.item_dto import ItemResponse
-from app.application.schemas.rating_dto import RatingResponse
+from app.application.schemas.rating_dto import DistinctCountResponse, RatingPageResponse
 from app.application.schemas.user_dto import (
     UserCreateDTO, UserUpdateDTO, UserResponse, 
     UserGrowthDTO, UserEngagementDTO, UserStatsDTO
 )
-from app.application.services.rating_service import RatingService
 from app.application.services.user_service import UserService
 from app.domain.item import Item
 from app.domain.rating import Rating
-from app.infrastructure.database import get_db
+from app.infrastructure.database import get_db, get_read_db
 from app.api.security import oauth2_scheme, require_role, verify_token
 
 router = APIRouter(prefix="/users", tags=["Users"])
@@ -22,7 +25,7 @@ router = APIRouter(prefix="/users", tags=["Users"])
 @router.get("/growth", response_model=list[UserGrowthDTO])
 def get_user_growth(
     days: int = 30,
-    db: Session = Depends(get_db), 
+    db: Session = Depends(get_read_db), 
     role: str = Depends(require_role(["admin"]))
 ):
     """Get user growth data for the specified number of days
@@ -41,7 +44,8 @@ def get_user_growth(
 @router.get("/engagement", response_model=list[UserEngagementDTO])
 def get_user_engagement(
     limit: int = 10,
-    db: Session = Depends(get_db), 
+    period: Dict[str, Any] = Depends(analytics_params),
+    db: Session = Depends(get_read_db), 
     role: str = Depends(require_role(["admin"]))
 ):
     """
@@ -49,6 +53,7 @@ def get_user_engagement(
 
     Args:
         limit (int, optional): The maximum number of users to return. Defaults to 10.
+        period (dict): from / to / granularity query parameters, the period read from the rating rollups.
         db (Session): Database session dependency.
         role (str): Role dependency, requires "admin" role to access.
 
@@ -57,11 +62,15 @@ def get_user_engagement(
     """
 
     user_service = UserService(db)
-    return user_service.get_user_engagement(limit)
+    try:
+        return user_service.get_user_engagement(limit, **period)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/stats", response_model=UserStatsDTO)
 def get_user_stats(
-    db: Session = Depends(get_db), 
+    refresh: bool = Query(False, description=REFRESH_DESCRIPTION),
+    db: Session = Depends(get_read_db), 
     role: str = Depends(require_role(["admin"]))
 ):
     """Get overall user statistics
@@ -72,10 +81,28 @@ def get_user_stats(
     - total_items: The total number of items in the database
     - total_ratings: The total number of ratings in the database
     
+    Served from the analytics snapshot refreshed in the background, the Age
+    header tells how old it is. refresh=true recomputes it first.
+
     Requires the "admin" role.
     """
-    user_service = UserService(db)
-    return user_service.get_user_stats()
+    return snapshot_response(*analytics_snapshots.get("user-stats", db, refresh))
+
+@router.get("/active", response_model=DistinctCountResponse)
+def get_active_users(
+    exact: bool = Query(False, description="Count from the ratings instead of estimating, for verification"),
+    db: Session = Depends(get_read_db),
+    role: str = Depends(require_role(["admin"]))
+):
+    """Users who wrote a rating over the last 1, 7, 30 and 90 days
+
+    Estimated from daily HyperLogLog sketches merged over each window : about
+    2 in 3 counts are within relative_error of the exact one, nearly all
+    within 3 times it. exact=true counts from the ratings table instead.
+
+    Requires the "admin" role.
+    """
+    return UserService(db).get_active_users(exact)
 
 @router.post("", response_model=UserResponse, status_code=201)
 def create_user(user_data: UserCreateDTO, db: Session = Depends(get_db), role: str = Depends(require_role(["admin"]))):
@@ -102,12 +129,16 @@ def list_users(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme
     return user_service.list_users()
 
 # Endpoint pour lister tous les ratings d'un user
-@router.get("/{user_id}/ratings", response_model=list[RatingResponse])
-def list_user_ratings(user_id: int, db: Session = Depends(get_db), current_user: UserResponse = Depends(get_current_user)):
+@router.get("/{user_id}/ratings", response_model=RatingPageResponse)
+def list_user_ratings(
+    user_id: int,
+    page_params: Dict[str, Any] = Depends(rating_page_params),
+    db: Session = Depends(get_db),
+    current_user: UserResponse = Depends(get_current_user)
+):
     if(user_id != current_user.id and current_user.role != "admin"):
         raise HTTPException(status_code=404, detail="User don't match")
-    rating_service = RatingService(db)
-    return rating_service.list_user_ratings(user_id)
+    return rating_page(db, page_params, user_id=user_id)
 
 @router.get("/{user_id}/recommandations", response_model=List[ItemResponse])
 def get_recommandations(user_id: int, db: Session = Depends(get_db), current_user: UserResponse = Depends(get_current_user)):
@@ -125,7 +156,7 @@ def get_recommandations(user_id: int, db: Session = Depends(get_db), current_use
         .all()
     )
 
-    return recommended_items
+    return item_list_response(recommended_items)
 
 @router.put("/{user_id}", response_model=UserResponse)
 def update_user(user_id: int, user_data: UserUpdateDTO, db: Session = Depends(get_db), role: str = Depends(require_role(["admin"]))):
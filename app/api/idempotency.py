@@ -0,0 +1,186 @@
+"""
+Idempotency-Key support for the write endpoints
+
+A client that retries a POST (PUT, PATCH, DELETE) with the same
+Idempotency-Key header gets the response of the first attempt replayed,
+with an Idempotent-Replayed header, without the request reaching the
+endpoint again. A retry arriving while the first attempt still runs waits
+for it (IDEMPOTENCY_WAIT_SECONDS at most, then 409). Reusing a key for a
+different request is a 422.
+
+Keys are scoped to the Authorization header and the endpoint, so two
+clients cannot collide. Responses with a 5xx status, or larger than
+IDEMPOTENCY_MAX_BODY_BYTES, are not stored : the next retry runs the
+request again.
+
+Only the item and rating writes are covered : the other routes ignore the
+header. In particular /auth responses carry tokens, which must never be
+stored or replayed.
+"""
+import asyncio
+import hashlib
+import time
+from typing import Dict, List, Optional
+import orjson
+from fastapi.concurrency import run_in_threadpool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.config import settings
+from app.infrastructure.idempotency import IdempotencyRecord, IdempotencyStore, get_idempotency_store
+
+HEADER = b"idempotency-key"
+# Path prefixes of the covered routes
+PATHS = ("/items", "/ratings")
+MAX_KEY_LENGTH = 255
+# Interval at which a retry checks a request running in another worker
+POLL_SECONDS = 0.05
+
+
+def _sha256(*parts: bytes) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(hashlib.sha256(part).digest())
+    return digest.hexdigest()
+
+
+def _covered(path: str) -> bool:
+    return any(path == prefix or path.startswith(prefix + "/") for prefix in PATHS)
+
+
+class IdempotencyMiddleware:
+    def __init__(self, app: ASGIApp, store: Optional[IdempotencyStore] = None):
+        self.app = app
+        self._store = store
+        # Requests of this worker in flight, by key : their retries wake up as soon as they end
+        self._inflight: Dict[str, asyncio.Event] = {}
+
+    @property
+    def store(self) -> IdempotencyStore:
+        return self._store or get_idempotency_store()
+
+    async def _call(self, method, *args):
+        if self.store.blocking:
+            return await run_in_threadpool(method, *args)
+        return method(*args)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or scope["method"] not in ("POST", "PUT", "PATCH", "DELETE")
+            or not _covered(scope["path"])
+        ):
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        raw_key = headers.get(HEADER)
+        if raw_key is None:
+            await self.app(scope, receive, send)
+            return
+        if not raw_key or len(raw_key) > MAX_KEY_LENGTH:
+            await self._send_error(send, 400, f"Idempotency-Key must have 1 to {MAX_KEY_LENGTH} characters")
+            return
+
+        body = await self._read_body(receive)
+        endpoint = f"{scope['method']} {scope['path']}".encode()
+        key = _sha256(headers.get(b"authorization", b""), endpoint, raw_key)
+        fingerprint = _sha256(endpoint, scope.get("query_string", b""), body)
+
+        deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+        while True:
+            record = await self._call(self.store.claim, key, fingerprint, settings.IDEMPOTENCY_LOCK_SECONDS)
+            if record is None:
+                await self._run(scope, body, receive, send, key, fingerprint)
+                return
+            if record.fingerprint != fingerprint:
+                await self._send_error(send, 422, "Idempotency-Key already used for a different request")
+                return
+            if record.completed:
+                await self._replay(send, record)
+                return
+            # Coalesce onto the request in flight
+            while not record.completed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    await self._send_error(send, 409, "A request with this Idempotency-Key is still in progress")
+                    return
+                event = self._inflight.get(key)
+                if event is not None:
+                    try:
+                        await asyncio.wait_for(event.wait(), timeout=remaining)
+                    except asyncio.TimeoutError:
+                        pass
+                else:
+                    await asyncio.sleep(min(POLL_SECONDS, remaining))
+                record = await self._call(self.store.get, key)
+                if record is None:
+                    # The first attempt failed and released the key : run it ourselves
+                    break
+
+    @staticmethod
+    async def _read_body(receive: Receive) -> bytes:
+        chunks: List[bytes] = []
+        while True:
+            message = await receive()
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                return b"".join(chunks)
+
+    async def _run(self, scope: Scope, body: bytes, receive: Receive, send: Send, key: str, fingerprint: str) -> None:
+        event = self._inflight[key] = asyncio.Event()
+        consumed = False
+
+        async def replay_body() -> Message:
+            nonlocal consumed
+            if not consumed:
+                consumed = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        record = IdempotencyRecord(fingerprint)
+        chunks: List[bytes] = []
+        size = 0
+
+        async def capture(message: Message) -> None:
+            nonlocal size
+            if message["type"] == "http.response.start":
+                record.status_code = message["status"]
+                record.headers = [(name.decode("latin-1"), value.decode("latin-1")) for name, value in message.get("headers", [])]
+            elif message["type"] == "http.response.body":
+                chunk = message.get("body", b"")
+                size += len(chunk)
+                # Too large to be kept : stop buffering it
+                if size <= settings.IDEMPOTENCY_MAX_BODY_BYTES:
+                    chunks.append(chunk)
+            await send(message)
+
+        try:
+            await self.app(scope, replay_body, capture)
+        except BaseException:
+            await self._call(self.store.release, key)
+            raise
+        else:
+            storable = size <= settings.IDEMPOTENCY_MAX_BODY_BYTES
+            if record.status_code is not None and record.status_code < 500 and storable:
+                record.body = b"".join(chunks)
+                await self._call(self.store.complete, key, record, settings.IDEMPOTENCY_TTL_SECONDS)
+            else:
+                await self._call(self.store.release, key)
+        finally:
+            del self._inflight[key]
+            event.set()
+
+    @staticmethod
+    async def _replay(send: Send, record: IdempotencyRecord) -> None:
+        headers = [(name.encode("latin-1"), value.encode("latin-1")) for name, value in record.headers]
+        headers.append((b"idempotent-replayed", b"true"))
+        await send({"type": "http.response.start", "status": record.status_code, "headers": headers})
+        await send({"type": "http.response.body", "body": record.body})
+
+    @staticmethod
+    async def _send_error(send: Send, status: int, detail: str) -> None:
+        body = orjson.dumps({"detail": detail})
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -1,5 +1,9 @@
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 import sentry_sdk
 import uvicorn
 from prometheus_fastapi_instrumentator import Instrumentator
@@ -8,7 +12,15 @@ from sentry_sdk.integrations.asgi import SentryAsgiMiddleware
 # Importer la dépendance de la base de données
 from app.api.endpoints import item_endpoints, rating_endpoints, user_endpoints, category_endpoints, tag_endpoints
 import app.api.endpoints.auth_endpoints as auth_endpoints
+from app.api.idempotency import IdempotencyMiddleware
+from app.application.analytics_snapshots import analytics_snapshots
+from app.application.rating_buffer import rating_buffer
+from app.application.rating_rollup import rating_rollup_job
+from app.application.services.item_service import ItemService
 from app.config import settings
+from app.infrastructure.database import SessionLocal, read_router
+
+logger = logging.getLogger(__name__)
 
 # Initialise Sentry avec ton DSN (à stocker dans une variable d'environnement)
 sentry_sdk.init(
@@ -19,10 +31,40 @@ sentry_sdk.init(
     traces_sample_rate=1.0  # Ajuste en fonction de tes besoins
 )
 
+def warm_item_cache():
+    db = SessionLocal()
+    try:
+        loaded = ItemService(db).warm_cache(settings.ITEM_CACHE_WARM_TOP_N)
+        logger.info("Item cache warmed with %d items", loaded)
+    except Exception:
+        # Le cache se remplira au fil des requêtes
+        logger.warning("Item cache warm-up failed", exc_info=True)
+    finally:
+        db.close()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.ITEM_CACHE_WARM_TOP_N > 0:
+        await run_in_threadpool(warm_item_cache)
+    if settings.RATING_WRITE_BEHIND:
+        rating_buffer.start(SessionLocal)
+    if settings.RATING_ROLLUP_INTERVAL_SECONDS > 0:
+        rating_rollup_job.start(SessionLocal)
+    if settings.ANALYTICS_SNAPSHOT_INTERVAL_SECONDS > 0:
+        # Heavy reads : on a replica when there are some
+        analytics_snapshots.start(read_router.session)
+    yield
+    await analytics_snapshots.stop()
+    await rating_rollup_job.stop()
+    # Write the accepted ratings before the worker exits
+    await rating_buffer.stop()
+
 app = FastAPI(
     title="API de Rating",
     description="Une API REST pour gérer des ratings (notes) sur divers items.",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 app.include_router(category_endpoints.router)
@@ -36,6 +78,9 @@ if(settings.PROMETHEUS_ENABLED):
     # Instrumentation pour Prometheus
     Instrumentator().instrument(app).expose(app)
 
+# Innermost : replayed responses still go through CORS
+app.add_middleware(IdempotencyMiddleware)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -0,0 +1,25 @@
+from typing import Any, Dict, Optional
+from fastapi import HTTPException, Query
+from sqlalchemy.orm import Session
+from app.api.responses import ValidatedJSONResponse
+from app.application.services.rating_service import RatingService
+from app.config import settings
+
+
+def rating_page_params(
+    limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
+    after: Optional[str] = Query(None, description="Cursor returned as next_cursor by the previous page"),
+    min_value: Optional[float] = Query(None, ge=0, le=5, description="Only ratings of at least this value"),
+    max_value: Optional[float] = Query(None, ge=0, le=5, description="Only ratings of at most this value"),
+    has_comment: Optional[bool] = Query(None, description="Only ratings with (true) or without (false) a comment")
+) -> Dict[str, Any]:
+    """Paging and filter parameters shared by every rating listing"""
+    return {"limit": limit, "after": after, "min_value": min_value, "max_value": max_value, "has_comment": has_comment}
+
+
+def rating_page(db: Session, page_params: Dict[str, Any], **scope) -> ValidatedJSONResponse:
+    try:
+        page = RatingService(db).list_ratings_page(**page_params, **scope)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return ValidatedJSONResponse(page)
@@ -0,0 +1,63 @@
+from typing import Any, List, Optional
+import orjson
+from pydantic import BaseModel, TypeAdapter
+from starlette.background import BackgroundTask
+from starlette.responses import Response, StreamingResponse
+from app.application.schemas.item_dto import ItemResponse, TopItemResponse
+from app.application.services.export_service import EXPORT_FORMATS
+
+# Adapters are compiled once at import, not on every request
+ITEM_LIST = TypeAdapter(List[ItemResponse])
+TOP_ITEM_LIST = TypeAdapter(List[TopItemResponse])
+
+
+class ValidatedJSONResponse(Response):
+    """
+    JSON response for payloads that already are validated DTOs
+
+    FastAPI does not apply the route response_model to a returned Response, so
+    the payload is validated once by the service and serialized once here :
+    by its TypeAdapter or its own pydantic serializer, or by orjson for plain data.
+    """
+    media_type = "application/json"
+
+    def __init__(
+        self,
+        content: Any,
+        adapter: Optional[TypeAdapter] = None,
+        status_code: int = 200,
+        headers: Optional[dict] = None,
+        background: Optional[BackgroundTask] = None,
+    ):
+        self.adapter = adapter
+        super().__init__(content, status_code, headers, None, background)
+
+    def render(self, content: Any) -> bytes:
+        if self.adapter is not None:
+            return self.adapter.dump_json(content)
+        if isinstance(content, BaseModel):
+            return content.__pydantic_serializer__.to_json(content)
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+def item_list_response(items) -> ValidatedJSONResponse:
+    """
+    Validate ORM items once and serialize them without a second pass
+
+    Already built ItemResponse objects are kept as is.
+    """
+    return ValidatedJSONResponse(ITEM_LIST.validate_python(items, from_attributes=True), ITEM_LIST)
+
+
+def snapshot_response(body: bytes, age: float) -> Response:
+    """Serve an already serialized analytics snapshot, with its age in seconds"""
+    return Response(body, media_type="application/json", headers={"Age": str(int(age))})
+
+
+def export_response(stream, export_format: str, name: str) -> StreamingResponse:
+    """Stream an export as a file download"""
+    return StreamingResponse(
+        stream,
+        media_type=EXPORT_FORMATS[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{export_format}"'},
+    )
@@ -0,0 +1,80 @@
+import logging
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from pydantic import TypeAdapter
+from sqlalchemy.orm import Session
+from app.application.periodic_task import PeriodicTask
+from app.application.schemas.rating_dto import RatingDistributionDTO, RatingStatsDTO
+from app.application.schemas.user_dto import UserStatsDTO
+from app.application.services.rating_service import RatingService
+from app.application.services.user_service import UserService
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class AnalyticsSnapshots:
+    """
+    Admin dashboard analytics, recomputed in the background and served from memory
+
+    Each snapshot is kept serialized : serving it is a dict lookup, whatever
+    the database is doing. An asyncio task started by the application lifespan
+    recomputes every snapshot each ANALYTICS_SNAPSHOT_INTERVAL_SECONDS ; a
+    snapshot is also loaded on its first read, and on demand with refresh.
+    When a refresh fails the last snapshot keeps being served.
+    """
+
+    def __init__(self, loaders: Dict[str, Tuple[Callable[[Session], Any], TypeAdapter]]):
+        self.loaders = loaders
+        # name -> (JSON body, monotonic time it was computed at)
+        self._snapshots: Dict[str, Tuple[bytes, float]] = {}
+        self._task = PeriodicTask(
+            "Analytics snapshots refresh", self.refresh, lambda: settings.ANALYTICS_SNAPSHOT_INTERVAL_SECONDS
+        )
+
+    def refresh(self, db: Session, names: Optional[Iterable[str]] = None) -> None:
+        """Recompute the given snapshots (default every one) with db"""
+        for name in names or self.loaders:
+            loader, adapter = self.loaders[name]
+            body = adapter.dump_json(loader(db))
+            # Replaced in one assignment : readers never see a partial snapshot
+            self._snapshots[name] = (body, time.monotonic())
+
+    def get(self, name: str, db: Session, refresh: bool = False) -> Tuple[bytes, float]:
+        """
+        (JSON body, age in seconds) of a snapshot
+
+        db is only used when there is no snapshot yet or refresh is asked.
+        """
+        snapshot = self._snapshots.get(name)
+        if snapshot is None or refresh:
+            try:
+                self.refresh(db, [name])
+            except Exception:
+                if snapshot is None:
+                    raise
+                db.rollback()
+                logger.warning("Analytics snapshot %s not refreshed, serving the last one", name, exc_info=True)
+            snapshot = self._snapshots[name]
+        body, taken_at = snapshot
+        return body, time.monotonic() - taken_at
+
+    def clear(self) -> None:
+        self._snapshots.clear()
+
+    def start(self, session_factory: Callable[[], Session]) -> None:
+        """Start the background refresh in the running event loop (a failed refresh keeps the last snapshots)"""
+        self._task.start(session_factory)
+
+    async def stop(self) -> None:
+        await self._task.stop()
+
+
+# Analytics of the dashboard : every rating since the start, by day
+analytics_snapshots = AnalyticsSnapshots({
+    "rating-stats": (lambda db: RatingService(db).get_rating_stats(), TypeAdapter(RatingStatsDTO)),
+    "rating-distribution": (
+        lambda db: RatingService(db).get_rating_distribution(), TypeAdapter(List[RatingDistributionDTO])
+    ),
+    "user-stats": (lambda db: UserService(db).get_user_stats(), TypeAdapter(UserStatsDTO)),
+})
@@ -0,0 +1,50 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Tuple
+
+
+def encode_cursor(*values: Any) -> str:
+    """
+    Encode the keyset values of the last row of a page into an opaque cursor
+
+    Datetimes are serialized in ISO format, everything else must be JSON friendly.
+    """
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, arity: int) -> List[Any]:
+    """
+    Decode an opaque cursor produced by encode_cursor
+
+    Raises:
+        ValueError: if the cursor is malformed
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list) or len(values) != arity:
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def decode_keyset_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Decode a (created_at, id) cursor"""
+    created_at, row_id = decode_cursor(cursor, 2)
+    try:
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+
+def decode_rank_cursor(cursor: str) -> Tuple[float, int]:
+    """Decode a (rank, id) cursor"""
+    rank, row_id = decode_cursor(cursor, 2)
+    try:
+        return float(rank), int(row_id)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
@@ -0,0 +1,79 @@
+import asyncio
+import logging
+from typing import Any, Callable, Optional
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicTask:
+    """
+    Background job of the application lifespan : calls job(db) every interval seconds
+
+    The job runs in the thread pool with a session of the factory given to
+    start(), closed after each run. A failed run is logged and the job runs
+    again at the next interval. wakeup() runs it early, from any thread.
+    stop() cancels the task, or with drain=True lets it run once more first.
+    """
+
+    def __init__(self, name: str, job: Callable[[Session], Any], interval: Callable[[], float]):
+        self.name = name
+        self.job = job
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+
+    def _run_with(self, session_factory: Callable[[], Session]) -> Any:
+        db = session_factory()
+        try:
+            return self.job(db)
+        finally:
+            db.close()
+
+    async def _run(self, session_factory: Callable[[], Session]) -> None:
+        while True:
+            last = self._stopping
+            try:
+                await run_in_threadpool(self._run_with, session_factory)
+            except Exception:
+                if last:
+                    logger.error("%s failed on its last run", self.name, exc_info=True)
+                    return
+                logger.warning("%s failed, retrying", self.name, exc_info=True)
+            if last:
+                return
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval())
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    def start(self, session_factory: Callable[[], Session]) -> None:
+        """Start the job in the running event loop"""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task = asyncio.create_task(self._run(session_factory))
+
+    def wakeup(self) -> None:
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def stop(self, drain: bool = False) -> None:
+        if self._task is None:
+            return
+        if drain:
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+        else:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        self._loop = None
@@ -0,0 +1,148 @@
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, List, Optional, Tuple
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from app.application.periodic_task import PeriodicTask
+from app.application.schemas.rating_dto import RatingCreateDTO
+from app.application.services.rating_service import RatingService
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Exposed on /metrics by the Prometheus instrumentator (default registry)
+BUFFER_DEPTH = Gauge("rating_buffer_depth", "Ratings accepted and waiting to be written")
+BUFFER_REJECTED = Counter("rating_buffer_rejected_total", "Ratings refused because the buffer was full")
+FLUSH_SECONDS = Histogram("rating_buffer_flush_seconds", "Duration of a flush of buffered ratings")
+FLUSH_FAILED = Counter("rating_buffer_failed_total", "Buffered ratings rejected when written (duplicate, unknown item...)")
+FLUSH_DROPPED = Counter("rating_buffer_dropped_total", "Buffered ratings dropped after failing every write attempt")
+
+
+class RatingBuffer:
+    """
+    Bounded in-process queue of accepted ratings, written behind the request
+
+    Request threads offer validated ratings ; an asyncio task started by the
+    application lifespan writes them through RatingService.ingest_ratings,
+    RATING_FLUSH_BATCH_SIZE at a time, as soon as a batch is full or every
+    RATING_FLUSH_INTERVAL_SECONDS. offer() refuses ratings once
+    RATING_BUFFER_SIZE are waiting, which the endpoint turns into a 503.
+
+    Ratings only live in worker memory until flushed : a crash loses them,
+    a shutdown drains them. When the database is unreachable a batch is
+    retried as is at the next run ; when writing it fails otherwise, its
+    ratings are retried one by one, and a rating failing
+    RATING_FLUSH_MAX_ATTEMPTS times is dropped, so that it cannot hold the
+    ratings queued behind it.
+    """
+
+    def __init__(self, capacity: Optional[int] = None):
+        self._capacity = capacity
+        # (rating, failed write attempts)
+        self._queue: Deque[Tuple[RatingCreateDTO, int]] = deque()
+        self._lock = threading.Lock()
+        self._task = PeriodicTask("Rating buffer flush", self._drain, lambda: settings.RATING_FLUSH_INTERVAL_SECONDS)
+
+    @property
+    def capacity(self) -> int:
+        return settings.RATING_BUFFER_SIZE if self._capacity is None else self._capacity
+
+    @property
+    def depth(self) -> int:
+        return len(self._queue)
+
+    def offer(self, rating: RatingCreateDTO) -> bool:
+        """Queue a rating, False if the buffer is full"""
+        with self._lock:
+            if len(self._queue) >= self.capacity:
+                BUFFER_REJECTED.inc()
+                return False
+            self._queue.append((rating, 0))
+            depth = len(self._queue)
+        BUFFER_DEPTH.set(depth)
+        if depth >= settings.RATING_FLUSH_BATCH_SIZE:
+            # Called from a request thread : wake the flusher up in its loop
+            self._task.wakeup()
+        return True
+
+    def _take(self, limit: int) -> List[Tuple[RatingCreateDTO, int]]:
+        """Up to limit fresh ratings, or the rating at the front alone when it already failed"""
+        with self._lock:
+            batch = []
+            while self._queue and len(batch) < limit:
+                if self._queue[0][1] and batch:
+                    break
+                batch.append(self._queue.popleft())
+                if batch[0][1]:
+                    break
+            depth = len(self._queue)
+        BUFFER_DEPTH.set(depth)
+        return batch
+
+    def _requeue(self, batch: List[Tuple[RatingCreateDTO, int]]) -> None:
+        # Back in front, even past the capacity : these were already accepted
+        with self._lock:
+            self._queue.extendleft(reversed(batch))
+            depth = len(self._queue)
+        BUFFER_DEPTH.set(depth)
+
+    def flush(self, db: Session, limit: Optional[int] = None) -> int:
+        """
+        Write up to limit (default RATING_FLUSH_BATCH_SIZE) buffered ratings, return how many were taken
+
+        Raises:
+            OperationalError: if the database is unreachable, the ratings are requeued as they were
+        """
+        batch = self._take(limit or settings.RATING_FLUSH_BATCH_SIZE)
+        if not batch:
+            return 0
+        start = time.perf_counter()
+        try:
+            report = RatingService(db).ingest_ratings([rating.model_dump() for rating, _ in batch])
+        except OperationalError:
+            self._requeue(batch)
+            raise
+        except Exception:
+            db.rollback()
+            retried = [
+                (rating, failures + 1) for rating, failures in batch
+                if failures + 1 < settings.RATING_FLUSH_MAX_ATTEMPTS
+            ]
+            dropped = len(batch) - len(retried)
+            if dropped:
+                FLUSH_DROPPED.inc(dropped)
+                logger.error("%d buffered rating(s) dropped, they could not be written", dropped, exc_info=True)
+            else:
+                logger.warning("Rating buffer flush failed, retrying its ratings one by one", exc_info=True)
+            self._requeue(retried)
+            return len(batch)
+        FLUSH_SECONDS.observe(time.perf_counter() - start)
+        if report.failed:
+            FLUSH_FAILED.inc(report.failed)
+            logger.warning(
+                "%d buffered ratings rejected: %s", report.failed,
+                "; ".join(sorted({result.error for result in report.results if result.error}))
+            )
+        return len(batch)
+
+    def _drain(self, db: Session) -> None:
+        # Unreachable database : the batch is requeued and waits for the next run
+        while self.depth:
+            self.flush(db)
+
+    def start(self, session_factory: Callable[[], Session]) -> None:
+        """Start the flusher in the running event loop"""
+        self._task.start(session_factory)
+
+    async def stop(self) -> None:
+        """Write every buffered rating, then stop the flusher"""
+        await self._task.stop(drain=True)
+        if self.depth:
+            logger.error("Could not drain the rating buffer, %d ratings lost", self.depth)
+
+
+# Shared by the threads of a worker
+rating_buffer = RatingBuffer()
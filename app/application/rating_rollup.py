@@ -0,0 +1,58 @@
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Callable, Optional
+from prometheus_client import Histogram
+from sqlalchemy.orm import Session
+from app.application.periodic_task import PeriodicTask
+from app.config import settings
+from app.infrastructure.repositories.rating_rollup_repository import RatingRollupRepository
+from app.infrastructure.unit_of_work import UnitOfWork
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_SECONDS = Histogram("rating_rollup_seconds", "Duration of a run of the rating rollup job")
+
+
+def rollup_horizon() -> datetime:
+    """
+    Watermark of a run starting now, naive UTC like the DateTime columns
+
+    It only orders the runs : what a run recomputes comes from the dirty
+    hours marked by the committed writes, see RatingRollupRepository.
+    """
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def roll_up_ratings(db: Session, until: Optional[datetime] = None) -> Optional[int]:
+    """Run the rollup job once in its own transaction, return the number of recomputed hours"""
+    start = time.perf_counter()
+    with UnitOfWork(db):
+        hours = RatingRollupRepository(db).roll_up(until or rollup_horizon())
+    ROLLUP_SECONDS.observe(time.perf_counter() - start)
+    return hours
+
+
+def _roll_up_and_log(db: Session) -> Optional[int]:
+    # On failure nothing was committed : the next run starts from the same watermark
+    hours = roll_up_ratings(db)
+    if hours:
+        logger.info("Rolled up %d hour(s) of ratings", hours)
+    return hours
+
+
+class RatingRollupJob:
+    """Runs roll_up_ratings every RATING_ROLLUP_INTERVAL_SECONDS, started by the application lifespan"""
+
+    def __init__(self):
+        self._task = PeriodicTask("Rating rollup", _roll_up_and_log, lambda: settings.RATING_ROLLUP_INTERVAL_SECONDS)
+
+    def start(self, session_factory: Callable[[], Session]) -> None:
+        """Start the job in the running event loop"""
+        self._task.start(session_factory)
+
+    async def stop(self) -> None:
+        await self._task.stop()
+
+
+rating_rollup_job = RatingRollupJob()
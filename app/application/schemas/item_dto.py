@@ -37,3 +37,22 @@ class ItemResponse(ItemBaseDTO):
 
     model_config = ConfigDict(from_attributes=True, extra='allow')
 
+
+class TopItemResponse(ItemResponse):
+    # Bayesian average the leaderboard is sorted by
+    score: float
+
+class ItemBatchResult(BaseModel):
+    # Position of the item in the request
+    index: int
+    id: Optional[int] = None
+    error: Optional[str] = None
+
+class ItemBatchResponse(BaseModel):
+    created: int
+    failed: int
+    results: List[ItemBatchResult]
+
+class ItemPageResponse(BaseModel):
+    items: List[ItemResponse]
+    next_cursor: Optional[str] = None
@@ -1,7 +1,7 @@
 # app/application/schemas.py
 
 from pydantic import BaseModel, ConfigDict, EmailStr, Field
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 # ------------------------------
@@ -29,6 +29,46 @@ class RatingResponse(BaseModel):
 
     model_config = ConfigDict(from_attributes=True)
 
+class RatingPageResponse(BaseModel):
+    items: List[RatingResponse]
+    next_cursor: Optional[str] = None
+
+class RatingBucketDTO(BaseModel):
+    value: float = Field(..., description="Lower bound of the half-star bucket, [value, value + 0.5)")
+    count: int
+
+class ItemRatingSummaryResponse(BaseModel):
+    item_id: int
+    count: int
+    mean: float
+    # Every half-star bucket from 0 to 5, empty ones included
+    histogram: List[RatingBucketDTO]
+    # Last rating given or edited, comment-only edits included
+    last_rated_at: Optional[datetime] = None
+
+class DistinctCountDTO(BaseModel):
+    # Window of the last days, today (UTC) included
+    days: int
+    count: int
+
+class DistinctCountResponse(BaseModel):
+    exact: bool
+    relative_error: float = Field(
+        ..., description="Standard error of the estimated counts (about 2 in 3 are within it), 0 when exact"
+    )
+    windows: List[DistinctCountDTO]
+
+class RatingBatchResult(BaseModel):
+    # Position of the rating in the request
+    index: int
+    created: bool
+    error: Optional[str] = None
+
+class RatingBatchResponse(BaseModel):
+    created: int
+    failed: int
+    results: List[RatingBatchResult]
+
 # Analytics DTOs
 class RatingDistributionDTO(BaseModel):
     value: int = Field(..., ge=1, le=5, description="Rating value (1-5)")
@@ -1,8 +1,13 @@
+from app.application.services.item_service import invalidate_items
 from app.infrastructure.repositories.category_repository import CategoryRepository
+from app.infrastructure.repositories.item_repository import ItemRepository
+from app.infrastructure.unit_of_work import UnitOfWork
 
 class CategoryService:
     def __init__(self, db_session):
+        self.db = db_session
         self.repo = CategoryRepository(db_session)
+        self.items = ItemRepository(db_session)
 
     def list_categories(self):
         return self.repo.list()
@@ -25,9 +30,21 @@ class CategoryService:
             update_data["name"] = name
         if description is not None:
             update_data["description"] = description
-            
-        return self.repo.update(category_id, update_data)
+
+        # Items embed their categories : their version is bumped in the same transaction
+        with UnitOfWork(self.db):
+            item_ids = self.repo.item_ids(category_id)
+            self.items.touch(item_ids)
+            category = self.repo.update(category_id, update_data)
+        invalidate_items(item_ids)
+        return category
     
     # Delete a category
     def delete_category(self, category_id: int):
-        return self.repo.delete(category_id)
\ No newline at end of file
+        with UnitOfWork(self.db):
+            item_ids = self.repo.item_ids(category_id)
+            self.items.touch(item_ids)
+            self.items.leaderboard.drop_category(category_id)
+            deleted = self.repo.delete(category_id)
+        invalidate_items(item_ids)
+        return deleted
\ No newline at end of file
@@ -0,0 +1,65 @@
+import csv
+import io
+from datetime import datetime
+from typing import Iterable, Iterator, Optional, Sequence
+import orjson
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.infrastructure.repositories.item_repository import ItemRepository
+from app.infrastructure.repositories.rating_repository import RatingRepository
+
+# Supported formats and their media type
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def _csv_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def encode_rows(batches: Iterable[list], columns: Sequence[str], export_format: str) -> Iterator[bytes]:
+    """Encode batches of rows, one chunk of bytes per batch"""
+    if export_format == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        yield buffer.getvalue().encode()
+        for batch in batches:
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows([_csv_value(value) for value in row] for row in batch)
+            yield buffer.getvalue().encode()
+    else:
+        for batch in batches:
+            yield b"".join(orjson.dumps(dict(zip(columns, row))) + b"\n" for row in batch)
+
+
+class ExportService:
+    """Streams whole tables for offline analytics, in constant memory"""
+
+    def __init__(self, db: Session):
+        self.ratings = RatingRepository(db)
+        self.items = ItemRepository(db)
+
+    def export_ratings(
+        self,
+        export_format: str,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        item_id: Optional[int] = None,
+        user_id: Optional[int] = None
+    ) -> Iterator[bytes]:
+        batches = self.ratings.stream_export(since, until, item_id, user_id, settings.EXPORT_BATCH_SIZE)
+        return encode_rows(batches, RatingRepository.EXPORT_COLUMNS, export_format)
+
+    def export_items(
+        self,
+        export_format: str,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        category_id: Optional[int] = None
+    ) -> Iterator[bytes]:
+        batches = self.items.stream_export(since, until, category_id, settings.EXPORT_BATCH_SIZE)
+        return encode_rows(batches, ItemRepository.EXPORT_COLUMNS, export_format)
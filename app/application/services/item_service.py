@@ -1,52 +1,253 @@
-from typing import List, Optional, Tuple
+from itertools import islice
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
 from sqlalchemy.orm import Session
+from app.application.pagination import decode_keyset_cursor, decode_rank_cursor, encode_cursor
 from app.domain.item import Item
 from app.infrastructure.repositories.item_repository import ItemRepository
-from app.application.schemas.item_dto import ItemCreateDTO, ItemUpdateDTO
+from app.infrastructure.repositories.item_search_repository import ItemSearchRepository, search_terms
+from app.application.schemas.item_dto import (
+    ItemBatchResponse, ItemBatchResult, ItemCreateDTO, ItemUpdateDTO, ItemResponse, TopItemResponse
+)
+from app.domain.tag import Tag
+from app.domain.category_top_item import ALL_CATEGORIES
+from pydantic import TypeAdapter, ValidationError
+from app.config import settings
+from app.infrastructure.cache import CacheRegion
+from app.infrastructure.tag_index import iter_bits, tag_index
+from app.infrastructure.unit_of_work import UnitOfWork
+
+# Assembled ItemResponse objects of GET /items/{id}, keyed by item id
+item_cache = CacheRegion("item", settings.ITEM_CACHE_TTL_SECONDS, TypeAdapter(ItemResponse))
+
+# Fields of ItemResponse that can be requested with ?fields=
+ITEM_FIELDS = frozenset(ItemResponse.model_fields)
+
+def invalidate_items(item_ids) -> None:
+    """Invalidate cached items, in every worker, after a write that changes their response"""
+    item_cache.invalidate(item_ids)
+
+def parse_fields(fields: Optional[str]) -> Optional[FrozenSet[str]]:
+    """
+    Parse a comma separated ?fields= value, None meaning every field
+
+    Raises:
+        ValueError: if a field is unknown
+    """
+    if not fields:
+        return None
+    requested = frozenset(name.strip() for name in fields.split(",") if name.strip())
+    unknown = requested - ITEM_FIELDS
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(sorted(unknown))}")
+    # The id is always returned
+    return requested | {"id"}
 
 class ItemService:
     def __init__(self, db_session: Session):
+        self.db = db_session
         self.repository = ItemRepository(db_session)
+        self.search = ItemSearchRepository(db_session)
 
     def create_item(self, item_data: ItemCreateDTO) -> Item:
-        # Créer l'item sans les relations
-        item = self.repository.create(item_data)
+        # The item and its relations are committed together
+        with UnitOfWork(self.db):
+            # Créer l'item sans les relations
+            item = self.repository.create(item_data)
 
-        # Check if there are categories
-        if item_data.category_ids:
-            self.repository.set_categories(item, item_data.category_ids)
+            # Check if there are categories
+            if item_data.category_ids:
+                self.repository.set_categories(item, item_data.category_ids)
 
-        # Check for tags
-        if item_data.tags:
-            self.repository.set_tags(item, item_data.tags)
+            # Check for tags
+            if item_data.tags:
+                self.repository.set_tags(item, item_data.tags)
+        tag_index.set_item_tags(item.id, item_data.tags or [])
 
         return item
 
     
-    def get_item(self, item_id: int) -> Tuple[Item, float, int]:
-        result = self.repository.get_with_stats(item_id)
+    def create_items(self, payloads: List[Dict[str, Any]]) -> ItemBatchResponse:
+        """
+        Create a batch of items in one transaction
+
+        Every payload is validated on its own : invalid items are reported in
+        the results and the others are still created.
+        """
+        results: List[Optional[ItemBatchResult]] = [None] * len(payloads)
+        valid: List[Tuple[int, ItemCreateDTO]] = []
+        max_tag_length = Tag.__table__.c.name.type.length
+        for index, payload in enumerate(payloads):
+            try:
+                data = ItemCreateDTO.model_validate(payload)
+            except ValidationError as e:
+                message = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+                results[index] = ItemBatchResult(index=index, error=message)
+                continue
+            if any(not name or len(name) > max_tag_length for name in data.tags or []):
+                results[index] = ItemBatchResult(index=index, error=f"Tag names must have 1 to {max_tag_length} characters")
+                continue
+            valid.append((index, data))
+
+        created = self.repository.create_many([data for _, data in valid]) if valid else []
+        for (index, data), (item_id, error) in zip(valid, created):
+            results[index] = ItemBatchResult(index=index, id=item_id, error=error)
+            if item_id is not None:
+                tag_index.set_item_tags(item_id, data.tags or [])
+
+        created_count = sum(1 for result in results if result.id is not None)
+        return ItemBatchResponse(created=created_count, failed=len(results) - created_count, results=results)
+
+    def get_item(self, item_id: int, fields: Optional[FrozenSet[str]] = None) -> ItemResponse:
+        if fields is not None:
+            # Sparse items are cheap to load and not worth a cache entry each
+            result = self.repository.get_with_stats(item_id, fields)
+        else:
+            result = item_cache.get_or_load(item_id, lambda: self.repository.get_with_stats(item_id))
         if not result:
             raise ValueError("Item not found")
         return result
+
+    def get_item_marker(self, item_id: int):
+        """(version, updated_at, rating_version, ratings_updated_at) of an item, None if it does not exist"""
+        return self.repository.version_marker(item_id)
+
+    def get_catalog_marker(self):
+        """(items_version, items_updated_at, ratings_updated_at) : changes whenever any listed item does"""
+        return self.repository.catalog_marker()
+
+    def warm_cache(self, top_n: int) -> int:
+        """Load the top_n most rated items into the cache, return how many were loaded"""
+        item_ids = self.repository.most_rated_ids(top_n)
+        for item_id in item_ids:
+            self.get_item(item_id)
+        return len(item_ids)
     
     def list_items(
         self,
         category_id: Optional[int] = None,
-        tag_names: Optional[List[str]] = None
-    ) -> List[Tuple[Item, float, int]]:
-        return self.repository.list_with_stats(category_id, tag_names)
-    
+        tag_names: Optional[List[str]] = None,
+        limit: int = 50,
+        after: Optional[str] = None,
+        all_tags: Optional[List[str]] = None,
+        exclude_tags: Optional[List[str]] = None,
+        fields: Optional[FrozenSet[str]] = None
+    ) -> Tuple[List[ItemResponse], Optional[str]]:
+        """
+        Return one page of items with their stats and the cursor of the next page
+
+        Args:
+            tag_names: Keep items having at least one of these tags
+            all_tags: Keep items having all of these tags
+            exclude_tags: Drop items having any of these tags
+            fields: Only load these fields, items are then plain dicts
+
+        Raises:
+            ValueError: if the cursor is malformed
+        """
+        keyset = decode_keyset_cursor(after) if after else None
+        # The cursor needs created_at even when it was not requested
+        loaded = fields | {"created_at"} if fields is not None else None
+        if tag_names or all_tags or exclude_tags:
+            rows = self._list_tagged(category_id, tag_names, all_tags, exclude_tags, limit + 1, keyset, loaded)
+        else:
+            # Fetch one extra row to know if there is a next page
+            rows = self.repository.list_with_stats(category_id, limit + 1, keyset, loaded)
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            if fields is None:
+                next_cursor = encode_cursor(last.created_at, last.id)
+            else:
+                next_cursor = encode_cursor(last["created_at"], last["id"])
+        if fields is not None and "created_at" not in fields:
+            for row in rows:
+                del row["created_at"]
+        return rows, next_cursor
+
+    def _list_tagged(self, category_id, any_tags, all_tags, exclude_tags, limit, keyset, fields) -> List[ItemResponse]:
+        """
+        Resolve tag filters on the in-memory tag index, only the page is loaded
+
+        The index walks ids in increasing order, which is the creation order
+        the untagged listing uses, so both share the same cursors.
+        """
+        bitmap = tag_index.query(self.db, all_tags, any_tags, exclude_tags)
+        candidates = iter_bits(bitmap, keyset[1] if keyset else 0)
+        if category_id is None:
+            return self.repository.get_many_with_stats(list(islice(candidates, limit)), fields)
+
+        page_ids: List[int] = []
+        while len(page_ids) < limit:
+            chunk = list(islice(candidates, 500))
+            if not chunk:
+                break
+            page_ids.extend(self.repository.filter_in_category(chunk, category_id))
+        return self.repository.get_many_with_stats(page_ids[:limit], fields)
+
+    def search_items(
+        self,
+        query: str,
+        limit: int = 50,
+        after: Optional[str] = None,
+        fields: Optional[FrozenSet[str]] = None
+    ) -> Tuple[List[ItemResponse], Optional[str]]:
+        """
+        Return one page of the items matching a full-text query, best matches first
+
+        Raises:
+            ValueError: if the query has no searchable word or the cursor is malformed
+        """
+        terms = search_terms(query)
+        if not terms:
+            raise ValueError("Search query must contain at least one word")
+        keyset = decode_rank_cursor(after) if after else None
+        hits = self.search.search(terms, limit + 1, keyset)
+        next_cursor = None
+        if len(hits) > limit:
+            hits = hits[:limit]
+            last_id, last_rank = hits[-1]
+            next_cursor = encode_cursor(last_rank, last_id)
+        return self.repository.get_many_with_stats([item_id for item_id, _ in hits], fields), next_cursor
+
+    def top_items(self, category_id: Optional[int] = None, limit: int = 10) -> List[TopItemResponse]:
+        """Best rated items of a category (of the whole catalog without category), read from the leaderboards"""
+        board = ALL_CATEGORIES if category_id is None else category_id
+        return [
+            TopItemResponse.model_construct(**dict(item), score=score)
+            for item, score in self.repository.top_with_stats(board, limit)
+        ]
 
     def update_item(self, item_id: int, item_data: ItemUpdateDTO) -> Optional[Item]:
-        return self.repository.update(item_id, item_data)
+        with UnitOfWork(self.db):
+            item = self.repository.update(item_id, item_data)
+        invalidate_items([item_id])
+        return item
 
     def delete_item(self, item_id: int) -> bool:
-        return self.repository.delete(item_id)
+        with UnitOfWork(self.db):
+            deleted = self.repository.delete(item_id)
+        invalidate_items([item_id])
+        if deleted:
+            tag_index.remove_item(item_id)
+        return deleted
     
+    def _get_entity(self, item_id: int) -> Item:
+        item = self.repository.get_by_id(item_id)
+        if not item:
+            raise ValueError("Item not found")
+        return item
+
     def set_item_categories(self, item_id: int, category_ids: list[int]):
-        item = self.get_item(item_id)
-        return self.repository.set_categories(item[0], category_ids)
+        with UnitOfWork(self.db):
+            item = self.repository.set_categories(self._get_entity(item_id), category_ids)
+        invalidate_items([item_id])
+        return item
     
     def set_item_tags(self, item_id: int, tag_names: list[str]):
-        item = self.get_item(item_id)[0]
-        return self.repository.set_tags(item, tag_names)
+        with UnitOfWork(self.db):
+            item = self.repository.set_tags(self._get_entity(item_id), tag_names)
+        invalidate_items([item_id])
+        tag_index.set_item_tags(item_id, tag_names)
+        return item
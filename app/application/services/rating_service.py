@@ -1,21 +1,67 @@
 # app/application/services/rating_service.py
 
-from typing import List, Optional, Dict, Any
+from datetime import date, datetime, timezone
+from typing import Callable, List, Optional, Dict, Any, Tuple
 from sqlalchemy.orm import Session
 from sqlalchemy import func, desc
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy.exc import IntegrityError
 from app.domain.rating import Rating
 from app.domain.item import Item
 from app.domain.user import User
 from app.domain.category import Category
+from app.domain.distinct_sketch import DISTINCT_COUNT_WINDOWS, ITEM_RATERS, SKETCH_PRECISION, window_start
+from app.config import settings
+from app.application.pagination import decode_keyset_cursor, encode_cursor
+from app.infrastructure.cache import CacheRegion
+from app.infrastructure.hyperloglog import relative_error
 from app.infrastructure.repositories.rating_repository import RatingRepository
+from app.infrastructure.repositories.rating_rollup_repository import RatingRollupRepository
+from app.infrastructure.unit_of_work import UnitOfWork
+from app.application.services.item_service import invalidate_items
 from app.application.schemas.rating_dto import (
-    RatingCreateDTO, RatingUpdateDTO, 
+    RatingCreateDTO, RatingUpdateDTO, RatingResponse, RatingPageResponse, RatingBatchResponse, RatingBatchResult,
+    ItemRatingSummaryResponse, RatingBucketDTO, DistinctCountDTO, DistinctCountResponse,
     RatingDistributionDTO, RecentRatingDTO, RatingStatsDTO, TopCategoryDTO
 )
 
+# Admin analytics by period, shared by the workers until the rollups move on
+distribution_cache = CacheRegion(
+    "rating-distribution", settings.ANALYTICS_CACHE_TTL_SECONDS, TypeAdapter(List[RatingDistributionDTO])
+)
+stats_cache = CacheRegion("rating-stats", settings.ANALYTICS_CACHE_TTL_SECONDS, TypeAdapter(RatingStatsDTO))
+
+# Validates a whole POST /ratings/batch payload in one call
+RATING_BATCH = TypeAdapter(List[RatingCreateDTO])
+
+def analytics_period(start: Optional[datetime], end: Optional[datetime]) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """
+    Bounds of an analytics period as naive UTC, like the rollup periods
+
+    Raises:
+        ValueError: if the period ends before it starts
+    """
+    start, end = (
+        moment.astimezone(timezone.utc).replace(tzinfo=None) if moment and moment.tzinfo else moment
+        for moment in (start, end)
+    )
+    if start and end and end <= start:
+        raise ValueError("The end of the period must be after its start")
+    return start, end
+
+def distinct_counts(count: Callable[[date], int], exact: bool) -> DistinctCountResponse:
+    """Distinct counts over every window, count(first day of the window) computing one"""
+    return DistinctCountResponse(
+        exact=exact,
+        relative_error=0.0 if exact else round(relative_error(SKETCH_PRECISION), 4),
+        windows=[DistinctCountDTO(days=days, count=count(window_start(days))) for days in DISTINCT_COUNT_WINDOWS],
+    )
+
 class RatingService:
     def __init__(self, db_session: Session):
+        self.db = db_session
         self.repository = RatingRepository(db_session)
+        self.rollups = RatingRollupRepository(db_session)
 
     def get_user_rating_for_item(self, user_id: int, item_id: int) -> Rating:
         rating = self.repository.get_by_user_and_item(user_id, item_id)
@@ -23,31 +69,168 @@ class RatingService:
             raise ValueError("Rating not found")
         return rating
     
-    def create_rating(self, dto: RatingCreateDTO) -> Rating:
-        # 1) check duplicate
-        existing = self.repository.get_by_user_and_item(dto.user_id, dto.item_id)
-        if existing:
-            raise ValueError("You have already rated this item.")
-        # 2) create new
-        return self.repository.create(dto)
+    def create_rating(self, dto: RatingCreateDTO) -> RatingResponse:
+        with UnitOfWork(self.db):
+            rating = self.repository.create(dto)
+            if rating is None:
+                raise ValueError("You have already rated this item.")
+            # Read from the RETURNING row, the commit expires the instance
+            result = RatingResponse.model_validate(rating)
+        invalidate_items([result.item_id])
+        return result
+
+    def upsert_rating(self, dto: RatingCreateDTO) -> Tuple[RatingResponse, bool]:
+        """Create the rating or overwrite the user's existing one, return (rating, created)"""
+        with UnitOfWork(self.db):
+            rating, created = self.repository.upsert(dto)
+            result = RatingResponse.model_validate(rating)
+        invalidate_items([result.item_id])
+        return result, created
+
+    def ingest_ratings(self, payloads: List[Dict[str, Any]]) -> RatingBatchResponse:
+        """
+        Insert a batch of ratings, reporting the status of every row
+
+        Rows are validated in one pass, users, items and duplicates are
+        checked with set-based queries, then the valid rows are inserted and
+        committed RATING_BATCH_CHUNK_SIZE at a time. A rejected row does not
+        reject the batch.
+        """
+        errors: Dict[int, str] = {}
+        try:
+            ratings = dict(enumerate(RATING_BATCH.validate_python(payloads)))
+        except ValidationError as e:
+            for err in e.errors():
+                index, *loc = err["loc"]
+                message = f"{'.'.join(map(str, loc))}: {err['msg']}" if loc else err["msg"]
+                errors[index] = f"{errors[index]}; {message}" if index in errors else message
+            # Only the rows left are validated again
+            indexes = [index for index in range(len(payloads)) if index not in errors]
+            ratings = dict(zip(indexes, RATING_BATCH.validate_python([payloads[index] for index in indexes])))
+
+        users = self.repository.existing_ids(User, (rating.user_id for rating in ratings.values()))
+        items = self.repository.existing_ids(Item, (rating.item_id for rating in ratings.values()))
+        rated = self.repository.existing_pairs((rating.user_id, rating.item_id) for rating in ratings.values())
+        pending: List[Tuple[int, RatingCreateDTO]] = []
+        for index, rating in ratings.items():
+            pair = (rating.user_id, rating.item_id)
+            if rating.user_id not in users:
+                errors[index] = "User not found"
+            elif rating.item_id not in items:
+                errors[index] = "Item not found"
+            elif pair in rated:
+                errors[index] = "The user has already rated this item."
+            else:
+                # The first rating of a pair wins within the batch
+                rated.add(pair)
+                pending.append((index, rating))
+
+        chunk_size = settings.RATING_BATCH_CHUNK_SIZE
+        for start in range(0, len(pending), chunk_size):
+            self._insert_chunk(pending[start:start + chunk_size], errors)
+
+        invalidate_items({rating.item_id for index, rating in pending if index not in errors})
+        results = [
+            RatingBatchResult(index=index, created=index not in errors, error=errors.get(index))
+            for index in range(len(payloads))
+        ]
+        return RatingBatchResponse(created=len(payloads) - len(errors), failed=len(errors), results=results)
+
+    def _insert_chunk(self, chunk: List[Tuple[int, RatingCreateDTO]], errors: Dict[int, str]) -> None:
+        while chunk:
+            try:
+                with UnitOfWork(self.db):
+                    self.repository.insert_many([rating for _, rating in chunk])
+                return
+            except IntegrityError:
+                # Pairs rated concurrently since the duplicate check : drop them and retry
+                taken = self.repository.existing_pairs((rating.user_id, rating.item_id) for _, rating in chunk)
+                if not taken:
+                    raise
+                for index, rating in chunk:
+                    if (rating.user_id, rating.item_id) in taken:
+                        errors[index] = "The user has already rated this item."
+                chunk = [(index, rating) for index, rating in chunk if index not in errors]
 
     def get_rating_by_id(self, rating_id: int) -> Optional[Rating]:
         return self.repository.get_by_id(rating_id)
     
-    def get_ratings_by_item_id(self, item_id: int) -> list:
-        return self.repository.get_ratings_by_item_id(item_id)
+    def list_ratings_page(
+        self,
+        limit: int = 50,
+        after: Optional[str] = None,
+        item_id: Optional[int] = None,
+        user_id: Optional[int] = None,
+        min_value: Optional[float] = None,
+        max_value: Optional[float] = None,
+        has_comment: Optional[bool] = None
+    ) -> RatingPageResponse:
+        """
+        Return one page of ratings, most recent first, and the cursor of the next page
 
-    def list_ratings(self) -> List[Rating]:
-        return self.repository.list()
-    
-    def list_user_ratings(self, user_id: int) -> list:
-        return self.repository.get_ratings_by_user_id(user_id)
+        Raises:
+            ValueError: if the cursor is malformed
+        """
+        keyset = decode_keyset_cursor(after) if after else None
+        # Fetch one extra row to know if there is a next page
+        rows = self.repository.list_page(limit + 1, keyset, item_id, user_id, min_value, max_value, has_comment)
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+        return RatingPageResponse.model_validate({"items": rows, "next_cursor": next_cursor}, from_attributes=True)
+
+    def get_item_summary(self, item_id: int) -> ItemRatingSummaryResponse:
+        """
+        Count, mean, half-star histogram and last rating time of an item,
+        read from its maintained stats : the ratings themselves are not loaded
+
+        Raises:
+            ValueError: if the item does not exist
+        """
+        summary = self.repository.stats.summary(item_id)
+        if summary is None:
+            raise ValueError("Item not found")
+        return ItemRatingSummaryResponse(
+            item_id=item_id,
+            count=summary.rating_count,
+            mean=summary.rating_sum / summary.rating_count if summary.rating_count else 0.0,
+            histogram=[
+                RatingBucketDTO(value=bucket / 2, count=count)
+                for bucket, count in enumerate(self.repository.stats.histogram(item_id))
+            ],
+            last_rated_at=summary.last_rated_at,
+        )
+
+    def get_item_raters(self, item_id: int, exact: bool = False) -> DistinctCountResponse:
+        """
+        Users who rated the item over the last 1, 7, 30 and 90 days, estimated
+        from its daily sketches, or counted from the ratings when exact
+
+        Raises:
+            ValueError: if the item does not exist
+        """
+        if self.repository.stats.summary(item_id) is None:
+            raise ValueError("Item not found")
+        distinct = self.repository.distinct
+        if exact:
+            return distinct_counts(lambda since: distinct.exact_item_raters(item_id, since), exact)
+        return distinct_counts(lambda since: distinct.estimate(ITEM_RATERS, item_id, since), exact)
 
     def update_rating(self, rating_id: int, rating_data: RatingUpdateDTO) -> Optional[Rating]:
-        return self.repository.update(rating_id, rating_data)
+        rating = self.repository.update(rating_id, rating_data)
+        if rating:
+            invalidate_items([rating.item_id])
+        return rating
 
     def delete_rating(self, rating_id: int) -> bool:
-        return self.repository.delete(rating_id)
+        rating = self.repository.get_by_id(rating_id)
+        if not rating:
+            return False
+        item_id = rating.item_id
+        deleted = self.repository.delete(rating_id)
+        invalidate_items([item_id])
+        return deleted
 
     def remove_comment(self, rating_id: int):
         """
@@ -71,14 +254,30 @@ class RatingService:
         
         return updated_rating
 
-    def get_rating_distribution(self) -> List[Dict[str, Any]]:
-        """Get distribution of ratings across values 1-5"""
-        return self.repository.get_rating_distribution()
+    def _analytics_key(self, granularity: str, start: Optional[datetime], end: Optional[datetime]) -> str:
+        # Rollups only change when the watermark moves : no invalidation on rating writes
+        return f"{self.rollups.watermark()}|{granularity}|{start}|{end}"
+
+    def get_rating_distribution(
+        self, start: Optional[datetime] = None, end: Optional[datetime] = None, granularity: str = "day"
+    ) -> List[RatingDistributionDTO]:
+        """Get distribution of ratings across values 1-5, from the rollups of the period"""
+        start, end = analytics_period(start, end)
+        return distribution_cache.get_or_load(
+            self._analytics_key(granularity, start, end),
+            lambda: self.rollups.get_rating_distribution(granularity, start, end)
+        )
 
     def get_recent_ratings(self, limit: int = 10) -> List[Dict[str, Any]]:
         """Get most recent ratings with user and item information"""
         return self.repository.get_recent_ratings(limit)
 
-    def get_rating_stats(self) -> Dict[str, Any]:
-        """Get overall rating statistics"""
-        return self.repository.get_rating_stats()
+    def get_rating_stats(
+        self, start: Optional[datetime] = None, end: Optional[datetime] = None, granularity: str = "day"
+    ) -> RatingStatsDTO:
+        """Get overall rating statistics, from the rollups of the period"""
+        start, end = analytics_period(start, end)
+        return stats_cache.get_or_load(
+            self._analytics_key(granularity, start, end),
+            lambda: self.rollups.get_rating_stats(granularity, start, end)
+        )
@@ -1,11 +1,16 @@
 from sqlalchemy.orm import Session
+from app.application.services.item_service import invalidate_items
+from app.infrastructure.repositories.item_repository import ItemRepository
 from app.infrastructure.repositories.tag_repository import TagRepository
+from app.infrastructure.tag_index import tag_index
+from app.infrastructure.unit_of_work import UnitOfWork
 from app.application.schemas.tag_dto import TagDTO
 
 class TagService:
     def __init__(self, db: Session):
         self.db = db
         self.repository = TagRepository(db)
+        self.items = ItemRepository(db)
 
     def list_tags(self) -> list[TagDTO]:
         return self.repository.list()
@@ -17,7 +22,19 @@ class TagService:
         return self.repository.create(name)
 
     def update_tag(self, tag_id: int, name: str) -> TagDTO:
-        return self.repository.update(tag_id, name)
+        # Items embed their tags : their version is bumped in the same transaction
+        with UnitOfWork(self.db):
+            item_ids = self.repository.item_ids(tag_id)
+            self.items.touch(item_ids)
+            tag = self.repository.update(tag_id, name)
+        invalidate_items(item_ids)
+        tag_index.invalidate()
+        return tag
 
     def delete_tag(self, tag_id: int) -> None:
-        self.repository.delete(tag_id)
+        with UnitOfWork(self.db):
+            item_ids = self.repository.item_ids(tag_id)
+            self.items.touch(item_ids)
+            self.repository.delete(tag_id)
+        invalidate_items(item_ids)
+        tag_index.invalidate()
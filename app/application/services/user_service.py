@@ -4,11 +4,19 @@ from sqlalchemy.orm import Session
 from app.api.security import verify_password
 from app.domain.user import User
 from app.infrastructure.repositories.user_repository import UserRepository
-from app.application.schemas.user_dto import UserCreateDTO, UserUpdateDTO
+from app.application.services.item_service import invalidate_items
+from app.application.services.rating_service import analytics_period, distinct_counts
+from app.domain.distinct_sketch import ACTIVE_USERS
+from app.infrastructure.repositories.distinct_count_repository import DistinctCountRepository
+from app.infrastructure.repositories.rating_rollup_repository import RatingRollupRepository
+from app.application.schemas.rating_dto import DistinctCountResponse
+from app.application.schemas.user_dto import UserCreateDTO, UserUpdateDTO, UserEngagementDTO
 
 class UserService:
     def __init__(self, db_session: Session):
         self.repository = UserRepository(db_session)
+        self.rollups = RatingRollupRepository(db_session)
+        self.distinct = DistinctCountRepository(db_session)
 
     def create_user(self, user_data: UserCreateDTO) -> User:
         # Vérifier si l'email existe déjà
@@ -38,16 +46,32 @@ class UserService:
         return self.repository.update(user_id, user_data)
 
     def delete_user(self, user_id: int) -> bool:
-        return self.repository.delete(user_id)
+        # Deleting the user cascades to their ratings and changes the items stats
+        item_ids = self.repository.rated_item_ids(user_id)
+        deleted = self.repository.delete(user_id)
+        invalidate_items(item_ids)
+        return deleted
 
     def get_user_growth(self, days: int = 30) -> List[Dict[str, Any]]:
         """Get user growth data for the specified number of days"""
         return self.repository.get_user_growth(days)
 
-    def get_user_engagement(self, limit: int = 10) -> List[Dict[str, Any]]:
-        """Get most engaged users based on rating activity"""
-        return self.repository.get_user_engagement(limit)
+    def get_user_engagement(
+        self, limit: int = 10, start: Optional[datetime] = None, end: Optional[datetime] = None, granularity: str = "day"
+    ) -> List[UserEngagementDTO]:
+        """Get most engaged users based on rating activity, from the rollups of the period"""
+        start, end = analytics_period(start, end)
+        return self.rollups.get_user_engagement(limit, granularity, start, end)
 
     def get_user_stats(self) -> Dict[str, Any]:
         """Get overall user statistics"""
         return self.repository.get_user_stats()
+
+    def get_active_users(self, exact: bool = False) -> DistinctCountResponse:
+        """
+        Users who wrote a rating over the last 1, 7, 30 and 90 days, estimated
+        from the daily sketches, or counted from the ratings when exact
+        """
+        if exact:
+            return distinct_counts(self.distinct.exact_active_users, exact)
+        return distinct_counts(lambda since: self.distinct.estimate(ACTIVE_USERS, 0, since), exact)
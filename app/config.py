@@ -32,6 +32,69 @@ class Settings(BaseSettings):
     DB_NAME: str = "ratings"
     DB_USER: str = "user"
     DB_PASSWORD: str = "password"
+    # Read replicas, comma separated SQLAlchemy URLs : the read-only endpoints
+    # (listings, analytics, exports) read from them, empty reads the primary
+    DB_REPLICA_URLS: str = ""
+    # "round-robin" or "least-busy" (fewest connections in use)
+    DB_REPLICA_SELECTION: str = "round-robin"
+    # Read-your-writes : after a client commits, its reads go to the primary this long
+    DB_READ_YOUR_WRITES_SECONDS: float = 5.0
+
+    # Pagination
+    PAGE_SIZE_DEFAULT: int = 50
+    PAGE_SIZE_MAX: int = 200
+    # Rows fetched per round trip by the streaming exports
+    EXPORT_BATCH_SIZE: int = 1000
+    # Items accepted by one POST /items/batch
+    ITEM_BATCH_MAX: int = 500
+    # Ratings accepted by one POST /ratings/batch, inserted and committed by chunks
+    RATING_BATCH_MAX: int = 50000
+    RATING_BATCH_CHUNK_SIZE: int = 1000
+    # Write-behind : POST /ratings answers 202 and ratings are written in batches
+    RATING_WRITE_BEHIND: bool = False
+    RATING_BUFFER_SIZE: int = 10000
+    RATING_FLUSH_BATCH_SIZE: int = 500
+    RATING_FLUSH_INTERVAL_SECONDS: float = 0.5
+    RATING_FLUSH_MAX_ATTEMPTS: int = 3
+
+    # Idempotency-Key : "memory" (per worker) or "database" (shared by every worker)
+    IDEMPOTENCY_BACKEND: str = "memory"
+    IDEMPOTENCY_TTL_SECONDS: float = 86400.0
+    IDEMPOTENCY_MAX_ENTRIES: int = 10000
+    # Responses kept by the memory backend, all keys together, and the largest
+    # response kept at all (larger ones are not replayed : retries run again)
+    IDEMPOTENCY_MAX_BYTES: int = 64 * 1024 * 1024
+    IDEMPOTENCY_MAX_BODY_BYTES: int = 1024 * 1024
+    # Claim of a running request, released earlier when it ends
+    IDEMPOTENCY_LOCK_SECONDS: float = 60.0
+    # How long a retry waits for the request it duplicates
+    IDEMPOTENCY_WAIT_SECONDS: float = 10.0
+
+    # Cache : "memory" (per worker) or "redis" (shared by every worker)
+    CACHE_BACKEND: str = "memory"
+    CACHE_REDIS_URL: str = "redis://localhost:6379/0"
+    CACHE_SERIALIZER: str = "json"  # "json" or "json-zlib"
+    CACHE_KEY_PREFIX: str = "rating-api"
+    CACHE_MAX_ENTRIES: int = 10000
+    ITEM_CACHE_TTL_SECONDS: float = 300.0
+    ITEM_CACHE_WARM_TOP_N: int = 100
+    ANALYTICS_CACHE_TTL_SECONDS: float = 30.0
+    # A worker reloads its tag index at most this often, changes of other workers
+    # show in its tag filters after up to that long
+    TAG_INDEX_RELOAD_INTERVAL_SECONDS: float = 1.0
+
+    # Dashboard analytics (rating and user stats) are recomputed in the background
+    # every interval and served from memory (0 : only on ?refresh=true)
+    ANALYTICS_SNAPSHOT_INTERVAL_SECONDS: float = 30.0
+
+    # Rating analytics are read from hourly and daily rollups, brought up to
+    # date every interval (0 : only by python -m app.manage roll-up-ratings)
+    RATING_ROLLUP_INTERVAL_SECONDS: float = 60.0
+
+    # Leaderboards : score = (PRIOR_WEIGHT * PRIOR_MEAN + sum) / (PRIOR_WEIGHT + count)
+    LEADERBOARD_SIZE: int = 100
+    LEADERBOARD_PRIOR_MEAN: float = 3.0
+    LEADERBOARD_PRIOR_WEIGHT: float = 10.0
 
     # JWT
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 1440))
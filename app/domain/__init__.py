@@ -5,4 +5,12 @@ from app.domain.category import Category
 from app.domain.item_category import item_category
 from app.domain.tag import Tag
 from app.domain.item_tag import item_tag
-from app.domain.rating import Rating
\ No newline at end of file
+from app.domain.rating import Rating
+from app.domain.item_rating_stats import ItemRatingStats
+from app.domain.item_rating_bucket import ItemRatingBucket
+from app.domain.category_top_item import CategoryTopItem
+from app.domain.idempotency_key import IdempotencyKey
+from app.domain.rating_rollup import RatingRollup, UserRatingRollup, RollupWatermark, RollupDirtyHour
+from app.domain.distinct_sketch import DistinctSketchRegister
+from app.domain.catalog_version import CatalogVersion
+from app.domain import item_search  # Registers the full-text index DDL
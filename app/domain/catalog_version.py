@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, String
+from app.domain.base import Base
+
+# Bumped when items are created or deleted
+ITEMS = "items"
+# Bumped when the tags of items change, tags renamed or deleted included
+ITEM_TAGS = "item-tags"
+
+class CatalogVersion(Base):
+    """
+    Write counter of a part of the catalog, bumped in the transaction of the write
+
+    One primary key lookup tells readers whether something changed, including
+    deletions, which leave no updated_at behind.
+    """
+    __tablename__ = "catalog_versions"
+
+    name = Column(String(32), primary_key=True)
+    version = Column(Integer, nullable=False, default=0, server_default="0")
+
+    def __repr__(self):
+        return f"<CatalogVersion(name={self.name}, version={self.version})>"
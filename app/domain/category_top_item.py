@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Float, ForeignKey, Index, Integer
+from app.domain.base import Base
+
+# category_id of the leaderboard spanning every item
+ALL_CATEGORIES = 0
+
+class CategoryTopItem(Base):
+    """
+    Entry of a precomputed per-category leaderboard (top LEADERBOARD_SIZE items)
+
+    Maintained on every rating write from the item rating stats, so reading a
+    leaderboard never touches the ratings table.
+    """
+    __tablename__ = "category_top_items"
+    __table_args__ = (
+        Index("ix_category_top_items_rank", "category_id", "score", "item_id"),
+    )
+
+    # No foreign key : ALL_CATEGORIES is not a real category
+    category_id = Column(Integer, primary_key=True)
+    item_id = Column(Integer, ForeignKey("items.id", ondelete="CASCADE"), primary_key=True)
+    score = Column(Float, nullable=False)
+    rating_count = Column(Integer, nullable=False)
+
+    def __repr__(self):
+        return f"<CategoryTopItem(category_id={self.category_id}, item_id={self.item_id}, score={self.score})>"
@@ -0,0 +1,41 @@
+from datetime import date, datetime, timedelta, timezone
+from sqlalchemy import Column, Date, Integer, SmallInteger, String
+from app.domain.base import Base
+
+# 2**12 registers per sketch, a standard error of 1.6 %. Changing it needs
+# python -m app.manage rebuild-distinct-counts : sketches of different
+# precisions do not merge
+SKETCH_PRECISION = 12
+
+# Distinct counts kept : users who wrote a rating (scope 0), users who rated an item (scope : item id)
+ACTIVE_USERS = "active-users"
+ITEM_RATERS = "item-raters"
+
+# Sliding windows answered, in days up to today included
+DISTINCT_COUNT_WINDOWS = (1, 7, 30, 90)
+
+def utc_today() -> date:
+    return datetime.now(timezone.utc).date()
+
+def window_start(days: int) -> date:
+    """First day of the window of the last days, today included"""
+    return utc_today() - timedelta(days=days - 1)
+
+class DistinctSketchRegister(Base):
+    """
+    Register of the HyperLogLog sketch of a distinct count for one UTC day
+
+    A sketch is stored one row per non empty register, raised on every rating
+    write : the sketch of a window is the highest rank of each register over
+    its days (see app.infrastructure.hyperloglog).
+    """
+    __tablename__ = "distinct_sketch_registers"
+
+    metric = Column(String(32), primary_key=True)
+    scope_id = Column(Integer, primary_key=True, autoincrement=False)
+    day = Column(Date, primary_key=True)
+    register = Column(SmallInteger, primary_key=True, autoincrement=False)
+    rank = Column(SmallInteger, nullable=False)
+
+    def __repr__(self):
+        return f"<DistinctSketchRegister({self.metric} {self.scope_id} {self.day}, register={self.register})>"
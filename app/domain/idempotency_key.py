@@ -0,0 +1,23 @@
+from sqlalchemy import Column, DateTime, Integer, LargeBinary, String, Text
+from app.domain.base import Base
+
+class IdempotencyKey(Base):
+    """
+    Response stored for an Idempotency-Key, replayed to the retries of the request
+
+    A row without status_code is a claim : the first request is still running.
+    Rows are ignored, then purged, once expires_at is past.
+    """
+    __tablename__ = "idempotency_keys"
+
+    # sha256 of the key scoped to the client and the endpoint
+    key = Column(String(64), primary_key=True)
+    # sha256 of the request the key was first used with
+    fingerprint = Column(String(64), nullable=False)
+    status_code = Column(Integer, nullable=True)
+    headers = Column(Text, nullable=True)  # JSON list of [name, value]
+    body = Column(LargeBinary, nullable=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<IdempotencyKey(key={self.key}, status_code={self.status_code})>"
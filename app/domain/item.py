@@ -1,5 +1,5 @@
 from datetime import datetime, timezone
-from sqlalchemy import Column, Integer, String, DateTime, Text
+from sqlalchemy import Column, Index, Integer, String, DateTime, Text
 from sqlalchemy.orm import relationship
 from .item_category import item_category
 from .item_tag import item_tag
@@ -7,13 +7,21 @@ from app.domain.base import Base
 
 class Item(Base):
     __tablename__ = 'items'
+    __table_args__ = (
+        # Keyset pagination on GET /items walks (created_at, id)
+        Index("ix_items_created_at_id", "created_at", "id"),
+        # Version marker of the catalog for conditional GET /items
+        Index("ix_items_updated_at", "updated_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(200), nullable=False)
     description = Column(Text, nullable=True)
     image_url = Column(String(500), nullable=True)
-    created_at = Column(DateTime, default=datetime.now(timezone.utc))
-    updated_at = Column(DateTime, default=datetime.now(timezone.utc), onupdate=datetime.now(timezone.utc))
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+    # Compteur d'écritures (champs, catégories, tags) utilisé pour les ETags
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     
     # Relation vers les categories
     categories = relationship("Category",back_populates="items", secondary=item_category)
@@ -21,6 +29,8 @@ class Item(Base):
     tags = relationship("Tag", back_populates="items", secondary=item_tag)
     # Relation vers les ratings
     ratings = relationship("Rating", back_populates="item", cascade="all, delete-orphan")
+    # Agrégats de notes matérialisés
+    rating_stats = relationship("ItemRatingStats", back_populates="item", uselist=False, cascade="all, delete-orphan")
     
     def __repr__(self):
         return f"<Item(id={self.id}, name='{self.name}')>"
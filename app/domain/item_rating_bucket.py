@@ -0,0 +1,31 @@
+import math
+from sqlalchemy import Column, ForeignKey, Integer, SmallInteger
+from app.domain.base import Base
+
+# Ratings go from 0 to 5 : one bucket per half star, 5 has its own
+BUCKET_COUNT = 11
+
+def bucket_of(value: float) -> int:
+    """Half-star bucket of a rating value : 3.7 is in bucket 7, [3.5, 4)"""
+    return min(max(math.floor(value * 2), 0), BUCKET_COUNT - 1)
+
+class ItemRatingBucket(Base):
+    """
+    Number of ratings of an item in a half-star bucket, the histogram of its summary
+
+    Maintained on every rating write along with the item rating stats. Empty
+    buckets may have no row.
+    """
+    __tablename__ = "item_rating_buckets"
+
+    item_id = Column(Integer, ForeignKey("items.id", ondelete="CASCADE"), primary_key=True)
+    # Lower bound of the bucket, in half stars (bucket 7 holds [3.5, 4))
+    bucket = Column(SmallInteger, primary_key=True, autoincrement=False)
+    rating_count = Column(Integer, nullable=False, default=0)
+
+    @property
+    def value(self) -> float:
+        return self.bucket / 2
+
+    def __repr__(self):
+        return f"<ItemRatingBucket(item_id={self.item_id}, bucket={self.bucket}, count={self.rating_count})>"
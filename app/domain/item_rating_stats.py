@@ -0,0 +1,31 @@
+from datetime import datetime, timezone
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Index, Integer
+from sqlalchemy.orm import relationship
+from app.domain.base import Base
+
+class ItemRatingStats(Base):
+    """Rating aggregates of an item, maintained on every rating write"""
+    __tablename__ = "item_rating_stats"
+    __table_args__ = (
+        Index("ix_item_rating_stats_updated_at", "updated_at"),
+    )
+
+    item_id = Column(Integer, ForeignKey("items.id", ondelete="CASCADE"), primary_key=True)
+    rating_sum = Column(Float, nullable=False, default=0.0)
+    rating_count = Column(Integer, nullable=False, default=0)
+    rating_min = Column(Float, nullable=True)
+    rating_max = Column(Float, nullable=True)
+    # Bumped by every write on the item's ratings, comments included
+    version = Column(Integer, nullable=False, default=0, server_default="0")
+    # Last rating write on the item, comment-only edits included : the latest ratings.updated_at
+    last_rated_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+
+    item = relationship("Item", back_populates="rating_stats")
+
+    @property
+    def avg_rating(self) -> float:
+        return self.rating_sum / self.rating_count if self.rating_count else 0.0
+
+    def __repr__(self):
+        return f"<ItemRatingStats(item_id={self.item_id}, count={self.rating_count}, sum={self.rating_sum})>"
@@ -0,0 +1,38 @@
+"""
+Full-text index over Item.name and Item.description
+
+SQLite : an FTS5 table (items_fts, rowid = items.id) kept in sync by triggers
+on items, so every write path (API, seeders, bulk inserts) updates it in the
+transaction of the write.
+PostgreSQL : a GIN index on a tsvector expression of the row, which the
+database maintains by itself. Queries must use SEARCH_DOCUMENT_PG verbatim
+for the planner to pick the index.
+"""
+from sqlalchemy import DDL, event
+from app.domain.item import Item
+
+SEARCH_DOCUMENT_PG = "to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(description, ''))"
+
+SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5("
+    "name, description, content='items', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS items_fts_ai AFTER INSERT ON items BEGIN "
+    "INSERT INTO items_fts(rowid, name, description) VALUES (new.id, new.name, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS items_fts_ad AFTER DELETE ON items BEGIN "
+    "INSERT INTO items_fts(items_fts, rowid, name, description) VALUES ('delete', old.id, old.name, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS items_fts_au AFTER UPDATE OF name, description ON items BEGIN "
+    "INSERT INTO items_fts(items_fts, rowid, name, description) VALUES ('delete', old.id, old.name, old.description); "
+    "INSERT INTO items_fts(rowid, name, description) VALUES (new.id, new.name, new.description); END",
+]
+
+POSTGRESQL_DDL = [
+    f"CREATE INDEX IF NOT EXISTS ix_items_search ON items USING gin ({SEARCH_DOCUMENT_PG})",
+]
+
+for statement in SQLITE_DDL:
+    event.listen(Item.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+for statement in POSTGRESQL_DDL:
+    event.listen(Item.__table__, "after_create", DDL(statement).execute_if(dialect="postgresql"))
+
+# The triggers go away with the items table, the FTS table must be dropped explicitly
+event.listen(Item.__table__, "before_drop", DDL("DROP TABLE IF EXISTS items_fts").execute_if(dialect="sqlite"))
@@ -1,7 +1,7 @@
 # app/domain/models.py
 
 from datetime import datetime, timezone
-from sqlalchemy import Column, Integer, Float, String, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, Float, String, DateTime, ForeignKey, Index, Text, text
 from sqlalchemy.orm import relationship, declarative_base
 from app.domain.base import Base
 
@@ -13,12 +13,29 @@ class Rating(Base):
     comment = Column(Text, nullable=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     item_id = Column(Integer, ForeignKey("items.id"), nullable=False)
-    created_at = Column(DateTime, default=datetime.now(timezone.utc))
-    updated_at = Column(DateTime, default=datetime.now(timezone.utc), onupdate=datetime.now(timezone.utc))
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
     
     # Relations
     user = relationship("User", back_populates="ratings")
     item = relationship("Item", back_populates="ratings")
+
+    __table_args__ = (
+        # One rating per user and item, also the conflict target of the rating upsert
+        Index("uq_ratings_user_item", "user_id", "item_id", unique=True),
+        # Pages of the ratings of an item / of a user, most recent first : the
+        # value is in the index so that min_value / max_value filter index entries
+        Index("ix_ratings_item_id_created_at", "item_id", "created_at", "value"),
+        Index("ix_ratings_user_id_created_at", "user_id", "created_at", "value"),
+        # Pages of the commented ratings of an item
+        Index(
+            "ix_ratings_item_id_commented", "item_id", "created_at",
+            sqlite_where=text("comment IS NOT NULL"), postgresql_where=text("comment IS NOT NULL")
+        ),
+        Index("ix_ratings_created_at", "created_at"),
+        # Ratings changed since the rollup watermark
+        Index("ix_ratings_updated_at", "updated_at"),
+    )
     
     def __repr__(self):
         return f"<Rating(id={self.id}, value={self.value}, user_id={self.user_id}, item_id={self.item_id})>"
@@ -0,0 +1,70 @@
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Integer, SmallInteger, String
+from app.domain.base import Base
+
+# Rollup periods, from the finest
+GRANULARITIES = ("hour", "day")
+
+class RatingRollup(Base):
+    """
+    Ratings created during an hour or a day, by item and half-star bucket
+
+    Filled by the rollup job (RatingRollupRepository.roll_up) : the analytics
+    endpoints read these rows instead of the ratings table.
+    """
+    __tablename__ = "rating_rollups"
+
+    granularity = Column(String(8), primary_key=True)
+    period_start = Column(DateTime, primary_key=True)
+    item_id = Column(Integer, ForeignKey("items.id", ondelete="CASCADE"), primary_key=True)
+    # Half-star bucket of the values, see item_rating_bucket.bucket_of
+    bucket = Column(SmallInteger, primary_key=True, autoincrement=False)
+    rating_count = Column(Integer, nullable=False)
+    rating_sum = Column(Float, nullable=False)
+
+    def __repr__(self):
+        return f"<RatingRollup({self.granularity} {self.period_start}, item_id={self.item_id}, bucket={self.bucket})>"
+
+class UserRatingRollup(Base):
+    """Ratings given by a user during an hour or a day, filled along with RatingRollup"""
+    __tablename__ = "user_rating_rollups"
+
+    granularity = Column(String(8), primary_key=True)
+    period_start = Column(DateTime, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    rating_count = Column(Integer, nullable=False)
+    # Creation time of the user's last rating of the period
+    last_rated_at = Column(DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<UserRatingRollup({self.granularity} {self.period_start}, user_id={self.user_id})>"
+
+class RollupWatermark(Base):
+    """Time of the last run of the rollup job, none before the first one"""
+    __tablename__ = "rollup_watermarks"
+
+    name = Column(String(64), primary_key=True)
+    watermark = Column(DateTime, nullable=False)
+
+class RollupDirtyHour(Base):
+    """
+    Hour whose ratings changed since the last run of the rollup job
+
+    Written in the transaction of every rating write by the repositories
+    (RatingRollupRepository.mark_dirty), deletions of users and items
+    included : code writing ratings elsewhere, raw SQL for instance, must
+    mark the hours itself, or the rollups miss the change until rebuilt
+    (python -m app.manage rebuild-rating-rollups).
+    """
+    __tablename__ = "rollup_dirty_hours"
+
+    id = Column(Integer, primary_key=True)
+    period_start = Column(DateTime, nullable=False)
+
+def hour_of(moment: datetime) -> datetime:
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+def day_of(moment: datetime) -> datetime:
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+PERIOD_OF = {"hour": hour_of, "day": day_of}
@@ -1,5 +1,5 @@
 from datetime import datetime, timezone
-from sqlalchemy import Column, Integer, Float, String, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, Float, String, DateTime, ForeignKey, Index, Text
 from sqlalchemy.orm import relationship, declarative_base
 from app.domain.base import Base
 
@@ -20,6 +20,11 @@ class User(Base):
     
     # Add the relationship to RefreshToken
     refresh_tokens = relationship("RefreshToken", back_populates="user", cascade="all, delete-orphan")
+
+    __table_args__ = (
+        # Sign-ups per day
+        Index("ix_users_created_at", "created_at"),
+    )
     
     def __repr__(self):
         return f"<User(id={self.id}, name='{self.name}', email='{self.email}')>"
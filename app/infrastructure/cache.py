@@ -0,0 +1,291 @@
+import logging
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Iterable, List, Optional
+import redis
+from prometheus_client import Counter, Gauge
+from pydantic import TypeAdapter
+from app.config import settings
+
+# Exposed on /metrics by the Prometheus instrumentator (default registry)
+CACHE_HITS = Counter("cache_hits_total", "Cache lookups served from the cache", ["cache"])
+CACHE_MISSES = Counter("cache_misses_total", "Cache lookups that missed", ["cache"])
+CACHE_EVICTIONS = Counter("cache_evictions_total", "Entries evicted because the cache was full", ["cache"])
+CACHE_ENTRIES = Gauge("cache_entries", "Entries currently held by the cache", ["cache"])
+
+_MISSING = object()
+
+
+class LRUTTLCache:
+    """
+    Bounded in-process cache : least recently used entries are evicted once
+    maxsize is reached and entries expire ttl seconds after being stored.
+    count_lookups=False leaves hits and misses to the caller, e.g. the cache
+    regions of a backend, so that each lookup is counted once.
+    """
+
+    def __init__(self, name: str, maxsize: int = 1024, ttl: float = 60.0, count_lookups: bool = True):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.count_lookups = count_lookups
+        self._entries: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is not _MISSING and entry[0] > now:
+                self._entries.move_to_end(key)
+                if self.count_lookups:
+                    self.hits += 1
+                    CACHE_HITS.labels(self.name).inc()
+                return entry[1]
+            if entry is not _MISSING:
+                # Expired
+                del self._entries[key]
+                CACHE_ENTRIES.labels(self.name).set(len(self._entries))
+            if self.count_lookups:
+                self.misses += 1
+                CACHE_MISSES.labels(self.name).inc()
+            return default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        if self.maxsize <= 0:
+            return
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+                CACHE_EVICTIONS.labels(self.name).inc()
+            CACHE_ENTRIES.labels(self.name).set(len(self._entries))
+
+    def delete(self, key: Hashable) -> None:
+        self.delete_many([key])
+
+    def delete_many(self, keys: Iterable[Hashable]) -> None:
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+            CACHE_ENTRIES.labels(self.name).set(len(self._entries))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            CACHE_ENTRIES.labels(self.name).set(0)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._entries.get(key, _MISSING)
+        return entry is not _MISSING and entry[0] > time.monotonic()
+
+
+# ------------------------------
+# Shared cache backends
+# ------------------------------
+
+logger = logging.getLogger(__name__)
+
+
+class CacheBackend(ABC):
+    """Key/value store behind the cache regions"""
+
+    # Backends living in the worker process keep values as Python objects,
+    # networked ones only store serialized bytes
+    stores_objects = False
+
+    @abstractmethod
+    def get(self, key: str) -> Any:
+        """Value of key, None if missing or expired"""
+
+    @abstractmethod
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        """Store value under key for ttl seconds"""
+
+    @abstractmethod
+    def get_version(self, key: str) -> int:
+        """Current value of the counter key, 0 if never incremented"""
+
+    @abstractmethod
+    def incr(self, key: str) -> int:
+        """Increment the counter key, return its new value"""
+
+    @abstractmethod
+    def delete_many(self, keys: List[str]) -> None:
+        """Delete the given keys, missing ones included"""
+
+
+class InMemoryCacheBackend(CacheBackend):
+    """Per-process backend, values are shared by the threads of one worker only"""
+    stores_objects = True
+
+    def __init__(self, maxsize: int = 10000):
+        # Hits and misses are counted by the regions, evictions and entries here
+        self.entries = LRUTTLCache("memory", maxsize=maxsize, count_lookups=False)
+        # Versions are tiny and must never be evicted before the data they guard
+        self.versions: dict = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        return self.entries.get(key)
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        self.entries.set(key, value, ttl)
+
+    def get_version(self, key: str) -> int:
+        return self.versions.get(key, 0)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            self.versions[key] = self.versions.get(key, 0) + 1
+            return self.versions[key]
+
+    def delete_many(self, keys: List[str]) -> None:
+        self.entries.delete_many(keys)
+
+
+class RedisCacheBackend(CacheBackend):
+    """Backend shared by every worker through a Redis compatible server"""
+
+    def __init__(self, url: Optional[str] = None, client: Any = None):
+        if client is None:
+            client = redis.Redis.from_url(url)
+        self.client = client
+
+    def get(self, key: str) -> Any:
+        return self.client.get(key)
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        self.client.set(key, value, px=max(int(ttl * 1000), 1))
+
+    def get_version(self, key: str) -> int:
+        return int(self.client.get(key) or 0)
+
+    def incr(self, key: str) -> int:
+        return self.client.incr(key)
+
+    def delete_many(self, keys: List[str]) -> None:
+        if keys:
+            self.client.delete(*keys)
+
+
+class JSONSerializer:
+    """Serializes DTOs with their TypeAdapter, optionally zlib compressed"""
+
+    def __init__(self, compress: bool = False):
+        self.compress = compress
+
+    def dumps(self, value: Any, adapter: TypeAdapter) -> bytes:
+        data = adapter.dump_json(value)
+        return zlib.compress(data) if self.compress else data
+
+    def loads(self, data: bytes, adapter: TypeAdapter) -> Any:
+        if self.compress:
+            data = zlib.decompress(data)
+        return adapter.validate_json(data)
+
+
+SERIALIZERS = {
+    "json": lambda: JSONSerializer(),
+    "json-zlib": lambda: JSONSerializer(compress=True),
+}
+
+_backend: Optional[CacheBackend] = None
+
+
+def get_cache_backend() -> CacheBackend:
+    global _backend
+    if _backend is None:
+        if settings.CACHE_BACKEND == "redis":
+            _backend = RedisCacheBackend(settings.CACHE_REDIS_URL)
+        else:
+            _backend = InMemoryCacheBackend(settings.CACHE_MAX_ENTRIES)
+    return _backend
+
+
+def configure_cache_backend(backend: Optional[CacheBackend]) -> None:
+    """Replace the process wide backend (None goes back to the settings)"""
+    global _backend
+    _backend = backend
+
+
+class CacheRegion:
+    """
+    Named family of cache entries with versioned keys
+
+    Every key has a version counter stored in the backend and entries are
+    stored under key@version. A write bumps the version, so every worker stops
+    reading the old entry at once, and a reader that loaded the data before
+    the bump stores it under a version nobody will ask for again.
+    """
+
+    def __init__(self, name: str, ttl: float, adapter: TypeAdapter, backend: Optional[CacheBackend] = None):
+        self.name = name
+        self.ttl = ttl
+        self.adapter = adapter
+        self._backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def backend(self) -> CacheBackend:
+        return self._backend or get_cache_backend()
+
+    def _version_key(self, key: Hashable) -> str:
+        return f"{settings.CACHE_KEY_PREFIX}:{self.name}:version:{key}"
+
+    def _data_key(self, key: Hashable, version: int) -> str:
+        return f"{settings.CACHE_KEY_PREFIX}:{self.name}:{key}@{version}"
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        backend = self.backend
+        try:
+            data_key = self._data_key(key, backend.get_version(self._version_key(key)))
+            data = backend.get(data_key)
+        except Exception:
+            logger.warning("Cache backend unavailable, reading through", exc_info=True)
+            return loader()
+
+        if data is not None:
+            self.hits += 1
+            CACHE_HITS.labels(self.name).inc()
+            if backend.stores_objects:
+                return data
+            return serializer().loads(data, self.adapter)
+
+        self.misses += 1
+        CACHE_MISSES.labels(self.name).inc()
+        value = loader()
+        if value is not None:
+            try:
+                payload = value if backend.stores_objects else serializer().dumps(value, self.adapter)
+                backend.set(data_key, payload, self.ttl)
+            except Exception:
+                logger.warning("Cache backend unavailable, value not stored", exc_info=True)
+        return value
+
+    def invalidate(self, keys: Iterable[Hashable]) -> None:
+        backend = self.backend
+        for key in keys:
+            try:
+                version = backend.incr(self._version_key(key))
+                # The previous entry is unreachable, free it right away
+                backend.delete_many([self._data_key(key, version - 1)])
+            except Exception:
+                logger.warning("Cache backend unavailable, %s:%s not invalidated", self.name, key, exc_info=True)
+
+
+def serializer() -> JSONSerializer:
+    return SERIALIZERS[settings.CACHE_SERIALIZER]()
@@ -1,8 +1,10 @@
-from sqlalchemy import URL, create_engine, inspect
+from fastapi import Request
+from sqlalchemy import URL, create_engine, event, inspect
 from sqlalchemy.orm import sessionmaker
 from app.domain.base import Base  # Importer Base depuis le fichier commun
 import app.domain  # Ceci charge les modules user, item, rating via __init__.py
 from app.config import settings
+from app.infrastructure.read_routing import ReadRouter, client_key
 from app.infrastructure.seeders.category_seeder import seed_categories
 from app.infrastructure.seeders.item_seeder import seed_items
 import os
@@ -39,6 +41,16 @@ else:
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Read replicas of the primary, for the read-only endpoints and background reads
+replica_engines = [
+    create_engine(url, connect_args={"check_same_thread": False}) if url.startswith("sqlite") else create_engine(url)
+    for url in (url.strip() for url in settings.DB_REPLICA_URLS.split(","))
+    if url
+]
+read_router = ReadRouter(
+    SessionLocal, replica_engines, settings.DB_REPLICA_SELECTION, settings.DB_READ_YOUR_WRITES_SECONDS
+)
+
 def drop_all_except_users(engine):
     inspector = inspect(engine)
     tables = inspector.get_table_names()
@@ -53,8 +65,25 @@ def init_db():
         print("DEBUG: flushing db")
     Base.metadata.create_all(bind=engine)
 
-def get_db():
+def get_db(request: Request):
     db = SessionLocal()
+    if read_router.replicas:
+        # Read-your-writes : once the client committed, its reads stay on the primary for a while
+        client = client_key(request)
+        event.listen(db, "after_commit", lambda session: read_router.record_write(client))
+    try:
+        yield db
+    finally:
+        db.close()
+
+def get_read_db(request: Request):
+    """
+    Session of the read-only endpoints (listings, analytics, exports)
+
+    On a replica, which may lag behind the primary : endpoints that fill the
+    shared caches or answer right after a write of someone else keep get_db.
+    """
+    db = read_router.session(client_key(request))
     try:
         yield db
     finally:
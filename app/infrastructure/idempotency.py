@@ -0,0 +1,206 @@
+import json
+import threading
+from abc import ABC, abstractmethod
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Callable, List, Optional, Tuple
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.domain.idempotency_key import IdempotencyKey
+
+
+@dataclass
+class IdempotencyRecord:
+    """State of an Idempotency-Key : in flight (status_code None) or its stored response"""
+    fingerprint: str
+    status_code: Optional[int] = None
+    headers: List[Tuple[str, str]] = field(default_factory=list)
+    body: bytes = b""
+
+    @property
+    def completed(self) -> bool:
+        return self.status_code is not None
+
+
+class IdempotencyStore(ABC):
+    """
+    Where the responses of idempotent requests are kept
+
+    claim() must be atomic : of concurrent requests with the same key, only
+    one gets None and runs, the others get the in-flight record.
+    """
+
+    # Stores doing network or disk I/O are called from a worker thread
+    blocking = False
+
+    @abstractmethod
+    def claim(self, key: str, fingerprint: str, lock_seconds: float) -> Optional[IdempotencyRecord]:
+        """Claim the key for lock_seconds, or return its current record"""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[IdempotencyRecord]:
+        """Current record of the key, None if it is free"""
+
+    @abstractmethod
+    def complete(self, key: str, record: IdempotencyRecord, ttl: float) -> None:
+        """Store the response of the claimed key for ttl seconds"""
+
+    @abstractmethod
+    def release(self, key: str) -> None:
+        """Give up a claim, the next retry runs the request again"""
+
+
+class InMemoryIdempotencyStore(IdempotencyStore):
+    """
+    Per-process store : retries are only recognized by the worker that served the request
+
+    Bounded by maxsize keys and max_bytes of stored bodies : the least
+    recently stored keys are evicted first.
+    """
+
+    def __init__(self, maxsize: int = 10000, max_bytes: int = 64 * 1024 * 1024):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[float, IdempotencyRecord]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def _get(self, key: str, now: float) -> Optional[IdempotencyRecord]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= now:
+            self._pop(key)
+            return None
+        return entry[1]
+
+    def _pop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry[1].body)
+
+    def _set(self, key: str, record: IdempotencyRecord, expires_at: float) -> None:
+        self._pop(key)
+        self._entries[key] = (expires_at, record)
+        self._bytes += len(record.body)
+        while len(self._entries) > self.maxsize or self._bytes > self.max_bytes:
+            self._pop(next(iter(self._entries)))
+
+    def claim(self, key: str, fingerprint: str, lock_seconds: float) -> Optional[IdempotencyRecord]:
+        now = time.monotonic()
+        with self._lock:
+            record = self._get(key, now)
+            if record is not None:
+                return record
+            self._set(key, IdempotencyRecord(fingerprint), now + lock_seconds)
+            return None
+
+    def get(self, key: str) -> Optional[IdempotencyRecord]:
+        with self._lock:
+            return self._get(key, time.monotonic())
+
+    def complete(self, key: str, record: IdempotencyRecord, ttl: float) -> None:
+        with self._lock:
+            self._set(key, record, time.monotonic() + ttl)
+
+    def release(self, key: str) -> None:
+        with self._lock:
+            self._pop(key)
+
+
+def _utcnow() -> datetime:
+    # Naive UTC, like the DateTime column stores it
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class DatabaseIdempotencyStore(IdempotencyStore):
+    """Store shared by every worker through the idempotency_keys table"""
+    blocking = True
+
+    def __init__(self, session_factory: Optional[Callable[[], Session]] = None):
+        if session_factory is None:
+            from app.infrastructure.database import SessionLocal
+            session_factory = SessionLocal
+        self.session_factory = session_factory
+
+    @staticmethod
+    def _record(row: IdempotencyKey) -> IdempotencyRecord:
+        return IdempotencyRecord(
+            fingerprint=row.fingerprint,
+            status_code=row.status_code,
+            headers=[tuple(header) for header in json.loads(row.headers or "[]")],
+            body=row.body or b"",
+        )
+
+    def _load(self, db: Session, key: str, now: datetime) -> Optional[IdempotencyRecord]:
+        row = db.scalar(select(IdempotencyKey).where(IdempotencyKey.key == key, IdempotencyKey.expires_at > now))
+        return None if row is None else self._record(row)
+
+    def claim(self, key: str, fingerprint: str, lock_seconds: float) -> Optional[IdempotencyRecord]:
+        now = _utcnow()
+        values = {"key": key, "fingerprint": fingerprint, "expires_at": now + timedelta(seconds=lock_seconds)}
+        with self.session_factory() as db:
+            db.execute(delete(IdempotencyKey).where(IdempotencyKey.key == key, IdempotencyKey.expires_at <= now))
+            dialect = db.get_bind().dialect.name
+            if dialect == "postgresql":
+                statement = postgresql.insert(IdempotencyKey).on_conflict_do_nothing(index_elements=["key"])
+            elif dialect == "sqlite":
+                statement = sqlite.insert(IdempotencyKey).on_conflict_do_nothing(index_elements=["key"])
+            else:
+                statement = insert(IdempotencyKey).prefix_with("IGNORE")
+            claimed = db.execute(statement.values(**values)).rowcount == 1
+            db.commit()
+            return None if claimed else self._load(db, key, now)
+
+    def get(self, key: str) -> Optional[IdempotencyRecord]:
+        with self.session_factory() as db:
+            return self._load(db, key, _utcnow())
+
+    def complete(self, key: str, record: IdempotencyRecord, ttl: float) -> None:
+        with self.session_factory() as db:
+            db.execute(
+                update(IdempotencyKey)
+                .where(IdempotencyKey.key == key)
+                .values(
+                    status_code=record.status_code,
+                    headers=json.dumps(record.headers),
+                    body=record.body,
+                    expires_at=_utcnow() + timedelta(seconds=ttl),
+                )
+            )
+            db.commit()
+
+    def release(self, key: str) -> None:
+        with self.session_factory() as db:
+            db.execute(delete(IdempotencyKey).where(IdempotencyKey.key == key, IdempotencyKey.status_code.is_(None)))
+            db.commit()
+
+    def purge(self) -> int:
+        """Delete the expired keys, return how many"""
+        with self.session_factory() as db:
+            deleted = db.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at <= _utcnow())).rowcount
+            db.commit()
+            return deleted
+
+
+_store: Optional[IdempotencyStore] = None
+
+
+def get_idempotency_store() -> IdempotencyStore:
+    global _store
+    if _store is None:
+        if settings.IDEMPOTENCY_BACKEND == "database":
+            _store = DatabaseIdempotencyStore()
+        else:
+            _store = InMemoryIdempotencyStore(settings.IDEMPOTENCY_MAX_ENTRIES, settings.IDEMPOTENCY_MAX_BYTES)
+    return _store
+
+
+def configure_idempotency_store(store: Optional[IdempotencyStore]) -> None:
+    """Replace the process wide store (None goes back to the settings)"""
+    global _store
+    _store = store
@@ -0,0 +1,100 @@
+import hashlib
+import itertools
+import threading
+from typing import Callable, List, Optional
+from fastapi import Request
+from jose import JWTError, jwt
+from prometheus_client import Counter
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.infrastructure.cache import CacheBackend, get_cache_backend
+
+READ_SESSIONS = Counter("db_read_sessions_total", "Sessions handed out to read-only work", ["target"])
+
+SELECTIONS = ("round-robin", "least-busy")
+
+
+def client_key(request: Request) -> str:
+    """
+    Who sent the request : the authenticated user (the sub of a valid token,
+    hashed), else its address
+
+    Keyed on the user, not the token, so that reads follow the user's own
+    writes across token refreshes and devices.
+    """
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and token:
+        try:
+            subject = jwt.decode(token, settings.APP_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM]).get("sub")
+        except JWTError:
+            subject = None
+        if subject is not None:
+            return "user:" + hashlib.sha256(str(subject).encode()).hexdigest()[:32]
+    return "address:" + (request.client.host if request.client else "anonymous")
+
+
+class ReadRouter:
+    """
+    Hands out the sessions of read-only work, on a replica when there are some
+
+    Replicas are picked round-robin, or least-busy : the one with the fewest
+    connections checked out of its pool. A client that just committed reads
+    the primary for sticky_seconds, so that it sees its own writes whatever
+    the replication lag ; the marks live in the cache backend, shared by every
+    worker with CACHE_BACKEND=redis. Replica sessions carry the primary
+    session factory in session.info["primary"].
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[..., Session],
+        replicas: List[Engine],
+        selection: str = "round-robin",
+        sticky_seconds: float = 5.0,
+        backend: Optional[CacheBackend] = None
+    ):
+        if selection not in SELECTIONS:
+            raise ValueError(f"Unknown replica selection {selection!r}, expected one of {SELECTIONS}")
+        self.session_factory = session_factory
+        self.replicas = list(replicas)
+        self.selection = selection
+        self.sticky_seconds = sticky_seconds
+        self._backend = backend
+        self._turn = itertools.count()
+        self._lock = threading.Lock()
+
+    @property
+    def backend(self) -> CacheBackend:
+        return self._backend or get_cache_backend()
+
+    def _sticky_key(self, client: str) -> str:
+        return f"{settings.CACHE_KEY_PREFIX}:wrote:{client}"
+
+    def record_write(self, client: str) -> None:
+        """The client committed : read the primary for a while"""
+        if self.replicas and self.sticky_seconds > 0:
+            self.backend.set(self._sticky_key(client), b"1", self.sticky_seconds)
+
+    def wrote_recently(self, client: str) -> bool:
+        return self.backend.get(self._sticky_key(client)) is not None
+
+    def _pick(self) -> int:
+        with self._lock:
+            turn = next(self._turn)
+        count = len(self.replicas)
+        if self.selection == "round-robin":
+            return turn % count
+        # Ties are broken in turn, so that idle replicas share the load too
+        order = [(turn + offset) % count for offset in range(count)]
+        return min(order, key=lambda index: getattr(self.replicas[index].pool, "checkedout", lambda: 0)())
+
+    def session(self, client: Optional[str] = None) -> Session:
+        """Session for read-only work of client (None : background work, never sticky)"""
+        if not self.replicas or (client is not None and self.wrote_recently(client)):
+            READ_SESSIONS.labels("primary").inc()
+            return self.session_factory()
+        index = self._pick()
+        READ_SESSIONS.labels(f"replica-{index}").inc()
+        # For the work that must not lag, e.g. the in-memory indexes stamped with primary versions
+        return self.session_factory(bind=self.replicas[index], info={"primary": self.session_factory})
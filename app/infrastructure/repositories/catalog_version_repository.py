@@ -0,0 +1,39 @@
+from typing import Tuple
+from sqlalchemy import insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from app.domain.catalog_version import CatalogVersion
+
+class CatalogVersionRepository:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get(self, name: str) -> int:
+        return self.db.scalar(select(CatalogVersion.version).where(CatalogVersion.name == name)) or 0
+
+    def get_many(self, *names: str) -> Tuple[int, ...]:
+        """Counters of the given names, in one query"""
+        versions = dict(self.db.execute(
+            select(CatalogVersion.name, CatalogVersion.version).where(CatalogVersion.name.in_(names))
+        ).all())
+        return tuple(versions.get(name, 0) for name in names)
+
+    def bump(self, name: str) -> None:
+        """Increment the counter in the current transaction, creating it on the first write"""
+        dialect = self.db.get_bind().dialect.name
+        if dialect in ("postgresql", "sqlite"):
+            statement = (postgresql.insert if dialect == "postgresql" else sqlite.insert)(CatalogVersion)
+            self.db.execute(
+                statement.values(name=name, version=1).on_conflict_do_update(
+                    index_elements=["name"], set_={"version": CatalogVersion.version + 1}
+                )
+            )
+            return
+        bumped = self.db.execute(
+            update(CatalogVersion)
+            .where(CatalogVersion.name == name)
+            .values(version=CatalogVersion.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+        if not bumped.rowcount:
+            self.db.execute(insert(CatalogVersion).values(name=name, version=1))
@@ -1,5 +1,9 @@
+from typing import List
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from app.domain.category import Category
+from app.domain.item_category import item_category
+from app.infrastructure.unit_of_work import commit_or_flush
 
 class CategoryRepository:
     def __init__(self, db: Session):
@@ -11,11 +15,15 @@ class CategoryRepository:
     def get(self, id: int):
         return self.db.query(Category).filter(Category.id == id).first()
 
+    def item_ids(self, id: int) -> List[int]:
+        return list(self.db.scalars(
+            select(item_category.c.item_id).where(item_category.c.category_id == id)
+        ))
+
     def create(self, name: str, description: str = None):
         cat = Category(name=name, description=description)
         self.db.add(cat)
-        self.db.commit()
-        self.db.refresh(cat)
+        commit_or_flush(self.db, cat)
         return cat
         
     def update(self, id: int, update_data: dict):
@@ -23,14 +31,13 @@ class CategoryRepository:
         if category:
             for key, value in update_data.items():
                 setattr(category, key, value)
-            self.db.commit()
-            self.db.refresh(category)
+            commit_or_flush(self.db, category)
         return category
         
     def delete(self, id: int):
         category = self.get(id)
         if category:
             self.db.delete(category)
-            self.db.commit()
+            commit_or_flush(self.db)
             return True
         return False
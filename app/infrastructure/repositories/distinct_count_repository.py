@@ -0,0 +1,152 @@
+from collections import defaultdict
+from datetime import date, datetime, time
+from typing import Dict, Iterable, Optional, Tuple
+from sqlalchemy import bindparam, delete, func, insert, select, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from app.domain.distinct_sketch import (
+    ACTIVE_USERS, ITEM_RATERS, SKETCH_PRECISION, DistinctSketchRegister, utc_today
+)
+from app.domain.rating import Rating
+from app.infrastructure.hyperloglog import HyperLogLog, register_of
+
+class DistinctCountRepository:
+    """
+    Daily HyperLogLog sketches of the active users and of the raters of each item
+
+    Rating writes raise the registers of the sketches of the day, in the same
+    transaction ; a distinct count over a window merges the registers of its
+    days, a number of rows bounded by the precision whatever the number of
+    ratings. The exact_* methods count from the ratings, to check estimates.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _raise_registers(self, ranks: Dict[Tuple[str, int, date, int], int]) -> None:
+        """Set the registers to the given ranks where they are lower, creating the missing ones"""
+        # Sorted so that concurrent writers lock the rows in the same order
+        rows = [
+            {"metric": metric, "scope_id": scope_id, "day": day, "register": register, "rank": rank}
+            for (metric, scope_id, day, register), rank in sorted(ranks.items())
+        ]
+        if not rows:
+            return
+        registers = DistinctSketchRegister.__table__
+        dialect = self.db.get_bind().dialect.name
+        if dialect in ("postgresql", "sqlite"):
+            statement = (postgresql.insert if dialect == "postgresql" else sqlite.insert)(registers)
+            self.db.execute(
+                statement.on_conflict_do_update(
+                    index_elements=["metric", "scope_id", "day", "register"],
+                    set_={"rank": statement.excluded.rank},
+                    where=registers.c.rank < statement.excluded.rank
+                ),
+                rows
+            )
+            return
+        key = tuple_(registers.c.metric, registers.c.scope_id, registers.c.day, registers.c.register)
+        self.db.execute(
+            update(registers)
+            .where(
+                registers.c.metric == bindparam("b_metric"), registers.c.scope_id == bindparam("b_scope_id"),
+                registers.c.day == bindparam("b_day"), registers.c.register == bindparam("b_register"),
+                registers.c.rank < bindparam("b_rank")
+            )
+            .values(rank=bindparam("b_rank")),
+            [{f"b_{column}": value for column, value in row.items()} for row in rows]
+        )
+        existing = set(tuple(row) for row in self.db.execute(
+            select(registers.c.metric, registers.c.scope_id, registers.c.day, registers.c.register)
+            .where(key.in_([(row["metric"], row["scope_id"], row["day"], row["register"]) for row in rows]))
+        ))
+        missing = [row for row in rows if (row["metric"], row["scope_id"], row["day"], row["register"]) not in existing]
+        if missing:
+            self.db.execute(insert(registers), missing)
+
+    @staticmethod
+    def _add(ranks: Dict[Tuple[str, int, date, int], int], metric: str, scope_id: int, day: date, value: int) -> None:
+        register, rank = register_of(value, SKETCH_PRECISION)
+        key = (metric, scope_id, day, register)
+        if rank > ranks.get(key, 0):
+            ranks[key] = rank
+
+    def record_ratings(self, pairs: Iterable[Tuple[int, int]], day: Optional[date] = None) -> None:
+        """Count the (user_id, item_id) ratings written on day (default today, UTC)"""
+        day = day or utc_today()
+        ranks: Dict[Tuple[str, int, date, int], int] = {}
+        for user_id, item_id in pairs:
+            self._add(ranks, ACTIVE_USERS, 0, day, user_id)
+            self._add(ranks, ITEM_RATERS, item_id, day, user_id)
+        self._raise_registers(ranks)
+
+    def sketch(self, metric: str, scope_id: int, since: date) -> HyperLogLog:
+        """Merged sketch of the days from since to today"""
+        sketch = HyperLogLog(SKETCH_PRECISION)
+        sketch.update(self.db.execute(
+            select(DistinctSketchRegister.register, func.max(DistinctSketchRegister.rank))
+            .where(
+                DistinctSketchRegister.metric == metric,
+                DistinctSketchRegister.scope_id == scope_id,
+                DistinctSketchRegister.day >= since
+            )
+            .group_by(DistinctSketchRegister.register)
+        ))
+        return sketch
+
+    def estimate(self, metric: str, scope_id: int, since: date) -> int:
+        return self.sketch(metric, scope_id, since).estimate()
+
+    def exact_active_users(self, since: date) -> int:
+        """
+        Users whose rating was last written since then
+
+        The same users as the sketches as long as the window ends today, deleted
+        ratings aside : the sketches keep counting them.
+        """
+        return self.db.scalar(
+            select(func.count(func.distinct(Rating.user_id))).where(Rating.updated_at >= datetime.combine(since, time()))
+        )
+
+    def exact_item_raters(self, item_id: int, since: date) -> int:
+        # One rating per user and item : no distinct needed
+        return self.db.scalar(
+            select(func.count()).select_from(Rating)
+            .where(Rating.item_id == item_id, Rating.updated_at >= datetime.combine(since, time()))
+        )
+
+    def prune(self, before: date) -> int:
+        """Delete the sketches of the days before, return the number of deleted registers"""
+        return self.db.execute(
+            delete(DistinctSketchRegister)
+            .where(DistinctSketchRegister.day < before)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+
+    def rebuild(self, since: date, batch_size: int = 10000) -> int:
+        """
+        Recompute the sketches of the days since then from the ratings, return
+        the number of ratings read
+
+        A rating only counts for the day it was last written on : the earlier
+        writes of the window are lost, the sketches can only be under-estimated.
+        """
+        self.db.execute(
+            delete(DistinctSketchRegister)
+            .where(DistinctSketchRegister.day >= since)
+            .execution_options(synchronize_session=False)
+        )
+        count = 0
+        result = self.db.execute(
+            select(Rating.user_id, Rating.item_id, Rating.updated_at)
+            .where(Rating.updated_at >= datetime.combine(since, time()))
+            .execution_options(yield_per=batch_size)
+        )
+        for rows in result.partitions():
+            by_day = defaultdict(list)
+            for user_id, item_id, updated_at in rows:
+                by_day[updated_at.date()].append((user_id, item_id))
+            for day, pairs in by_day.items():
+                self.record_ratings(pairs, day)
+            count += len(rows)
+        return count
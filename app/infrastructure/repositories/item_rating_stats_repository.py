@@ -0,0 +1,313 @@
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import bindparam, case, delete, func, insert, select, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from app.domain.item import Item
+from app.domain.item_rating_bucket import BUCKET_COUNT, ItemRatingBucket, bucket_of
+from app.domain.item_rating_stats import ItemRatingStats
+from app.domain.rating import Rating
+
+class ItemRatingStatsRepository:
+    """
+    Maintains the item_rating_stats table and the item_rating_buckets histograms
+
+    The record_* methods only flush : they run inside the transaction of the
+    rating write that triggered them and are committed along with it.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _min_of(self, item_id: int):
+        return select(func.min(Rating.value)).where(Rating.item_id == item_id).scalar_subquery()
+
+    def _max_of(self, item_id: int):
+        return select(func.max(Rating.value)).where(Rating.item_id == item_id).scalar_subquery()
+
+    def _update(self, item_id: int, **values) -> int:
+        result = self.db.execute(
+            update(ItemRatingStats)
+            .where(ItemRatingStats.item_id == item_id)
+            .values(version=ItemRatingStats.version + 1, **values)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount
+
+    def _add_to_buckets(self, deltas: Dict[Tuple[int, int], int]) -> None:
+        """Add the given counts to the (item_id, bucket) histogram rows, creating the missing ones"""
+        rows = [
+            {"item_id": item_id, "bucket": bucket, "rating_count": delta}
+            for (item_id, bucket), delta in deltas.items() if delta
+        ]
+        if not rows:
+            return
+        buckets = ItemRatingBucket.__table__
+        dialect = self.db.get_bind().dialect.name
+        if dialect in ("postgresql", "sqlite"):
+            statement = (postgresql.insert if dialect == "postgresql" else sqlite.insert)(buckets)
+            self.db.execute(
+                statement.on_conflict_do_update(
+                    index_elements=["item_id", "bucket"],
+                    set_={"rating_count": buckets.c.rating_count + statement.excluded.rating_count}
+                ),
+                rows
+            )
+            return
+        self.db.execute(
+            update(buckets)
+            .where(buckets.c.item_id == bindparam("b_item_id"), buckets.c.bucket == bindparam("b_bucket"))
+            .values(rating_count=buckets.c.rating_count + bindparam("b_delta")),
+            [{"b_item_id": row["item_id"], "b_bucket": row["bucket"], "b_delta": row["rating_count"]} for row in rows]
+        )
+        existing = set(tuple(row) for row in self.db.execute(
+            select(buckets.c.item_id, buckets.c.bucket)
+            .where(tuple_(buckets.c.item_id, buckets.c.bucket).in_([(row["item_id"], row["bucket"]) for row in rows]))
+        ))
+        missing = [row for row in rows if (row["item_id"], row["bucket"]) not in existing]
+        if missing:
+            self.db.execute(insert(buckets), missing)
+
+    def create_empty(self, item_id: int) -> None:
+        """Create the (empty) stats row of a new item"""
+        self.db.add(ItemRatingStats(item_id=item_id, rating_sum=0.0, rating_count=0))
+
+    def record_insert(self, item_id: int, value: float) -> None:
+        stats = ItemRatingStats
+        self._add_to_buckets({(item_id, bucket_of(value)): 1})
+        updated = self._update(
+            item_id,
+            last_rated_at=datetime.now(timezone.utc),
+            rating_sum=stats.rating_sum + value,
+            rating_count=stats.rating_count + 1,
+            rating_min=case(
+                (stats.rating_min.is_(None), value),
+                (stats.rating_min > value, value),
+                else_=stats.rating_min
+            ),
+            rating_max=case(
+                (stats.rating_max.is_(None), value),
+                (stats.rating_max < value, value),
+                else_=stats.rating_max
+            ),
+        )
+        if not updated:
+            # Items created before the stats table existed
+            self.refresh([item_id])
+
+    def record_inserts(self, values_by_item: Dict[int, List[float]]) -> None:
+        """Apply a batch of inserted ratings, one executemany UPDATE for all the items"""
+        if not values_by_item:
+            return
+        self._add_to_buckets(Counter(
+            (item_id, bucket_of(value)) for item_id, values in values_by_item.items() for value in values
+        ))
+        stats = ItemRatingStats.__table__
+        self.db.execute(
+            update(stats)
+            .where(stats.c.item_id == bindparam("b_item_id"))
+            .values(
+                rating_sum=stats.c.rating_sum + bindparam("b_sum"),
+                rating_count=stats.c.rating_count + bindparam("b_count"),
+                rating_min=case(
+                    (stats.c.rating_min.is_(None), bindparam("b_min")),
+                    (stats.c.rating_min > bindparam("b_min"), bindparam("b_min")),
+                    else_=stats.c.rating_min
+                ),
+                rating_max=case(
+                    (stats.c.rating_max.is_(None), bindparam("b_max")),
+                    (stats.c.rating_max < bindparam("b_max"), bindparam("b_max")),
+                    else_=stats.c.rating_max
+                ),
+                version=stats.c.version + 1,
+                last_rated_at=datetime.now(timezone.utc),
+            ),
+            [
+                {"b_item_id": item_id, "b_sum": sum(values), "b_count": len(values),
+                 "b_min": min(values), "b_max": max(values)}
+                for item_id, values in values_by_item.items()
+            ]
+        )
+        # Items created before the stats table existed
+        with_stats = set(self.db.scalars(select(stats.c.item_id).where(stats.c.item_id.in_(values_by_item))))
+        missing = [item_id for item_id in values_by_item if item_id not in with_stats]
+        if missing:
+            self.refresh(missing)
+
+    def record_update(self, item_id: int, old_value: float, new_value: float) -> None:
+        """Must be called after the updated rating has been flushed"""
+        now = datetime.now(timezone.utc)
+        if old_value == new_value:
+            # Only the comment changed : the listing of the item's ratings did
+            if not self._update(item_id, last_rated_at=now):
+                self.refresh([item_id])
+            return
+        stats = ItemRatingStats
+        old_bucket, new_bucket = bucket_of(old_value), bucket_of(new_value)
+        if old_bucket != new_bucket:
+            self._add_to_buckets({(item_id, old_bucket): -1, (item_id, new_bucket): 1})
+        updated = self._update(
+            item_id,
+            last_rated_at=now,
+            rating_sum=stats.rating_sum + (new_value - old_value),
+            # The old value may have been the bound : recompute it from the ratings
+            rating_min=case(
+                (stats.rating_min >= new_value, new_value),
+                (stats.rating_min >= old_value, self._min_of(item_id)),
+                else_=stats.rating_min
+            ),
+            rating_max=case(
+                (stats.rating_max <= new_value, new_value),
+                (stats.rating_max <= old_value, self._max_of(item_id)),
+                else_=stats.rating_max
+            ),
+        )
+        if not updated:
+            self.refresh([item_id])
+
+    def record_delete(self, item_id: int, value: float) -> None:
+        """Must be called after the rating deletion has been flushed"""
+        stats = ItemRatingStats
+        self._add_to_buckets({(item_id, bucket_of(value)): -1})
+        updated = self._update(
+            item_id,
+            rating_sum=case((stats.rating_count > 1, stats.rating_sum - value), else_=0.0),
+            rating_count=case((stats.rating_count > 0, stats.rating_count - 1), else_=0),
+            rating_min=case(
+                (stats.rating_min >= value, self._min_of(item_id)),
+                else_=stats.rating_min
+            ),
+            rating_max=case(
+                (stats.rating_max <= value, self._max_of(item_id)),
+                else_=stats.rating_max
+            ),
+        )
+        if not updated:
+            self.refresh([item_id])
+
+    def _actual_stats(self, item_ids: Iterable[int] = None):
+        q = select(
+            Rating.item_id,
+            func.coalesce(func.sum(Rating.value), 0.0).label("rating_sum"),
+            func.count(Rating.id).label("rating_count"),
+            func.min(Rating.value).label("rating_min"),
+            func.max(Rating.value).label("rating_max"),
+            func.max(Rating.updated_at).label("last_rated_at"),
+        ).group_by(Rating.item_id)
+        if item_ids is not None:
+            q = q.where(Rating.item_id.in_(list(item_ids)))
+        return q
+
+    def refresh(self, item_ids: Iterable[int]) -> None:
+        """Recompute the stats of the given items from the ratings table"""
+        item_ids = list(set(item_ids))
+        if not item_ids:
+            return
+        # Keep the write counters increasing across the rebuild
+        versions = dict(self.db.execute(
+            select(ItemRatingStats.item_id, ItemRatingStats.version)
+            .where(ItemRatingStats.item_id.in_(item_ids))
+        ).all())
+        self.db.execute(
+            delete(ItemRatingStats)
+            .where(ItemRatingStats.item_id.in_(item_ids))
+            .execution_options(synchronize_session=False)
+        )
+        rows = {r.item_id: r for r in self.db.execute(self._actual_stats(item_ids))}
+        self.db.execute(insert(ItemRatingStats), [
+            {
+                "item_id": item_id,
+                "rating_sum": rows[item_id].rating_sum if item_id in rows else 0.0,
+                "rating_count": rows[item_id].rating_count if item_id in rows else 0,
+                "rating_min": rows[item_id].rating_min if item_id in rows else None,
+                "rating_max": rows[item_id].rating_max if item_id in rows else None,
+                "last_rated_at": rows[item_id].last_rated_at if item_id in rows else None,
+                "version": versions.get(item_id, 0) + 1,
+            }
+            for item_id in item_ids
+        ])
+        self._refresh_buckets(item_ids)
+
+    def _actual_buckets(self, item_ids: Optional[List[int]] = None) -> Counter:
+        """(item_id, bucket) counts computed from the ratings table"""
+        # Grouped by value in SQL, bucketed here : FLOOR and integer casts differ between databases
+        q = select(Rating.item_id, Rating.value, func.count()).group_by(Rating.item_id, Rating.value)
+        if item_ids is not None:
+            q = q.where(Rating.item_id.in_(item_ids))
+        counts = Counter()
+        for item_id, value, count in self.db.execute(q):
+            counts[item_id, bucket_of(value)] += count
+        return counts
+
+    def _refresh_buckets(self, item_ids: Optional[List[int]] = None) -> int:
+        delete_buckets = delete(ItemRatingBucket)
+        if item_ids is not None:
+            delete_buckets = delete_buckets.where(ItemRatingBucket.item_id.in_(item_ids))
+        self.db.execute(delete_buckets.execution_options(synchronize_session=False))
+        counts = self._actual_buckets(item_ids)
+        if counts:
+            self.db.execute(insert(ItemRatingBucket), [
+                {"item_id": item_id, "bucket": bucket, "rating_count": count}
+                for (item_id, bucket), count in counts.items()
+            ])
+        return len({item_id for item_id, _ in counts})
+
+    def rebuild_histograms(self) -> int:
+        """Recompute the histogram of every item from the ratings, return how many items have ratings"""
+        return self._refresh_buckets()
+
+    def summary(self, item_id: int):
+        """(rating_count, rating_sum, last_rated_at) of an item, None if it does not exist"""
+        return self.db.execute(
+            select(ItemRatingStats.rating_count, ItemRatingStats.rating_sum, ItemRatingStats.last_rated_at)
+            .where(ItemRatingStats.item_id == item_id)
+        ).first()
+
+    def histogram(self, item_id: int) -> List[int]:
+        """Rating counts of the item by half-star bucket, from 0 to 5"""
+        counts = [0] * BUCKET_COUNT
+        for bucket, count in self.db.execute(
+            select(ItemRatingBucket.bucket, ItemRatingBucket.rating_count).where(ItemRatingBucket.item_id == item_id)
+        ):
+            counts[bucket] = count
+        return counts
+
+    def find_drift(self, tolerance: float = 1e-6) -> List[int]:
+        """Return the ids of the items whose stored stats differ from the ratings"""
+        actual = self._actual_stats().subquery()
+        rows = self.db.execute(
+            select(
+                Item.id,
+                ItemRatingStats.item_id.label("stats_item_id"),
+                ItemRatingStats.rating_sum,
+                ItemRatingStats.rating_count,
+                ItemRatingStats.rating_min,
+                ItemRatingStats.rating_max,
+                actual.c.rating_sum.label("actual_sum"),
+                actual.c.rating_count.label("actual_count"),
+                actual.c.rating_min.label("actual_min"),
+                actual.c.rating_max.label("actual_max"),
+            )
+            .outerjoin(ItemRatingStats, ItemRatingStats.item_id == Item.id)
+            .outerjoin(actual, actual.c.item_id == Item.id)
+        ).all()
+
+        drifted = []
+        for r in rows:
+            if r.stats_item_id is None:
+                drifted.append(r.id)
+                continue
+            if (r.rating_count != (r.actual_count or 0)
+                    or abs(r.rating_sum - (r.actual_sum or 0.0)) > tolerance
+                    or r.rating_min != r.actual_min
+                    or r.rating_max != r.actual_max):
+                drifted.append(r.id)
+        return drifted
+
+    def rebuild(self) -> int:
+        """Recompute the stats of every drifted item, return the number of fixed rows"""
+        drifted = self.find_drift()
+        for start in range(0, len(drifted), 500):
+            self.refresh(drifted[start:start + 500])
+        return len(drifted)
@@ -1,15 +1,146 @@
-from typing import List, Optional
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, FrozenSet, Iterator, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from sqlalchemy import and_, case, func, insert, or_, select, update
+from app.domain.catalog_version import ITEM_TAGS, ITEMS
 from app.domain.category import Category
 from app.domain.item import Item
-from app.application.schemas.item_dto import ItemCreateDTO, ItemUpdateDTO
+from app.domain.item_category import item_category
+from app.domain.item_rating_stats import ItemRatingStats
+from app.domain.item_tag import item_tag
 from app.domain.rating import Rating
+from app.application.schemas.category_dto import CategoryDTO
+from app.application.schemas.item_dto import ItemCreateDTO, ItemUpdateDTO, ItemResponse
+from app.infrastructure.repositories.catalog_version_repository import CatalogVersionRepository
+from app.infrastructure.repositories.leaderboard_repository import LeaderboardRepository
+from app.infrastructure.repositories.rating_rollup_repository import RatingRollupRepository
+from app.infrastructure.repositories.tag_repository import TagRepository
+from app.application.schemas.tag_dto import TagDTO
 from app.domain.tag import Tag
+from app.infrastructure.unit_of_work import commit_or_flush
+
+# Columns of items that can be requested one by one (sparse fieldsets)
+_ITEM_COLUMNS = {
+    "name": Item.name,
+    "description": Item.description,
+    "image_url": Item.image_url,
+    "created_at": Item.created_at,
+    "updated_at": Item.updated_at,
+}
 
 class ItemRepository:
     def __init__(self, db: Session):
         self.db = db
+        self.leaderboard = LeaderboardRepository(db)
+        self.catalog = CatalogVersionRepository(db)
+
+    @staticmethod
+    def _stats_columns():
+        # Read the materialized aggregates instead of grouping the ratings
+        avg_rating = case(
+            (ItemRatingStats.rating_count > 0, ItemRatingStats.rating_sum / ItemRatingStats.rating_count),
+            else_=0.0
+        ).label("avg_rating")
+        count_rating = func.coalesce(ItemRatingStats.rating_count, 0).label("count_rating")
+        return avg_rating, count_rating
+
+    def _select_item_rows(self, fields: Optional[FrozenSet[str]] = None):
+        """
+        Phase 1 : one row per item with its aggregates, no relationship joined
+
+        With a set of fields, only those columns are selected and the stats
+        are only joined if an aggregate is requested.
+        """
+        if fields is None:
+            return (
+                select(
+                    Item.id, Item.name, Item.description, Item.image_url,
+                    Item.created_at, Item.updated_at,
+                    *self._stats_columns()
+                )
+                .select_from(Item)
+                .outerjoin(ItemRatingStats, ItemRatingStats.item_id == Item.id)
+            )
+        columns = [column for name, column in _ITEM_COLUMNS.items() if name in fields]
+        stats_columns = [column for column in self._stats_columns() if column.name in fields]
+        q = select(Item.id, *columns, *stats_columns).select_from(Item)
+        if stats_columns:
+            q = q.outerjoin(ItemRatingStats, ItemRatingStats.item_id == Item.id)
+        return q
+
+    def _load_relations(
+        self,
+        item_ids: List[int],
+        with_categories: bool = True,
+        with_tags: bool = True,
+        category_type=CategoryDTO,
+        tag_type=TagDTO
+    ) -> Tuple[Dict[int, list], Dict[int, list]]:
+        """Phase 2 : categories and tags of a page of items, one IN query each"""
+        categories = defaultdict(list)
+        tags = defaultdict(list)
+        if not item_ids:
+            return categories, tags
+
+        if with_categories:
+            category_rows = self.db.execute(
+                select(item_category.c.item_id, Category.id, Category.name, Category.description)
+                .join(Category, Category.id == item_category.c.category_id)
+                .where(item_category.c.item_id.in_(item_ids))
+            )
+            for item_id, category_id, name, description in category_rows:
+                categories[item_id].append(category_type(id=category_id, name=name, description=description))
+
+        if with_tags:
+            tag_rows = self.db.execute(
+                select(item_tag.c.item_id, Tag.id, Tag.name)
+                .join(Tag, Tag.id == item_tag.c.tag_id)
+                .where(item_tag.c.item_id.in_(item_ids))
+            )
+            for item_id, tag_id, name in tag_rows:
+                tags[item_id].append(tag_type(id=tag_id, name=name))
+
+        return categories, tags
+
+    def _assemble(self, rows, fields: Optional[FrozenSet[str]] = None) -> List[ItemResponse]:
+        """
+        Turn phase 1 rows into responses, attaching the phase 2 relations
+
+        With a set of fields, items are plain dicts holding the selected
+        columns and the requested relations only.
+        """
+        if fields is not None:
+            with_categories, with_tags = "categories" in fields, "tags" in fields
+            categories, tags = self._load_relations(
+                [row.id for row in rows], with_categories, with_tags, category_type=dict, tag_type=dict
+            )
+            items = []
+            for row in rows:
+                item = row._asdict()
+                if with_categories:
+                    item["categories"] = categories.get(row.id, [])
+                if with_tags:
+                    item["tags"] = tags.get(row.id, [])
+                items.append(item)
+            return items
+
+        categories, tags = self._load_relations([row.id for row in rows])
+        return [
+            ItemResponse(
+                id=row.id,
+                name=row.name,
+                description=row.description,
+                image_url=row.image_url,
+                created_at=row.created_at,
+                updated_at=row.updated_at,
+                categories=categories.get(row.id, []),
+                tags=tags.get(row.id, []),
+                avg_rating=row.avg_rating,
+                count_rating=row.count_rating,
+            )
+            for row in rows
+        ]
 
     def create(self, item_data: ItemCreateDTO) -> Item:
         # Exclure les champs non pertinents pour le modèle Item
@@ -17,28 +148,93 @@ class ItemRepository:
 
         # Créer l'objet Item
         item = Item(**item_dict)
+        item.rating_stats = ItemRatingStats(rating_sum=0.0, rating_count=0)
         self.db.add(item)
-        self.db.commit()
-        self.db.refresh(item)
+        self.catalog.bump(ITEMS)
+        commit_or_flush(self.db, item)
         return item
 
+    def create_many(self, items_data: List[ItemCreateDTO]) -> List[Tuple[Optional[int], Optional[str]]]:
+        """
+        Create many items with their categories and tags in one transaction
+
+        Categories and tags are resolved with one query each for the whole
+        batch, missing tags are created in bulk, and items, stats and
+        association rows are inserted with executemany. An item referencing
+        an unknown category is skipped, the others are still created.
+
+        Returns:
+            One (item_id, None) or (None, error) per item, in order
+        """
+        category_ids = {category_id for data in items_data for category_id in data.category_ids or []}
+        known_categories = set(self.db.scalars(select(Category.id).where(Category.id.in_(category_ids))))
+
+        results: List[Tuple[Optional[int], Optional[str]]] = [(None, None)] * len(items_data)
+        valid = []
+        for index, data in enumerate(items_data):
+            if not set(data.category_ids or []) <= known_categories:
+                results[index] = (None, "Some categories don't exist")
+            else:
+                valid.append(index)
+        if not valid:
+            return results
+
+        tag_ids = TagRepository(self.db).ensure_many(
+            name for index in valid for name in items_data[index].tags or []
+        )
+
+        # RETURNING in parameter order maps every row to its item
+        rows = [items_data[index].model_dump(exclude={"category_ids", "tags"}) for index in valid]
+        item_ids = list(self.db.scalars(
+            insert(Item).returning(Item.id, sort_by_parameter_order=True), rows
+        ))
+        self.db.execute(insert(ItemRatingStats), [
+            {"item_id": item_id, "rating_sum": 0.0, "rating_count": 0} for item_id in item_ids
+        ])
+
+        category_rows, tag_rows = [], []
+        for index, item_id in zip(valid, item_ids):
+            data = items_data[index]
+            category_rows.extend({"item_id": item_id, "category_id": c} for c in dict.fromkeys(data.category_ids or []))
+            tag_rows.extend({"item_id": item_id, "tag_id": tag_ids[name]} for name in dict.fromkeys(data.tags or []))
+            results[index] = (item_id, None)
+        if category_rows:
+            self.db.execute(insert(item_category), category_rows)
+        if tag_rows:
+            self.db.execute(insert(item_tag), tag_rows)
+        self.catalog.bump(ITEMS)
+        commit_or_flush(self.db)
+        return results
+
     def get_by_id(self, item_id: int) -> Optional[Item]:
         return self.db.query(Item).filter(Item.id == item_id).first()
     
-    def get_with_stats(self, item_id: int) -> Optional[Item]:
-        return (
-            self.db.query(
-                Item,
-                func.coalesce(func.avg(Rating.value), 0).label("avg_rating"),
-                func.count(Rating.id).label("count_rating")
-            )
-            .outerjoin(Item.ratings)
-            .options(joinedload(Item.categories))
-            .options(joinedload(Item.tags))
-            .filter(Item.id == item_id)
-            .group_by(Item.id)
-            .first()
-        )
+    def get_with_stats(self, item_id: int, fields: Optional[FrozenSet[str]] = None) -> Optional[ItemResponse]:
+        rows = self.db.execute(self._select_item_rows(fields).where(Item.id == item_id)).all()
+        if not rows:
+            return None
+        return self._assemble(rows, fields)[0]
+
+    def top_with_stats(self, category_id: int, limit: int) -> List[Tuple[ItemResponse, float]]:
+        """Best items of a precomputed leaderboard with their score"""
+        entries = self.leaderboard.top(category_id, limit)
+        scores = dict(entries)
+        return [(item, scores[item.id]) for item in self.get_many_with_stats([item_id for item_id, _ in entries])]
+
+    def filter_in_category(self, item_ids: List[int], category_id: int) -> List[int]:
+        """The ids of item_ids belonging to the category, in increasing order"""
+        return list(self.db.scalars(
+            select(item_category.c.item_id)
+            .where(item_category.c.category_id == category_id, item_category.c.item_id.in_(item_ids))
+            .order_by(item_category.c.item_id)
+        ))
+
+    def get_many_with_stats(self, item_ids: List[int], fields: Optional[FrozenSet[str]] = None) -> List[ItemResponse]:
+        """Items with their stats, in the order of item_ids (missing ids are skipped)"""
+        if not item_ids:
+            return []
+        rows = {row.id: row for row in self.db.execute(self._select_item_rows(fields).where(Item.id.in_(item_ids)))}
+        return self._assemble([rows[item_id] for item_id in item_ids if item_id in rows], fields)
 
     def set_categories(self, item: Item, category_ids: list[int]) -> Item:
         # List all categories with given IDs
@@ -52,10 +248,13 @@ class ItemRepository:
             raise ValueError("Some categories don't exist")
 
         # Associer les catégories à l'item
+        old_category_ids = [category.id for category in item.categories]
         item.categories = categories
+        item.version = Item.version + 1
+        self.db.flush()
+        self.leaderboard.categories_changed(item.id, old_category_ids)
 
-        self.db.commit()
-        self.db.refresh(item)
+        commit_or_flush(self.db, item)
         return item
     
     def set_tags(self, item: Item, tag_names: list[str]) -> Item:
@@ -76,48 +275,81 @@ class ItemRepository:
 
         # Associate tags with item
         item.tags = tags
+        item.version = Item.version + 1
+        self.catalog.bump(ITEM_TAGS)
 
-        self.db.commit()
-        self.db.refresh(item)
+        commit_or_flush(self.db, item)
         return item
     
+    def most_rated_ids(self, limit: int) -> List[int]:
+        return list(self.db.scalars(
+            select(ItemRatingStats.item_id)
+            .order_by(ItemRatingStats.rating_count.desc(), ItemRatingStats.item_id)
+            .limit(limit)
+        ))
+
     def list(self) -> List[Item]:
         return self.db.query(Item).all()
+
+    # Columns of the item exports, in order
+    EXPORT_COLUMNS = ("id", "name", "description", "image_url", "created_at", "updated_at", "avg_rating", "count_rating")
+
+    def stream_export(
+        self,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        category_id: Optional[int] = None,
+        batch_size: int = 1000
+    ) -> Iterator[list]:
+        """Yield the items with their stats as batches of plain rows, see RatingRepository.stream_export"""
+        q = self._select_item_rows().order_by(Item.id)
+        if since is not None:
+            q = q.where(Item.created_at >= since)
+        if until is not None:
+            q = q.where(Item.created_at < until)
+        if category_id is not None:
+            q = q.where(Item.categories.any(Category.id == category_id))
+
+        with self.db.get_bind().connect() as connection:
+            result = connection.execution_options(yield_per=batch_size).execute(q)
+            yield from result.partitions()
     
     def list_with_stats(
         self,
         category_id: Optional[int] = None,
-        tag_names: Optional[List[str]] = None
-    ):
-        q = (
-            self.db.query(
-                Item,
-                func.coalesce(func.avg(Rating.value), 0).label("avg_rating"),
-                func.count(Rating.id).label("count_rating")
-            )
-            .outerjoin(Item.ratings)
-            .options(joinedload(Item.categories))
-            .options(joinedload(Item.tags))
-        )
+        limit: Optional[int] = None,
+        after: Optional[Tuple[datetime, int]] = None,
+        fields: Optional[FrozenSet[str]] = None
+    ) -> List[ItemResponse]:
+        """
+        List items with their rating stats, ordered by (created_at, id)
+
+        Args:
+            category_id: Only keep items of this category
+            limit: Maximum number of rows to return
+            after: Keyset (created_at, id) of the last row of the previous page
+            fields: Only load these fields (all of them if None)
+        """
+        q = self._select_item_rows(fields)
 
-        # Filtrer par catégorie si demandé
+        # Filtrer par catégorie si demandé (EXISTS : pas de lignes dupliquées)
         if category_id is not None:
-            q = (
-                q.join(Item.categories)
-                 .filter(Category.id == category_id)
-            )
+            q = q.where(Item.categories.any(Category.id == category_id))
 
-        # Filtrer par tags si demandé
-        if tag_names:
-            q = (
-                q.join(Item.tags)
-                 .filter(Tag.name.in_(tag_names))
+        # Keyset pagination : only rows strictly after the cursor
+        if after is not None:
+            created_at, item_id = after
+            q = q.where(
+                or_(
+                    Item.created_at > created_at,
+                    and_(Item.created_at == created_at, Item.id > item_id)
+                )
             )
 
-        return (
-            q.group_by(Item.id)
-             .all()
-        )
+        q = q.order_by(Item.created_at, Item.id)
+        if limit is not None:
+            q = q.limit(limit)
+        return self._assemble(self.db.execute(q).all(), fields)
 
     def update(self, item_id: int, item_data: ItemUpdateDTO) -> Optional[Item]:
         item = self.get_by_id(item_id)
@@ -126,14 +358,58 @@ class ItemRepository:
         update_data = item_data.model_dump(exclude_unset=True)
         for key, value in update_data.items():
             setattr(item, key, value)
-        self.db.commit()
-        self.db.refresh(item)
+        item.version = Item.version + 1
+        commit_or_flush(self.db, item)
         return item
 
+    def touch(self, item_ids: List[int]) -> None:
+        """Bump the version of items whose response changed through a category or a tag"""
+        if not item_ids:
+            return
+        self.db.execute(
+            update(Item)
+            .where(Item.id.in_(item_ids))
+            .values(version=Item.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+
+    def version_marker(self, item_id: int):
+        """
+        Cheap markers of an item : (version, updated_at, rating_version, ratings_updated_at)
+
+        One primary key lookup, used to answer conditional requests.
+        """
+        return self.db.execute(
+            select(
+                Item.version, Item.updated_at,
+                func.coalesce(ItemRatingStats.version, 0).label("rating_version"),
+                ItemRatingStats.updated_at.label("ratings_updated_at")
+            )
+            .select_from(Item)
+            .outerjoin(ItemRatingStats, ItemRatingStats.item_id == Item.id)
+            .where(Item.id == item_id)
+        ).first()
+
+    def catalog_marker(self):
+        """
+        Markers of the whole catalog : (items version, max items.updated_at, max stats.updated_at)
+
+        The maxima are read from the updated_at indexes, the version, bumped on
+        every creation and deletion, catches deletions.
+        """
+        items_updated_at = self.db.scalar(select(func.max(Item.updated_at)))
+        ratings_updated_at = self.db.scalar(select(func.max(ItemRatingStats.updated_at)))
+        return self.catalog.get(ITEMS), items_updated_at, ratings_updated_at
+
     def delete(self, item_id: int) -> bool:
         item = self.get_by_id(item_id)
         if not item:
             return False
+        # The item's ratings are cascaded : their hours must be rolled up again
+        RatingRollupRepository(self.db).mark_ratings_dirty(Rating.item_id == item_id)
         self.db.delete(item)
-        self.db.commit()
+        self.db.flush()
+        self.leaderboard.remove_item(item_id)
+        self.catalog.bump(ITEMS)
+        commit_or_flush(self.db)
         return True
@@ -0,0 +1,79 @@
+import re
+from typing import List, Optional, Tuple
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from app.domain.item_search import SEARCH_DOCUMENT_PG
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def search_terms(query: str) -> List[str]:
+    """Words of a user query, everything else (operators, quotes...) is dropped"""
+    return _TOKEN.findall(query)
+
+
+class ItemSearchRepository:
+    """
+    Ranked lookups in the item full-text index (see app.domain.item_search)
+
+    Hits are (item_id, rank) ordered by rank then id, lower rank meaning a
+    better match, so (rank, id) can be used as a keyset.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _dialect(self) -> str:
+        return self.db.get_bind().dialect.name
+
+    def search(
+        self,
+        terms: List[str],
+        limit: int,
+        after: Optional[Tuple[float, int]] = None
+    ) -> List[Tuple[int, float]]:
+        """
+        Return the ids and ranks of the items matching every term (as a prefix)
+
+        Args:
+            terms: Words returned by search_terms, must not be empty
+            limit: Maximum number of hits
+            after: Keyset (rank, id) of the last hit of the previous page
+        """
+        params = {"limit": limit}
+        keyset = ""
+        if after is not None:
+            params["after_rank"], params["after_id"] = after
+            keyset = "WHERE rank > :after_rank OR (rank = :after_rank AND id > :after_id)"
+
+        dialect = self._dialect()
+        if dialect == "sqlite":
+            # Every term must match, as a prefix ; the name weighs more than the description
+            params["match"] = " ".join(f'"{term}"*' for term in terms)
+            hits = (
+                "SELECT rowid AS id, bm25(items_fts, 10.0, 1.0) AS rank "
+                "FROM items_fts WHERE items_fts MATCH :match"
+            )
+        elif dialect == "postgresql":
+            params["match"] = " & ".join(f"{term}:*" for term in terms)
+            hits = (
+                f"SELECT id, -ts_rank({SEARCH_DOCUMENT_PG}, to_tsquery('simple', :match)) AS rank "
+                f"FROM items WHERE {SEARCH_DOCUMENT_PG} @@ to_tsquery('simple', :match)"
+            )
+        else:
+            # No index on other engines : unranked substring match
+            conditions = []
+            for i, term in enumerate(terms):
+                params[f"term_{i}"] = f"%{term.lower()}%"
+                conditions.append(
+                    f"(lower(name) LIKE :term_{i} OR lower(coalesce(description, '')) LIKE :term_{i})"
+                )
+            hits = f"SELECT id, 0.0 AS rank FROM items WHERE {' AND '.join(conditions)}"
+
+        statement = text(f"SELECT id, rank FROM ({hits}) AS hits {keyset} ORDER BY rank, id LIMIT :limit")
+        return [(row.id, row.rank) for row in self.db.execute(statement, params)]
+
+    def rebuild(self) -> None:
+        """Re-index every item (SQLite only, the PostgreSQL index is maintained by the database)"""
+        if self._dialect() == "sqlite":
+            self.db.execute(text("INSERT INTO items_fts(items_fts) VALUES ('rebuild')"))
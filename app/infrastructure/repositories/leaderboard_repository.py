@@ -0,0 +1,191 @@
+from typing import Iterable, List, Tuple
+from sqlalchemy import delete, func, insert, literal, select, update
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.domain.category import Category
+from app.domain.category_top_item import ALL_CATEGORIES, CategoryTopItem
+from app.domain.item_category import item_category
+from app.domain.item_rating_stats import ItemRatingStats
+
+class LeaderboardRepository:
+    """
+    Maintains the per-category top-K table (category_top_items)
+
+    Items are ranked by a Bayesian average, which pulls the average of
+    rarely rated items towards a prior :
+
+        score = (W * M + rating_sum) / (W + rating_count)
+
+    with M = LEADERBOARD_PRIOR_MEAN and W = LEADERBOARD_PRIOR_WEIGHT. Only items
+    with at least one rating are ranked. Like the stats repository, the write
+    methods only flush and are committed with the rating write.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    @property
+    def size(self) -> int:
+        return settings.LEADERBOARD_SIZE
+
+    @staticmethod
+    def score(rating_sum: float, rating_count: int) -> float:
+        weight = settings.LEADERBOARD_PRIOR_WEIGHT
+        return (weight * settings.LEADERBOARD_PRIOR_MEAN + rating_sum) / (weight + rating_count)
+
+    @staticmethod
+    def _score_column():
+        # Same operations as score(), so both give the same floats
+        weight = settings.LEADERBOARD_PRIOR_WEIGHT
+        return (
+            (weight * settings.LEADERBOARD_PRIOR_MEAN + ItemRatingStats.rating_sum)
+            / (weight + ItemRatingStats.rating_count)
+        ).label("score")
+
+    def top(self, category_id: int, limit: int) -> List[Tuple[int, float]]:
+        """(item_id, score) of the best items of a category, best first"""
+        rows = self.db.execute(
+            select(CategoryTopItem.item_id, CategoryTopItem.score)
+            .where(CategoryTopItem.category_id == category_id)
+            .order_by(CategoryTopItem.score.desc(), CategoryTopItem.item_id)
+            .limit(limit)
+        )
+        return [(row.item_id, row.score) for row in rows]
+
+    def _categories_of(self, item_id: int) -> List[int]:
+        return [ALL_CATEGORIES] + list(self.db.scalars(
+            select(item_category.c.category_id).where(item_category.c.item_id == item_id)
+        ))
+
+    def _boards_of(self, item_id: int) -> List[int]:
+        return list(self.db.scalars(
+            select(CategoryTopItem.category_id).where(CategoryTopItem.item_id == item_id)
+        ))
+
+    def _board_size(self, category_id: int) -> int:
+        return self.db.scalar(
+            select(func.count()).select_from(CategoryTopItem).where(CategoryTopItem.category_id == category_id)
+        )
+
+    def _last(self, category_id: int):
+        return self.db.execute(
+            select(CategoryTopItem.item_id, CategoryTopItem.score)
+            .where(CategoryTopItem.category_id == category_id)
+            .order_by(CategoryTopItem.score, CategoryTopItem.item_id.desc())
+            .limit(1)
+        ).first()
+
+    def _delete_entries(self, item_id: int, category_ids: List[int]) -> None:
+        self.db.execute(
+            delete(CategoryTopItem)
+            .where(CategoryTopItem.item_id == item_id, CategoryTopItem.category_id.in_(category_ids))
+            .execution_options(synchronize_session=False)
+        )
+
+    def refresh_categories(self, category_ids: Iterable[int]) -> None:
+        """Recompute whole leaderboards from the item rating stats"""
+        for category_id in set(category_ids):
+            self.db.execute(
+                delete(CategoryTopItem)
+                .where(CategoryTopItem.category_id == category_id)
+                .execution_options(synchronize_session=False)
+            )
+            score = self._score_column()
+            q = (
+                select(literal(category_id), ItemRatingStats.item_id, score, ItemRatingStats.rating_count)
+                .where(ItemRatingStats.rating_count > 0)
+                .order_by(score.desc(), ItemRatingStats.item_id)
+                .limit(self.size)
+            )
+            if category_id != ALL_CATEGORIES:
+                q = q.join(item_category, item_category.c.item_id == ItemRatingStats.item_id).where(
+                    item_category.c.category_id == category_id
+                )
+            self.db.execute(insert(CategoryTopItem).from_select(
+                ["category_id", "item_id", "score", "rating_count"], q
+            ))
+
+    def record_item(self, item_id: int) -> None:
+        """
+        Move an item in the leaderboards of its categories after its stats changed
+
+        Costs a few indexed lookups per category. A leaderboard is only rebuilt
+        when the item was its last entry and its score dropped, since an item
+        outside of the board may now rank above it.
+        """
+        stats = self.db.execute(
+            select(ItemRatingStats.rating_sum, ItemRatingStats.rating_count)
+            .where(ItemRatingStats.item_id == item_id)
+        ).first()
+        if stats is None or not stats.rating_count:
+            boards = self._boards_of(item_id)
+            if boards:
+                self._delete_entries(item_id, boards)
+                self.refresh_categories(boards)
+            return
+
+        score = self.score(stats.rating_sum, stats.rating_count)
+        for category_id in self._categories_of(item_id):
+            current = self.db.scalar(
+                select(CategoryTopItem.score)
+                .where(CategoryTopItem.category_id == category_id, CategoryTopItem.item_id == item_id)
+            )
+            if current is not None:
+                self.db.execute(
+                    update(CategoryTopItem)
+                    .where(CategoryTopItem.category_id == category_id, CategoryTopItem.item_id == item_id)
+                    .values(score=score, rating_count=stats.rating_count)
+                    .execution_options(synchronize_session=False)
+                )
+                if score < current and self._board_size(category_id) >= self.size:
+                    last = self._last(category_id)
+                    if last.item_id == item_id:
+                        self.refresh_categories([category_id])
+                continue
+
+            last = None
+            if self._board_size(category_id) >= self.size:
+                last = self._last(category_id)
+                # Ties are broken by the smallest id
+                if (score, -item_id) <= (last.score, -last.item_id):
+                    continue
+            self.db.execute(insert(CategoryTopItem).values(
+                category_id=category_id, item_id=item_id, score=score, rating_count=stats.rating_count
+            ))
+            if last is not None:
+                self._delete_entries(last.item_id, [category_id])
+
+    def record_items(self, item_ids: Iterable[int]) -> None:
+        for item_id in set(item_ids):
+            self.record_item(item_id)
+
+    def categories_changed(self, item_id: int, old_category_ids: Iterable[int]) -> None:
+        """Must be called after the new categories of the item have been flushed"""
+        removed = set(old_category_ids) - set(self._categories_of(item_id))
+        boards = [category_id for category_id in self._boards_of(item_id) if category_id in removed]
+        if boards:
+            self._delete_entries(item_id, boards)
+            # Another item takes the freed place
+            self.refresh_categories(boards)
+        self.record_item(item_id)
+
+    def remove_item(self, item_id: int) -> None:
+        """Must be called after the item deletion has been flushed"""
+        boards = self._boards_of(item_id)
+        if boards:
+            self._delete_entries(item_id, boards)
+            self.refresh_categories(boards)
+
+    def drop_category(self, category_id: int) -> None:
+        self.db.execute(
+            delete(CategoryTopItem)
+            .where(CategoryTopItem.category_id == category_id)
+            .execution_options(synchronize_session=False)
+        )
+
+    def rebuild(self) -> int:
+        """Recompute every leaderboard (after a change of the prior), return how many"""
+        self.db.execute(delete(CategoryTopItem).execution_options(synchronize_session=False))
+        category_ids = [ALL_CATEGORIES] + list(self.db.scalars(select(Category.id)))
+        self.refresh_categories(category_ids)
+        return len(category_ids)
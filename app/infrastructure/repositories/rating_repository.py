@@ -1,14 +1,21 @@
-from typing import List, Optional, Dict, Any
-from sqlalchemy import func, desc
+import csv
+import io
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Iterable, Iterator, List, Optional, Dict, Any, Set, Tuple
+from sqlalchemy import and_, desc, insert, or_, select, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session, joinedload
 from app.domain.rating import Rating
 from app.domain.item import Item
 from app.domain.user import User
-from app.domain.category import Category
-from app.application.schemas.rating_dto import (
-    RatingCreateDTO, RatingUpdateDTO,
-    RatingDistributionDTO, TopCategoryDTO, RatingStatsDTO
-)
+from app.infrastructure.repositories.distinct_count_repository import DistinctCountRepository
+from app.infrastructure.repositories.item_rating_stats_repository import ItemRatingStatsRepository
+from app.infrastructure.repositories.leaderboard_repository import LeaderboardRepository
+from app.infrastructure.repositories.rating_rollup_repository import RatingRollupRepository
+from app.application.schemas.rating_dto import RatingCreateDTO, RatingUpdateDTO
+from app.infrastructure.unit_of_work import commit_or_flush
 
 class RatingRepository:
     def __init__(self, db: Session):
@@ -19,6 +26,10 @@ class RatingRepository:
             db (Session): The SQLAlchemy session
         """
         self.db = db
+        self.stats = ItemRatingStatsRepository(db)
+        self.leaderboard = LeaderboardRepository(db)
+        self.distinct = DistinctCountRepository(db)
+        self.rollups = RatingRollupRepository(db)
 
     def get_by_user_and_item(self, user_id: int, item_id: int) -> Rating | None:
         return (
@@ -28,67 +39,239 @@ class RatingRepository:
                .first()
         )
     
-    def create(self, rating_data: RatingCreateDTO) -> Rating:
-        # Crée une instance Rating à partir du DTO
-        rating = Rating(**rating_data.model_dump())
-        self.db.add(rating)
-        self.db.commit()
-        self.db.refresh(rating)
+    def create(self, rating_data: RatingCreateDTO) -> Optional[Rating]:
+        """
+        Insert a rating, return None if the user already rated the item
+
+        On SQLite and PostgreSQL this is a single INSERT ... ON CONFLICT DO
+        NOTHING RETURNING : the unique (user_id, item_id) index rejects
+        duplicates, concurrent submits included, without a lookup first.
+        """
+        dialect = self.db.get_bind().dialect.name
+        if dialect == "postgresql":
+            statement = postgresql.insert(Rating).on_conflict_do_nothing(index_elements=["user_id", "item_id"])
+        elif dialect == "sqlite":
+            statement = sqlite.insert(Rating).on_conflict_do_nothing(index_elements=["user_id", "item_id"])
+        else:
+            if self.get_by_user_and_item(rating_data.user_id, rating_data.item_id):
+                return None
+            statement = insert(Rating)
+        rating = self.db.scalars(statement.values(**rating_data.model_dump()).returning(Rating)).first()
+        if rating is None:
+            return None
+        # Maintenir les agrégats de l'item dans la même transaction
+        self.stats.record_insert(rating.item_id, rating.value)
+        self.leaderboard.record_item(rating.item_id)
+        self.distinct.record_ratings([(rating.user_id, rating.item_id)])
+        self.rollups.mark_dirty([rating.created_at])
+        commit_or_flush(self.db)
         return rating
 
+    def upsert(self, rating_data: RatingCreateDTO) -> Tuple[Rating, bool]:
+        """
+        Insert a rating or overwrite the user's rating of the item
+
+        Returns the rating and whether it was created. An existing rating goes
+        through update(), which needs its previous value for the item stats.
+        """
+        rating = self.create(rating_data)
+        if rating is not None:
+            return rating, True
+        existing = self.get_by_user_and_item(rating_data.user_id, rating_data.item_id)
+        if existing is None:
+            # Deleted in between
+            return self.upsert(rating_data)
+        replacement = RatingUpdateDTO(value=rating_data.value, comment=rating_data.comment)
+        return self.update(existing.id, replacement), False
+
+    def existing_ids(self, model, ids: Iterable[int]) -> Set[int]:
+        """Ids among the given ones that exist in the table of model (User or Item)"""
+        ids = list(set(ids))
+        found = set()
+        for start in range(0, len(ids), 500):
+            found.update(self.db.scalars(select(model.id).where(model.id.in_(ids[start:start + 500]))))
+        return found
+
+    def existing_pairs(self, pairs: Iterable[Tuple[int, int]]) -> Set[Tuple[int, int]]:
+        """(user_id, item_id) pairs among the given ones that already have a rating"""
+        pairs = list(set(pairs))
+        found = set()
+        for start in range(0, len(pairs), 500):
+            found.update(tuple(row) for row in self.db.execute(
+                select(Rating.user_id, Rating.item_id)
+                .where(tuple_(Rating.user_id, Rating.item_id).in_(pairs[start:start + 500]))
+            ))
+        return found
+
+    # Columns written by insert_many, in COPY order
+    INGEST_COLUMNS = ("value", "comment", "user_id", "item_id", "created_at", "updated_at")
+
+    def _copy_cursor(self) -> Any:
+        """Raw cursor of a psycopg2 connection, None if the driver cannot COPY"""
+        if self.db.get_bind().dialect.name != "postgresql":
+            return None
+        cursor = self.db.connection().connection.cursor()
+        if not hasattr(cursor, "copy_expert"):
+            cursor.close()
+            return None
+        return cursor
+
+    def _copy(self, rows: List[Dict[str, Any]]) -> bool:
+        """
+        COPY the rows on a psycopg2 connection, False if the driver cannot
+
+        The raw cursor raises the driver's errors : a duplicate pair is turned
+        into an IntegrityError like the executemany path raises.
+        """
+        cursor = self._copy_cursor()
+        if cursor is None:
+            return False
+        statement = f"COPY ratings ({', '.join(self.INGEST_COLUMNS)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')"
+        try:
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for row in rows:
+                writer.writerow(["\\N" if row[column] is None else row[column] for column in self.INGEST_COLUMNS])
+            buffer.seek(0)
+            cursor.copy_expert(statement, buffer)
+            return True
+        except self.db.get_bind().dialect.loaded_dbapi.IntegrityError as e:
+            raise IntegrityError(statement, None, e) from e
+        finally:
+            cursor.close()
+
+    def insert_many(self, ratings: List[RatingCreateDTO]) -> None:
+        """
+        Insert already checked ratings (existing user and item, no duplicate)
+
+        One COPY on PostgreSQL, one executemany INSERT elsewhere, then the item
+        aggregates and leaderboards are updated once per item, and the distinct
+        count sketches once per register. Only flushes :
+        the caller owns the transaction.
+        """
+        now = datetime.now(timezone.utc)
+        rows = [{**rating.model_dump(), "created_at": now, "updated_at": now} for rating in ratings]
+        if not self._copy(rows):
+            self.db.execute(insert(Rating), rows)
+
+        values_by_item: Dict[int, List[float]] = defaultdict(list)
+        for rating in ratings:
+            values_by_item[rating.item_id].append(rating.value)
+        self.stats.record_inserts(values_by_item)
+        self.leaderboard.record_items(values_by_item)
+        self.distinct.record_ratings((rating.user_id, rating.item_id) for rating in ratings)
+        self.rollups.mark_dirty([now])
+
     def get_by_id(self, rating_id: int) -> Optional[Rating]:
-        return self.db.query(Rating).filter(Rating.id == rating_id).first()
+        # Session.get answers from the identity map when the rating is already loaded
+        return self.db.get(Rating, rating_id)
 
-    def get_ratings_by_item_id(self, item_id: int) -> List[Rating]:
-        return self.db.query(Rating).filter(Rating.item_id == item_id).all()
-    
-    def get_ratings_by_user_id(self, user_id: int) -> List[Rating]:
-        return self.db.query(Rating).filter(Rating.user_id == user_id).all()
-    
-    def list(self) -> List[Rating]:
-        return self.db.query(Rating).all()
+    def list_page(
+        self,
+        limit: int,
+        after: Optional[Tuple[datetime, int]] = None,
+        item_id: Optional[int] = None,
+        user_id: Optional[int] = None,
+        min_value: Optional[float] = None,
+        max_value: Optional[float] = None,
+        has_comment: Optional[bool] = None
+    ) -> List[Rating]:
+        """
+        One page of ratings, most recent first : ordered by (created_at desc, id desc)
+
+        Args:
+            limit: Maximum number of rows to return
+            after: Keyset (created_at, id) of the last row of the previous page
+            item_id, user_id: Only ratings of this item / user
+            min_value, max_value: Bounds (included) of the rating value
+            has_comment: Only ratings with (True) or without (False) a comment
+        """
+        q = select(Rating)
+        if item_id is not None:
+            q = q.where(Rating.item_id == item_id)
+        if user_id is not None:
+            q = q.where(Rating.user_id == user_id)
+        if min_value is not None:
+            q = q.where(Rating.value >= min_value)
+        if max_value is not None:
+            q = q.where(Rating.value <= max_value)
+        if has_comment is not None:
+            q = q.where(Rating.comment.isnot(None) if has_comment else Rating.comment.is_(None))
+
+        # Keyset pagination : only rows strictly before the cursor
+        if after is not None:
+            created_at, rating_id = after
+            q = q.where(
+                or_(
+                    Rating.created_at < created_at,
+                    and_(Rating.created_at == created_at, Rating.id < rating_id)
+                )
+            )
+        q = q.order_by(Rating.created_at.desc(), Rating.id.desc()).limit(limit)
+        return list(self.db.scalars(q))
+
+    # Columns of the rating exports, in order
+    EXPORT_COLUMNS = ("id", "item_id", "user_id", "value", "comment", "created_at", "updated_at")
+
+    def stream_export(
+        self,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        item_id: Optional[int] = None,
+        user_id: Optional[int] = None,
+        batch_size: int = 1000
+    ) -> Iterator[list]:
+        """
+        Yield the ratings as batches of plain rows, ordered by id
+
+        Rows are read through a server-side cursor (yield_per) on a dedicated
+        connection, so neither the identity map nor the result set grow with
+        the table. The connection is released when the generator is closed.
+        """
+        q = select(*(getattr(Rating, column) for column in self.EXPORT_COLUMNS)).order_by(Rating.id)
+        if since is not None:
+            q = q.where(Rating.created_at >= since)
+        if until is not None:
+            q = q.where(Rating.created_at < until)
+        if item_id is not None:
+            q = q.where(Rating.item_id == item_id)
+        if user_id is not None:
+            q = q.where(Rating.user_id == user_id)
+
+        with self.db.get_bind().connect() as connection:
+            result = connection.execution_options(yield_per=batch_size).execute(q)
+            yield from result.partitions()
 
     def update(self, rating_id: int, rating_data: RatingUpdateDTO) -> Optional[Rating]:
         rating = self.get_by_id(rating_id)
         if not rating:
             return None
+        old_value = rating.value
         update_data = rating_data.model_dump(exclude_unset=True)
         for key, value in update_data.items():
             setattr(rating, key, value)
-        self.db.commit()
-        self.db.refresh(rating)
+        self.db.flush()
+        self.stats.record_update(rating.item_id, old_value, rating.value)
+        if rating.value != old_value:
+            self.leaderboard.record_item(rating.item_id)
+        self.distinct.record_ratings([(rating.user_id, rating.item_id)])
+        self.rollups.mark_dirty([rating.created_at])
+        commit_or_flush(self.db, rating)
         return rating
 
     def delete(self, rating_id: int) -> bool:
         rating = self.get_by_id(rating_id)
         if not rating:
             return False
+        item_id, value, created_at = rating.item_id, rating.value, rating.created_at
         self.db.delete(rating)
-        self.db.commit()
+        self.db.flush()
+        self.stats.record_delete(item_id, value)
+        self.leaderboard.record_item(item_id)
+        self.rollups.mark_dirty([created_at])
+        commit_or_flush(self.db)
         return True
 
-    def get_rating_distribution(self) -> List[RatingDistributionDTO]:
-        """
-        Get distribution of ratings across values 1-5
-        Returns a list with count for each rating value
-        """
-        results = self.db.query(
-            Rating.value,
-            func.count(Rating.id).label('count')
-        ).group_by(Rating.value).all()
-        
-        # Make sure all values 1-5 are represented
-        distribution_map = {r.value: r.count for r in results}
-        
-        distribution = []
-        for value in range(1, 6):
-            distribution.append(RatingDistributionDTO(
-                value=value,
-                count=distribution_map.get(value, 0)
-            ))
-            
-        return distribution
-
     def get_recent_ratings(self, limit: int = 10) -> List[Any]:
         """
         Get most recent ratings with user and item information
@@ -113,41 +296,3 @@ class RatingRepository:
             }
             for r in results
         ]
-
-    def get_rating_stats(self) -> Dict[str, Any]:
-        """
-        Get overall rating statistics
-        """
-        # Get average rating
-        avg_result = self.db.query(func.avg(Rating.value)).scalar() or 0
-        average = round(float(avg_result), 1)
-        
-        # Get total count
-        total_count = self.db.query(func.count(Rating.id)).scalar() or 0
-        
-        # Get top category - using the many-to-many relationship 
-        # between items and categories through the item_category table
-        top_category_result = self.db.query(
-            Category.name,
-            func.count(Rating.id).label('rating_count')
-        ).join(
-            # Use the proper association table to join categories and items
-            Item.categories
-        ).join(
-            Rating, Item.id == Rating.item_id
-        ).group_by(
-            Category.name
-        ).order_by(
-            desc('rating_count')
-        ).first()
-        
-        top_category = {
-            'name': top_category_result.name if top_category_result else "Uncategorized",
-            'count': top_category_result.rating_count if top_category_result else 0
-        }
-        
-        return RatingStatsDTO(
-            average=average,
-            totalCount=total_count,
-            topCategory=TopCategoryDTO(**top_category)
-        )
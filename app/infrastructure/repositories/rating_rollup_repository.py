@@ -0,0 +1,242 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import delete, desc, func, insert, literal, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from app.domain.category import Category
+from app.domain.item_category import item_category
+from app.domain.item_rating_bucket import bucket_of
+from app.domain.rating import Rating
+from app.domain.rating_rollup import (
+    PERIOD_OF, RatingRollup, RollupDirtyHour, RollupWatermark, UserRatingRollup, day_of, hour_of
+)
+from app.domain.user import User
+from app.application.schemas.rating_dto import RatingDistributionDTO, RatingStatsDTO, TopCategoryDTO
+from app.application.schemas.user_dto import UserEngagementDTO
+
+class RatingRollupRepository:
+    """
+    Maintains the hourly and daily rating rollups and answers the analytics from them
+
+    Every rating write marks the hour of its rating dirty in its own
+    transaction ; roll_up() recomputes the dirty hours it can see, then the
+    days of these hours from their hours. The marks are seen when the writes
+    are, however long their transactions : nothing relies on timestamps. The
+    first run, without a watermark, rolls up every rating. The analytics read
+    a number of rows that depends on the period and the number of items, not
+    on how many ratings there are.
+    """
+
+    WATERMARK = "ratings"
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def watermark(self) -> Optional[datetime]:
+        return self.db.scalar(select(RollupWatermark.watermark).where(RollupWatermark.name == self.WATERMARK))
+
+    def _claim(self, since: Optional[datetime], until: datetime) -> bool:
+        """Move the watermark from since to until, False if another run already moved it"""
+        if since is None:
+            dialect = self.db.get_bind().dialect.name
+            if dialect == "postgresql":
+                statement = postgresql.insert(RollupWatermark).on_conflict_do_nothing(index_elements=["name"])
+            elif dialect == "sqlite":
+                statement = sqlite.insert(RollupWatermark).on_conflict_do_nothing(index_elements=["name"])
+            else:
+                statement = insert(RollupWatermark).prefix_with("IGNORE")
+            return self.db.execute(statement.values(name=self.WATERMARK, watermark=until)).rowcount == 1
+        moved = self.db.execute(
+            update(RollupWatermark)
+            .where(RollupWatermark.name == self.WATERMARK, RollupWatermark.watermark == since)
+            .values(watermark=until)
+            .execution_options(synchronize_session=False)
+        )
+        return moved.rowcount == 1
+
+    def mark_dirty(self, created_ats: Iterable[Optional[datetime]]) -> None:
+        """Have the next run recompute the hours of ratings created at these times, in the current transaction"""
+        hours = {hour_of(created_at.replace(tzinfo=None)) for created_at in created_ats if created_at is not None}
+        if hours:
+            self.db.execute(insert(RollupDirtyHour), [{"period_start": hour} for hour in sorted(hours)])
+
+    def mark_ratings_dirty(self, *conditions) -> None:
+        """Same for the ratings matching conditions, before a bulk or cascaded deletion"""
+        self.mark_dirty(self.db.scalars(select(Rating.created_at).where(*conditions).distinct()))
+
+    def _all_hours(self) -> Set[datetime]:
+        return {
+            hour_of(created_at) for created_at in self.db.scalars(select(Rating.created_at).distinct())
+            if created_at is not None
+        }
+
+    def roll_up(self, until: datetime) -> Optional[int]:
+        """
+        Bring the rollups up to date with the committed rating writes
+
+        until becomes the watermark, the time of the last run. Returns the
+        number of recomputed hours, None if a concurrent run had the same
+        watermark. Only flushes : the caller owns the transaction.
+        """
+        since = self.watermark()
+        if since is not None and since >= until:
+            return 0
+        if not self._claim(since, until):
+            return None
+        dirty = self.db.execute(select(RollupDirtyHour.id, RollupDirtyHour.period_start)).all()
+        hours = {period_start for _, period_start in dirty}
+        if since is None:
+            hours |= self._all_hours()
+        for hour in sorted(hours):
+            self._roll_up_hour(hour)
+        for day in sorted({day_of(hour) for hour in hours}):
+            self._roll_up_day(day)
+        if dirty:
+            self.db.execute(delete(RollupDirtyHour).where(RollupDirtyHour.id.in_([row_id for row_id, _ in dirty])))
+        return len(hours)
+
+    def _clear(self, granularity: str, period_start: datetime) -> None:
+        for model in (RatingRollup, UserRatingRollup):
+            self.db.execute(
+                delete(model)
+                .where(model.granularity == granularity, model.period_start == period_start)
+                .execution_options(synchronize_session=False)
+            )
+
+    def _roll_up_hour(self, hour: datetime) -> None:
+        self._clear("hour", hour)
+        by_bucket: Dict[Tuple[int, int], List[float]] = defaultdict(lambda: [0, 0.0])
+        by_user: Dict[int, List] = {}
+        for item_id, user_id, value, created_at in self.db.execute(
+            select(Rating.item_id, Rating.user_id, Rating.value, Rating.created_at)
+            .where(Rating.created_at >= hour, Rating.created_at < hour + timedelta(hours=1))
+        ):
+            totals = by_bucket[item_id, bucket_of(value)]
+            totals[0] += 1
+            totals[1] += value
+            activity = by_user.setdefault(user_id, [0, created_at])
+            activity[0] += 1
+            activity[1] = max(activity[1], created_at)
+        if by_bucket:
+            self.db.execute(insert(RatingRollup), [
+                {"granularity": "hour", "period_start": hour, "item_id": item_id, "bucket": bucket,
+                 "rating_count": count, "rating_sum": total}
+                for (item_id, bucket), (count, total) in by_bucket.items()
+            ])
+            self.db.execute(insert(UserRatingRollup), [
+                {"granularity": "hour", "period_start": hour, "user_id": user_id,
+                 "rating_count": count, "last_rated_at": last_rated_at}
+                for user_id, (count, last_rated_at) in by_user.items()
+            ])
+
+    @staticmethod
+    def _hours_of(model, day: datetime) -> list:
+        return [model.granularity == "hour", model.period_start >= day, model.period_start < day + timedelta(days=1)]
+
+    def _roll_up_day(self, day: datetime) -> None:
+        """Sum the hours of the day, which are up to date"""
+        self._clear("day", day)
+        self.db.execute(insert(RatingRollup).from_select(
+            ["granularity", "period_start", "item_id", "bucket", "rating_count", "rating_sum"],
+            select(
+                literal("day"), literal(day), RatingRollup.item_id, RatingRollup.bucket,
+                func.sum(RatingRollup.rating_count), func.sum(RatingRollup.rating_sum)
+            ).where(*self._hours_of(RatingRollup, day)).group_by(RatingRollup.item_id, RatingRollup.bucket)
+        ))
+        self.db.execute(insert(UserRatingRollup).from_select(
+            ["granularity", "period_start", "user_id", "rating_count", "last_rated_at"],
+            select(
+                literal("day"), literal(day), UserRatingRollup.user_id,
+                func.sum(UserRatingRollup.rating_count), func.max(UserRatingRollup.last_rated_at)
+            ).where(*self._hours_of(UserRatingRollup, day)).group_by(UserRatingRollup.user_id)
+        ))
+
+    def rebuild(self, until: datetime) -> int:
+        """Recompute every rollup from the ratings, return the number of hours"""
+        for model in (RatingRollup, UserRatingRollup, RollupWatermark, RollupDirtyHour):
+            self.db.execute(delete(model).execution_options(synchronize_session=False))
+        return self.roll_up(until) or 0
+
+    @staticmethod
+    def _in_range(model, granularity: str, start: Optional[datetime], end: Optional[datetime]) -> list:
+        """Periods of the granularity overlapping [start, end)"""
+        conditions = [model.granularity == granularity]
+        if start is not None:
+            conditions.append(model.period_start >= PERIOD_OF[granularity](start))
+        if end is not None:
+            conditions.append(model.period_start < end)
+        return conditions
+
+    def get_rating_distribution(
+        self, granularity: str, start: Optional[datetime] = None, end: Optional[datetime] = None
+    ) -> List[RatingDistributionDTO]:
+        """Number of ratings by star from 1 to 5, values rounded half up to the nearest star"""
+        counts = dict(self.db.execute(
+            select(RatingRollup.bucket, func.sum(RatingRollup.rating_count))
+            .where(*self._in_range(RatingRollup, granularity, start, end))
+            .group_by(RatingRollup.bucket)
+        ).all())
+        # Star n gathers the half-star buckets [n - 0.5, n) and [n, n + 0.5)
+        return [
+            RatingDistributionDTO(value=star, count=counts.get(2 * star - 1, 0) + counts.get(2 * star, 0))
+            for star in range(1, 6)
+        ]
+
+    def get_rating_stats(
+        self, granularity: str, start: Optional[datetime] = None, end: Optional[datetime] = None
+    ) -> RatingStatsDTO:
+        in_range = self._in_range(RatingRollup, granularity, start, end)
+        total_count, total_sum = self.db.execute(
+            select(func.coalesce(func.sum(RatingRollup.rating_count), 0), func.coalesce(func.sum(RatingRollup.rating_sum), 0.0))
+            .where(*in_range)
+        ).one()
+        # Ratings of an item count for every category the item is in today
+        top_category = self.db.execute(
+            select(Category.name, func.sum(RatingRollup.rating_count).label("rating_count"))
+            .join(item_category, item_category.c.item_id == RatingRollup.item_id)
+            .join(Category, Category.id == item_category.c.category_id)
+            .where(*in_range)
+            .group_by(Category.name)
+            .order_by(desc("rating_count"))
+            .limit(1)
+        ).first()
+        return RatingStatsDTO(
+            average=round(total_sum / total_count, 1) if total_count else 0.0,
+            totalCount=total_count,
+            topCategory=TopCategoryDTO(
+                name=top_category.name if top_category else "Uncategorized",
+                count=top_category.rating_count if top_category else 0
+            )
+        )
+
+    def get_user_engagement(
+        self, limit: int, granularity: str, start: Optional[datetime] = None, end: Optional[datetime] = None
+    ) -> List[UserEngagementDTO]:
+        """Users with the most ratings in the period"""
+        activity = (
+            select(
+                UserRatingRollup.user_id,
+                func.sum(UserRatingRollup.rating_count).label("ratings_count"),
+                func.max(UserRatingRollup.last_rated_at).label("last_activity"),
+            )
+            .where(*self._in_range(UserRatingRollup, granularity, start, end))
+            .group_by(UserRatingRollup.user_id)
+            .order_by(desc("ratings_count"), UserRatingRollup.user_id)
+            .limit(limit)
+            .subquery()
+        )
+        rows = self.db.execute(
+            select(activity, User.name)
+            .join(User, User.id == activity.c.user_id)
+            .order_by(desc(activity.c.ratings_count), activity.c.user_id)
+        )
+        return [
+            UserEngagementDTO(
+                user_id=r.user_id,
+                username=r.name,
+                ratings_count=r.ratings_count,
+                last_activity=r.last_activity.date()
+            )
+            for r in rows
+        ]
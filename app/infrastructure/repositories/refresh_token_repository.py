@@ -2,6 +2,7 @@ from datetime import datetime
 from typing import Optional
 from sqlalchemy.orm import Session
 from app.domain.refresh_token import RefreshToken
+from app.infrastructure.unit_of_work import commit_or_flush
 
 class RefreshTokenRepository:
     def __init__(self, db: Session):
@@ -16,8 +17,7 @@ class RefreshTokenRepository:
         )
         
         self.db.add(refresh_token)
-        self.db.commit()
-        self.db.refresh(refresh_token)
+        commit_or_flush(self.db, refresh_token)
         
         return refresh_token
     
@@ -33,6 +33,6 @@ class RefreshTokenRepository:
             return False
         
         refresh_token.revoked = True
-        self.db.commit()
+        commit_or_flush(self.db)
         
         return True
@@ -1,5 +1,12 @@
+from typing import Dict, Iterable, List
+from sqlalchemy import insert, select
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
+from app.domain.catalog_version import ITEM_TAGS
+from app.domain.item_tag import item_tag
 from app.domain.tag import Tag
+from app.infrastructure.repositories.catalog_version_repository import CatalogVersionRepository
+from app.infrastructure.unit_of_work import commit_or_flush
 
 class TagRepository:
     def __init__(self, db: Session):
@@ -11,23 +18,53 @@ class TagRepository:
     def get(self, tag_id: int):
         return self.db.query(Tag).filter(Tag.id == tag_id).first()
 
+    def item_ids(self, tag_id: int) -> List[int]:
+        return list(self.db.scalars(
+            select(item_tag.c.item_id).where(item_tag.c.tag_id == tag_id)
+        ))
+
+    def ensure_many(self, names: Iterable[str]) -> Dict[str, int]:
+        """
+        Return the ids of the given tag names, creating the missing ones
+
+        Two queries whatever the number of names : missing tags are inserted
+        in one statement that skips names created concurrently, then every id
+        is read back. Only flushes.
+        """
+        names = set(names)
+        if not names:
+            return {}
+        existing = dict(self.db.execute(select(Tag.name, Tag.id).where(Tag.name.in_(names))).all())
+        missing = [{"name": name} for name in names if name not in existing]
+        if missing:
+            dialect = self.db.get_bind().dialect.name
+            if dialect == "postgresql":
+                statement = postgresql.insert(Tag).on_conflict_do_nothing(index_elements=["name"])
+            elif dialect == "sqlite":
+                statement = sqlite.insert(Tag).on_conflict_do_nothing(index_elements=["name"])
+            else:
+                statement = insert(Tag)
+            self.db.execute(statement, missing)
+            existing = dict(self.db.execute(select(Tag.name, Tag.id).where(Tag.name.in_(names))).all())
+        return existing
+
     def create(self, name: str):
         tag = Tag(name=name)
         self.db.add(tag)
-        self.db.commit()
-        self.db.refresh(tag)
+        commit_or_flush(self.db, tag)
         return tag
 
     def update(self, tag_id: int, name: str):
         tag = self.get(tag_id)
         if tag:
             tag.name = name
-            self.db.commit()
-            self.db.refresh(tag)
+            CatalogVersionRepository(self.db).bump(ITEM_TAGS)
+            commit_or_flush(self.db, tag)
         return tag
 
     def delete(self, tag_id: int):
         tag = self.get(tag_id)
         if tag:
             self.db.delete(tag)
-            self.db.commit()
+            CatalogVersionRepository(self.db).bump(ITEM_TAGS)
+            commit_or_flush(self.db)
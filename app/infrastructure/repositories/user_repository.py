@@ -1,15 +1,21 @@
 from datetime import datetime, timedelta
 from typing import List, Optional
-from sqlalchemy import func, desc
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from app.api.security import hash_password
 from app.domain.user import User
 from app.domain.rating import Rating
+from app.domain.distinct_sketch import ACTIVE_USERS, window_start
+from app.infrastructure.repositories.distinct_count_repository import DistinctCountRepository
+from app.infrastructure.repositories.item_rating_stats_repository import ItemRatingStatsRepository
+from app.infrastructure.repositories.leaderboard_repository import LeaderboardRepository
+from app.infrastructure.repositories.rating_rollup_repository import RatingRollupRepository
 from app.application.schemas.user_dto import (
     UserCreateDTO, UserUpdateDTO, 
-    UserGrowthDTO, UserEngagementDTO, UserStatsDTO
+    UserGrowthDTO, UserStatsDTO
 )
 from app.config import settings
+from app.infrastructure.unit_of_work import commit_or_flush
 
 class UserRepository:
     def __init__(self, db: Session):
@@ -27,8 +33,7 @@ class UserRepository:
             user.role = "admin"
 
         self.db.add(user)
-        self.db.commit()
-        self.db.refresh(user)
+        commit_or_flush(self.db, user)
         return user
 
     def get_by_id(self, user_id: int) -> Optional[User]:
@@ -52,16 +57,27 @@ class UserRepository:
             setattr(user, key, value)
         
         user.updated_at = datetime.now()
-        self.db.commit()
-        self.db.refresh(user)
+        commit_or_flush(self.db, user)
         return user
 
+    def rated_item_ids(self, user_id: int) -> List[int]:
+        return [
+            item_id for (item_id,) in
+            self.db.query(Rating.item_id).filter(Rating.user_id == user_id).distinct()
+        ]
+
     def delete(self, user_id: int) -> bool:
         user = self.get_by_id(user_id)
         if not user:
             return False
+        # The user's ratings are cascaded : remember which item stats and rollup hours they feed
+        rated_item_ids = self.rated_item_ids(user_id)
+        RatingRollupRepository(self.db).mark_ratings_dirty(Rating.user_id == user_id)
         self.db.delete(user)
-        self.db.commit()
+        self.db.flush()
+        ItemRatingStatsRepository(self.db).refresh(rated_item_ids)
+        LeaderboardRepository(self.db).record_items(rated_item_ids)
+        commit_or_flush(self.db)
         return True
 
     def get_user_growth(self, days: int = 30) -> List[UserGrowthDTO]:
@@ -103,33 +119,6 @@ class UserRepository:
             for date, count in all_dates.items()
         ]
 
-    def get_user_engagement(self, limit: int = 10) -> List[UserEngagementDTO]:
-        """
-        Get most engaged users based on rating activity
-        """
-        results = self.db.query(
-            User.id.label('user_id'),
-            User.name.label('username'),
-            func.count(Rating.id).label('ratings_count'),
-            func.max(Rating.created_at).label('last_activity')
-        ).join(
-            Rating, User.id == Rating.user_id
-        ).group_by(
-            User.id, User.name
-        ).order_by(
-            desc('ratings_count')
-        ).limit(limit).all()
-        
-        return [
-            UserEngagementDTO(
-                user_id=r.user_id,
-                username=r.username,
-                ratings_count=r.ratings_count,
-                last_activity=r.last_activity.date()
-            )
-            for r in results
-        ]
-
     def get_user_stats(self) -> UserStatsDTO:
         """
         Get overall user statistics
@@ -137,13 +126,8 @@ class UserRepository:
         # Total users
         total_users = self.db.query(func.count(User.id)).scalar() or 0
         
-        # Active users (users with at least one rating in last 30 days)
-        thirty_days_ago = datetime.now() - timedelta(days=30)
-        active_users = self.db.query(
-            func.count(func.distinct(Rating.user_id))
-        ).filter(
-            Rating.created_at >= thirty_days_ago
-        ).scalar() or 0
+        # Active users (users who wrote a rating in the last 30 days), estimated from the daily sketches
+        active_users = DistinctCountRepository(self.db).estimate(ACTIVE_USERS, 0, window_start(30))
         
         # New users today
         today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
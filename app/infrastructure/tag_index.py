@@ -0,0 +1,178 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, FrozenSet, Iterable, Iterator, List, Optional, Tuple
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.domain.catalog_version import ITEM_TAGS, ITEMS
+from app.domain.item import Item
+from app.domain.item_tag import item_tag
+from app.domain.tag import Tag
+from app.infrastructure.repositories.catalog_version_repository import CatalogVersionRepository
+
+
+def iter_bits(bitmap: int, after: int = 0) -> Iterator[int]:
+    """Positions of the set bits of bitmap greater than after, in increasing order"""
+    position = after + 1
+    bitmap >>= position
+    while bitmap:
+        skip = (bitmap & -bitmap).bit_length() - 1
+        position += skip
+        yield position
+        bitmap >>= skip + 1
+        position += 1
+
+
+def bitmap_of(positions: Iterable[int]) -> int:
+    """Bitmap with the bits at positions set, built at once rather than by one OR per bit"""
+    positions = list(positions)
+    if not positions:
+        return 0
+    buffer = bytearray(max(positions) // 8 + 1)
+    for position in positions:
+        buffer[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(buffer, "little")
+
+
+@contextmanager
+def primary_session(db: Session) -> Iterator[Session]:
+    """db, or a session on the primary when db reads a replica"""
+    factory = db.info.get("primary")
+    if factory is None:
+        yield db
+        return
+    session = factory()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+class TagIndex:
+    """
+    Inverted index tag name -> bitmap of item ids, kept in worker memory
+
+    Bitmaps are Python ints (bit n set = item n has the tag), so AND / OR /
+    NOT queries are plain bitwise operations and walking the result yields
+    item ids in increasing order.
+
+    The copy is stamped with the catalog versions of items and item_tag,
+    bumped in the transaction of every change, so every worker notices the
+    writes of the others whatever the cache backend. The worker that made a
+    change applies it to its own copy at once ; the others reload the index,
+    at most once every reload_interval seconds however many writes happen.
+    Versions and rows are always read on the primary : a lagging replica
+    would stamp old rows with the newest version.
+    """
+
+    def __init__(self, reload_interval: Optional[float] = None):
+        self.reload_interval = settings.TAG_INDEX_RELOAD_INTERVAL_SECONDS if reload_interval is None else reload_interval
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._tags: Dict[str, int] = {}
+        self._item_tags: Dict[int, FrozenSet[str]] = {}
+        self._universe = 0
+        # Catalog versions the local copy reflects, None : not loaded
+        self._marker: Optional[Tuple[int, ...]] = None
+        self._checked_at = 0.0
+
+    @staticmethod
+    def _read_marker(db: Session) -> Tuple[int, ...]:
+        return CatalogVersionRepository(db).get_many(ITEMS, ITEM_TAGS)
+
+    def reload(self, db: Session) -> None:
+        # Read before the rows : a write committed in between makes the next check reload again
+        marker = self._read_marker(db)
+        universe = bitmap_of(db.scalars(select(Item.id)))
+        # Each OR would copy the whole bitmap : collect the ids of every tag first
+        ids_by_tag: Dict[str, List[int]] = {}
+        item_tags: Dict[int, set] = {}
+        for item_id, name in db.execute(select(item_tag.c.item_id, Tag.name).join(Tag, Tag.id == item_tag.c.tag_id)):
+            ids_by_tag.setdefault(name, []).append(item_id)
+            item_tags.setdefault(item_id, set()).add(name)
+        tags = {name: bitmap_of(item_ids) for name, item_ids in ids_by_tag.items()}
+        with self._lock:
+            self._tags = tags
+            self._item_tags = {item_id: frozenset(names) for item_id, names in item_tags.items()}
+            self._universe = universe
+            self._marker = marker
+            self._checked_at = time.monotonic()
+
+    def _ensure_fresh(self, db: Session) -> None:
+        if self._marker is None:
+            # Nothing to serve meanwhile : wait for the reload of another thread, if any
+            with self._reload_lock:
+                if self._marker is None:
+                    with primary_session(db) as primary:
+                        self.reload(primary)
+            return
+        if time.monotonic() - self._checked_at < self.reload_interval:
+            return
+        # One thread checks and reloads, the others keep serving the current copy
+        if not self._reload_lock.acquire(blocking=False):
+            return
+        try:
+            with primary_session(db) as primary:
+                if self._read_marker(primary) != self._marker:
+                    self.reload(primary)
+                else:
+                    self._checked_at = time.monotonic()
+        finally:
+            self._reload_lock.release()
+
+    def query(
+        self,
+        db: Session,
+        all_tags: Optional[Iterable[str]] = None,
+        any_tags: Optional[Iterable[str]] = None,
+        exclude_tags: Optional[Iterable[str]] = None
+    ) -> int:
+        """
+        Bitmap of the items having every tag of all_tags, at least one of any_tags
+        and none of exclude_tags (omitted groups do not filter)
+        """
+        self._ensure_fresh(db)
+        with self._lock:
+            result = self._universe
+            for name in all_tags or ():
+                result &= self._tags.get(name, 0)
+            if any_tags:
+                matching = 0
+                for name in any_tags:
+                    matching |= self._tags.get(name, 0)
+                result &= matching
+            for name in exclude_tags or ():
+                result &= ~self._tags.get(name, 0)
+        return result
+
+    def set_item_tags(self, item_id: int, tag_names: Iterable[str]) -> None:
+        """Record the (committed) tags of a new or retagged item"""
+        names = frozenset(tag_names)
+        bit = 1 << item_id
+        with self._lock:
+            for name in self._item_tags.get(item_id, frozenset()) - names:
+                self._tags[name] &= ~bit
+                if not self._tags[name]:
+                    del self._tags[name]
+            for name in names:
+                self._tags[name] = self._tags.get(name, 0) | bit
+            self._item_tags[item_id] = names
+            self._universe |= bit
+
+    def remove_item(self, item_id: int) -> None:
+        bit = 1 << item_id
+        with self._lock:
+            for name in self._item_tags.pop(item_id, frozenset()):
+                self._tags[name] &= ~bit
+                if not self._tags[name]:
+                    del self._tags[name]
+            self._universe &= ~bit
+
+    def invalidate(self) -> None:
+        """Tag renamed or deleted : reload on the next query (the others see the bumped version)"""
+        self._marker = None
+
+
+# Shared by the threads of a worker
+tag_index = TagIndex()
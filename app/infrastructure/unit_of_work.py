@@ -0,0 +1,58 @@
+from typing import Any
+from sqlalchemy.orm import Session
+
+_DEPTH = "unit_of_work_depth"
+
+
+class UnitOfWork:
+    """
+    Transaction boundary owned by a service
+
+    Inside the block, repositories only flush (see commit_or_flush) and the
+    outermost block commits once on success, or rolls everything back on
+    error. Blocks can be nested : a service calling another one keeps a
+    single transaction. Repositories used outside of any block keep
+    committing on their own, so services can adopt it one at a time.
+
+        with UnitOfWork(db):
+            item = repository.create(data)
+            repository.set_tags(item, tags)
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def __enter__(self) -> "UnitOfWork":
+        self.db.info[_DEPTH] = self.db.info.get(_DEPTH, 0) + 1
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        depth = self.db.info[_DEPTH] - 1
+        if depth:
+            self.db.info[_DEPTH] = depth
+            return
+        del self.db.info[_DEPTH]
+        if exc_type is None:
+            self.db.commit()
+        else:
+            self.db.rollback()
+
+
+def in_unit_of_work(db: Session) -> bool:
+    return db.info.get(_DEPTH, 0) > 0
+
+
+def commit_or_flush(db: Session, *refresh: Any) -> None:
+    """
+    Make a repository write visible : commit it when the repository runs on
+    its own, only flush it inside a unit of work
+
+    The given instances are refreshed after a commit only, a flush does not
+    expire them.
+    """
+    if in_unit_of_work(db):
+        db.flush()
+        return
+    db.commit()
+    for instance in refresh:
+        db.refresh(instance)
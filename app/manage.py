@@ -0,0 +1,133 @@
+"""
+Maintenance commands
+
+Usage:
+    python -m app.manage verify-item-stats
+    python -m app.manage rebuild-item-stats
+    python -m app.manage rebuild-item-histograms
+    python -m app.manage rebuild-search-index
+    python -m app.manage rebuild-leaderboards
+    python -m app.manage roll-up-ratings
+    python -m app.manage rebuild-rating-rollups
+    python -m app.manage rebuild-distinct-counts  (once after upgrading to f1d6b9e3c582)
+    python -m app.manage purge-distinct-counts
+    python -m app.manage purge-idempotency-keys
+"""
+import argparse
+import sys
+from app.application.rating_rollup import rollup_horizon, roll_up_ratings
+from app.domain.distinct_sketch import DISTINCT_COUNT_WINDOWS, window_start
+from app.infrastructure.database import SessionLocal
+from app.infrastructure.idempotency import DatabaseIdempotencyStore
+from app.infrastructure.repositories.distinct_count_repository import DistinctCountRepository
+from app.infrastructure.repositories.item_rating_stats_repository import ItemRatingStatsRepository
+from app.infrastructure.repositories.item_search_repository import ItemSearchRepository
+from app.infrastructure.repositories.leaderboard_repository import LeaderboardRepository
+from app.infrastructure.repositories.rating_rollup_repository import RatingRollupRepository
+
+
+def verify_item_stats(db) -> int:
+    drifted = ItemRatingStatsRepository(db).find_drift()
+    if drifted:
+        print(f"{len(drifted)} item(s) with drifted rating stats: {drifted[:20]}")
+        return 1
+    print("Item rating stats are consistent")
+    return 0
+
+
+def rebuild_item_stats(db) -> int:
+    fixed = ItemRatingStatsRepository(db).rebuild()
+    if fixed:
+        # The leaderboards are ranked from the stats
+        LeaderboardRepository(db).rebuild()
+    db.commit()
+    print(f"Rebuilt rating stats of {fixed} item(s)")
+    return 0
+
+
+def rebuild_item_histograms(db) -> int:
+    count = ItemRatingStatsRepository(db).rebuild_histograms()
+    db.commit()
+    print(f"Rebuilt the rating histograms of {count} item(s)")
+    return 0
+
+
+def rebuild_search_index(db) -> int:
+    ItemSearchRepository(db).rebuild()
+    db.commit()
+    print("Rebuilt the item search index")
+    return 0
+
+
+def rebuild_leaderboards(db) -> int:
+    count = LeaderboardRepository(db).rebuild()
+    db.commit()
+    print(f"Rebuilt {count} leaderboard(s)")
+    return 0
+
+
+def roll_up_ratings_command(db) -> int:
+    hours = roll_up_ratings(db)
+    if hours is None:
+        print("Another rollup is running")
+        return 1
+    print(f"Rolled up {hours} hour(s) of ratings")
+    return 0
+
+
+def rebuild_rating_rollups(db) -> int:
+    hours = RatingRollupRepository(db).rebuild(rollup_horizon())
+    db.commit()
+    print(f"Rebuilt the rating rollups of {hours} hour(s)")
+    return 0
+
+
+def rebuild_distinct_counts(db) -> int:
+    count = DistinctCountRepository(db).rebuild(window_start(max(DISTINCT_COUNT_WINDOWS)))
+    db.commit()
+    print(f"Rebuilt the distinct count sketches from {count} rating(s)")
+    return 0
+
+
+def purge_distinct_counts(db) -> int:
+    # Days older than the longest window are never read again
+    purged = DistinctCountRepository(db).prune(window_start(max(DISTINCT_COUNT_WINDOWS)))
+    db.commit()
+    print(f"Purged {purged} expired sketch register(s)")
+    return 0
+
+
+def purge_idempotency_keys(db) -> int:
+    purged = DatabaseIdempotencyStore(lambda: db).purge()
+    print(f"Purged {purged} expired idempotency key(s)")
+    return 0
+
+
+COMMANDS = {
+    "verify-item-stats": verify_item_stats,
+    "rebuild-item-stats": rebuild_item_stats,
+    "rebuild-item-histograms": rebuild_item_histograms,
+    "rebuild-search-index": rebuild_search_index,
+    "rebuild-leaderboards": rebuild_leaderboards,
+    "roll-up-ratings": roll_up_ratings_command,
+    "rebuild-rating-rollups": rebuild_rating_rollups,
+    "rebuild-distinct-counts": rebuild_distinct_counts,
+    "purge-distinct-counts": purge_distinct_counts,
+    "purge-idempotency-keys": purge_idempotency_keys,
+}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.manage")
+    parser.add_argument("command", choices=sorted(COMMANDS))
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        return COMMANDS[args.command](db)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+"""
+Benchmark of the item list loader
+
+Compares the historical single query (joinedload categories and tags +
+outer join on ratings + GROUP BY) with the two-phase loader of
+ItemRepository.list_with_stats on items that have many tags and ratings.
+
+Usage:
+    python -m benchmarks.bench_item_list [--items 200] [--tags 20] [--categories 5] [--ratings 50]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from sqlalchemy import create_engine, func, insert
+from sqlalchemy.orm import Session, joinedload
+import app.domain  # noqa: F401 - registers every model on Base.metadata
+from app.domain.base import Base
+from app.domain.category import Category
+from app.domain.item import Item
+from app.domain.item_category import item_category
+from app.domain.item_tag import item_tag
+from app.domain.rating import Rating
+from app.domain.tag import Tag
+from app.domain.user import User
+from app.infrastructure.repositories.item_repository import ItemRepository
+from app.infrastructure.repositories.item_rating_stats_repository import ItemRatingStatsRepository
+
+
+def seed(db: Session, n_items: int, n_tags: int, n_categories: int, n_ratings: int):
+    rng = random.Random(42)
+    db.execute(insert(User), [
+        {"name": f"user {i}", "email": f"user{i}@example.com", "hashed_password": "x"}
+        for i in range(n_ratings)
+    ])
+    db.execute(insert(Category), [{"name": f"category {i}"} for i in range(n_categories)])
+    db.execute(insert(Tag), [{"name": f"tag {i}"} for i in range(n_tags)])
+    db.execute(insert(Item), [{"name": f"item {i}", "description": "benchmark"} for i in range(n_items)])
+    item_ids = range(1, n_items + 1)
+    db.execute(insert(item_category), [
+        {"item_id": i, "category_id": c} for i in item_ids for c in range(1, n_categories + 1)
+    ])
+    db.execute(insert(item_tag), [
+        {"item_id": i, "tag_id": t} for i in item_ids for t in range(1, n_tags + 1)
+    ])
+    db.execute(insert(Rating), [
+        {"item_id": i, "user_id": u, "value": rng.randint(0, 10) / 2}
+        for i in item_ids for u in range(1, n_ratings + 1)
+    ])
+    ItemRatingStatsRepository(db).refresh(item_ids)
+    db.commit()
+
+
+def legacy_query(db: Session):
+    return (
+        db.query(
+            Item,
+            func.coalesce(func.avg(Rating.value), 0).label("avg_rating"),
+            func.count(Rating.id).label("count_rating")
+        )
+        .outerjoin(Item.ratings)
+        .options(joinedload(Item.categories))
+        .options(joinedload(Item.tags))
+        .group_by(Item.id)
+    )
+
+
+def timed(fn, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=200)
+    parser.add_argument("--tags", type=int, default=20)
+    parser.add_argument("--categories", type=int, default=5)
+    parser.add_argument("--ratings", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(engine)
+        with Session(engine) as db:
+            seed(db, args.items, args.tags, args.categories, args.ratings)
+
+            # Rows materialized by the database : the legacy query multiplies
+            # ratings x categories x tags per item, the loader adds them up
+            legacy_rows = args.items * max(args.ratings, 1) * max(args.categories, 1) * max(args.tags, 1)
+            two_phase_rows = args.items * (1 + args.categories + args.tags)
+
+            def run_legacy():
+                db.expunge_all()
+                legacy_query(db).all()
+
+            def run_two_phase():
+                db.expunge_all()
+                ItemRepository(db).list_with_stats()
+
+            legacy = timed(run_legacy, args.repeat)
+            two_phase = timed(run_two_phase, args.repeat)
+
+        engine.dispose()
+
+    print(f"{args.items} items x {args.categories} categories x {args.tags} tags x {args.ratings} ratings")
+    print(f"legacy joinedload x GROUP BY : {legacy * 1000:9.1f} ms  {legacy_rows} rows")
+    print(f"two-phase loader             : {two_phase * 1000:9.1f} ms  {two_phase_rows} rows")
+    print(f"speedup                      : {legacy / two_phase:9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark of the rating ingestion paths
+
+Compares the throughput, in rows per second, of one RatingService.create_rating
+per row (the former way of importing partner feeds through POST /ratings)
+with RatingService.ingest_ratings (POST /ratings/batch).
+
+Usage:
+    python -m benchmarks.bench_rating_batch [--users 200] [--items 100] [--ratings 10000] [--chunk 1000]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from sqlalchemy import create_engine, delete, insert
+from sqlalchemy.orm import Session
+import app.domain  # noqa: F401 - registers every model on Base.metadata
+from app.application.schemas.rating_dto import RatingCreateDTO
+from app.application.services import rating_service
+from app.application.services.rating_service import RatingService
+from app.domain.base import Base
+from app.domain.category_top_item import CategoryTopItem
+from app.domain.item import Item
+from app.domain.item_rating_stats import ItemRatingStats
+from app.domain.rating import Rating
+from app.domain.user import User
+
+
+def seed(db: Session, n_users: int, n_items: int):
+    db.execute(insert(User), [
+        {"name": f"user {i}", "email": f"user{i}@example.com", "hashed_password": "x"}
+        for i in range(n_users)
+    ])
+    db.execute(insert(Item), [{"name": f"item {i}", "description": "benchmark"} for i in range(n_items)])
+    db.execute(insert(ItemRatingStats), [
+        {"item_id": i, "rating_sum": 0.0, "rating_count": 0} for i in range(1, n_items + 1)
+    ])
+    db.commit()
+
+
+def reset(db: Session):
+    db.execute(delete(Rating))
+    db.execute(delete(CategoryTopItem))
+    db.execute(ItemRatingStats.__table__.update().values(
+        rating_sum=0.0, rating_count=0, rating_min=None, rating_max=None
+    ))
+    db.commit()
+
+
+def payloads(n_users: int, n_items: int, n_ratings: int):
+    rng = random.Random(42)
+    pairs = rng.sample([(u, i) for u in range(1, n_users + 1) for i in range(1, n_items + 1)], n_ratings)
+    return [{"user_id": u, "item_id": i, "value": rng.randint(0, 10) / 2} for u, i in pairs]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--items", type=int, default=100)
+    parser.add_argument("--ratings", type=int, default=10000)
+    parser.add_argument("--chunk", type=int, default=1000)
+    args = parser.parse_args()
+    rows = payloads(args.users, args.items, min(args.ratings, args.users * args.items))
+    rating_service.settings.RATING_BATCH_CHUNK_SIZE = args.chunk
+    # Cache invalidations are not what is measured
+    rating_service.invalidate_items = lambda item_ids: None
+    rating_service.invalidate_rating_analytics = lambda: None
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(engine)
+        with Session(engine) as db:
+            seed(db, args.users, args.items)
+
+            start = time.perf_counter()
+            service = RatingService(db)
+            for row in rows:
+                service.create_rating(RatingCreateDTO(**row))
+            per_row = time.perf_counter() - start
+            reset(db)
+
+            start = time.perf_counter()
+            report = RatingService(db).ingest_ratings(rows)
+            batch = time.perf_counter() - start
+            assert report.created == len(rows)
+
+        engine.dispose()
+
+    print(f"{len(rows)} ratings on {args.items} items, chunks of {args.chunk}")
+    print(f"one create_rating per row : {len(rows) / per_row:10.0f} rows/s  {per_row:7.2f} s")
+    print(f"ingest_ratings            : {len(rows) / batch:10.0f} rows/s  {batch:7.2f} s")
+    print(f"speedup                   : {per_row / batch:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
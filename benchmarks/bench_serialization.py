@@ -0,0 +1,99 @@
+"""
+Microbenchmark of the item and rating response serialization
+
+Compares the historical path (validate every row, let FastAPI validate the
+response_model again, render with json) with the fast path of
+app.api.responses (validate once, serialize once with the TypeAdapter).
+
+Usage:
+    python -m benchmarks.bench_serialization [--sizes 1000 10000]
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import List
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+from app.api.responses import ValidatedJSONResponse, rating_list_response
+from app.application.schemas.category_dto import CategoryDTO
+from app.application.schemas.item_dto import ItemPageResponse, ItemResponse
+from app.application.schemas.rating_dto import RatingResponse
+from app.application.schemas.tag_dto import TagDTO
+from app.domain.rating import Rating
+
+
+def make_item_rows(n: int) -> List[dict]:
+    now = datetime.now(timezone.utc)
+    categories = [CategoryDTO(id=i, name=f"category {i}", description="benchmark") for i in range(3)]
+    tags = [TagDTO(id=i, name=f"tag {i}") for i in range(5)]
+    return [
+        {
+            "id": i, "name": f"item {i}", "description": "benchmark item", "image_url": None,
+            "created_at": now, "updated_at": now, "categories": categories, "tags": tags,
+            "avg_rating": 3.5, "count_rating": 12,
+        }
+        for i in range(n)
+    ]
+
+
+def make_ratings(n: int) -> List[Rating]:
+    now = datetime.now(timezone.utc)
+    return [
+        Rating(id=i, value=4.0, comment="benchmark", user_id=i, item_id=i, created_at=now, updated_at=now)
+        for i in range(n)
+    ]
+
+
+def legacy_items(rows):
+    field = create_model_field("Response", ItemPageResponse, mode="serialization")
+    page = {"items": [ItemResponse.model_validate(row) for row in rows], "next_cursor": None}
+    content = asyncio.run(serialize_response(field=field, response_content=page))
+    return JSONResponse(content).body
+
+
+def fast_items(rows):
+    page = ItemPageResponse(items=[ItemResponse(**row) for row in rows], next_cursor=None)
+    return ValidatedJSONResponse(page).body
+
+
+def legacy_ratings(ratings):
+    field = create_model_field("Response", List[RatingResponse], mode="serialization")
+    content = asyncio.run(serialize_response(field=field, response_content=ratings))
+    return JSONResponse(content).body
+
+
+def fast_ratings(ratings):
+    return rating_list_response(ratings).body
+
+
+def rows_per_second(fn, payload, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(payload)
+        best = min(best, time.perf_counter() - start)
+    return len(payload) / best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'payload':<10}{'rows':>8}{'legacy rows/s':>16}{'fast rows/s':>16}{'speedup':>10}")
+    for size in args.sizes:
+        for name, payload, legacy, fast in (
+            ("items", make_item_rows(size), legacy_items, fast_items),
+            ("ratings", make_ratings(size), legacy_ratings, fast_ratings),
+        ):
+            assert len(legacy(payload)) > 0 and len(fast(payload)) > 0
+            slow = rows_per_second(legacy, payload, args.repeat)
+            quick = rows_per_second(fast, payload, args.repeat)
+            print(f"{name:<10}{size:>8}{slow:>16,.0f}{quick:>16,.0f}{quick / slow:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,20 @@
 import pytest
 import os
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 
 # Force use of test settings
 os.environ["APP_ENV"] = "test"
+# The startup warm-up would run against the module engine, not the test one
+os.environ["ITEM_CACHE_WARM_TOP_N"] = "0"
+# Same for the background jobs : tests run them on the test session
+os.environ["RATING_ROLLUP_INTERVAL_SECONDS"] = "0"
+os.environ["ANALYTICS_SNAPSHOT_INTERVAL_SECONDS"] = "0"
 
 # Import necessary modules
-from app.infrastructure.database import Base, get_db
+from app.infrastructure.database import Base, get_db, get_read_db
 from app.api.main import app
 from app.config_test import test_settings
 
@@ -54,6 +59,7 @@ def override_get_db(test_db):
             test_db.rollback()
     
     app.dependency_overrides[get_db] = _get_db_override
+    app.dependency_overrides[get_read_db] = _get_db_override
     yield
     
     # Restore original settings
@@ -66,6 +72,30 @@ def client(override_get_db):
     with TestClient(app) as test_client:
         yield test_client
 
+@pytest.fixture(scope="function")
+def sql_statements():
+    """Records the SQL statements executed on the test engine"""
+    statements = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", _record)
+    yield statements
+    event.remove(engine, "before_cursor_execute", _record)
+
+@pytest.fixture(scope="function")
+def commits():
+    """Counts the transactions committed on the test engine"""
+    counter = {"count": 0}
+
+    def _count(conn):
+        counter["count"] += 1
+
+    event.listen(engine, "commit", _count)
+    yield counter
+    event.remove(engine, "commit", _count)
+
 # Store tokens that need to be shared between test modules
 pytest.admin_refresh_token = None
 pytest.user_refresh_token = None
@@ -0,0 +1,35 @@
+import pytest
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.application.analytics_snapshots import AnalyticsSnapshots
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+def test_last_snapshot_served_when_refresh_fails(db):
+    results = [TimeoutError("statement timeout"), {"count": 1}, TimeoutError("statement timeout")]
+
+    def load(db):
+        result = results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    snapshots = AnalyticsSnapshots({"stats": (load, TypeAdapter(dict))})
+    # Nothing to fall back on yet
+    with pytest.raises(TimeoutError):
+        snapshots.get("stats", db)
+
+    body, age = snapshots.get("stats", db)
+    assert body == b'{"count":1}' and age >= 0
+    # Served from memory : the loader is not called again
+    assert snapshots.get("stats", db)[0] == b'{"count":1}'
+    # The refresh fails : the last snapshot is still served
+    assert snapshots.get("stats", db, refresh=True)[0] == b'{"count":1}'
+    assert not results
@@ -7,7 +7,7 @@ def generate_random_email():
     random_str = ''.join(random.choices(string.ascii_lowercase + string.digits, k=10))
     return f"test_{random_str}@example.com"
 
-def test_auth_flow(client):
+def test_auth_flow(client, commits):
     # 1. Register a new user with a unique email
     register_payload = {
         "name": "Auth Test User",
@@ -38,8 +38,11 @@ def test_auth_flow(client):
     
     # 4. Refresh the token
     refresh_payload = {"refresh_token": refresh_token}
+    commits["count"] = 0
     response = client.post("/auth/refresh", json=refresh_payload)
     assert response.status_code == 200, response.text
+    # Revoking the old token and storing the new one is a single transaction
+    assert commits["count"] == 1
     new_tokens = response.json()
     assert "access_token" in new_tokens
     assert "refresh_token" in new_tokens
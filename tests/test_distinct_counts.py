@@ -0,0 +1,76 @@
+from datetime import timedelta
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.application.schemas.rating_dto import RatingCreateDTO
+from app.domain.base import Base
+from app.domain.distinct_sketch import (
+    ACTIVE_USERS, ITEM_RATERS, SKETCH_PRECISION, DistinctSketchRegister, utc_today, window_start
+)
+from app.infrastructure.hyperloglog import HyperLogLog, relative_error
+from app.infrastructure.repositories.distinct_count_repository import DistinctCountRepository
+from app.infrastructure.repositories.rating_repository import RatingRepository
+
+# Estimates further than this from the exact count are (much) less than 1 in 1000
+BOUND = 4 * relative_error(SKETCH_PRECISION)
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+@pytest.mark.parametrize("count", [0, 10, 1000, 50000])
+def test_estimate_within_error_bound(count):
+    sketch = HyperLogLog(SKETCH_PRECISION)
+    for value in range(count):
+        sketch.add(value)
+        sketch.add(value)
+    assert abs(sketch.estimate() - count) <= BOUND * count
+
+def test_merge_counts_the_union():
+    first, second, union = (HyperLogLog(SKETCH_PRECISION) for _ in range(3))
+    for value in range(20000):
+        (first if value % 3 else second).add(value)
+        union.add(value)
+    # Overlapping values are counted once
+    for value in range(0, 20000, 7):
+        second.add(value)
+    first.merge(second)
+    assert first.registers == union.registers
+    with pytest.raises(ValueError):
+        first.merge(HyperLogLog(SKETCH_PRECISION - 1))
+
+def test_sketches_follow_rating_writes(db):
+    ratings = RatingRepository(db)
+    ratings.insert_many([
+        RatingCreateDTO(user_id=user_id, item_id=1 + user_id % 2, value=3) for user_id in range(1, 3001)
+    ])
+    # Users who rated both items are active once
+    ratings.insert_many([RatingCreateDTO(user_id=user_id, item_id=3, value=4) for user_id in range(2001, 4001)])
+    distinct = DistinctCountRepository(db)
+    today = utc_today()
+    for metric, scope_id, exact in (
+        (ACTIVE_USERS, 0, distinct.exact_active_users(today)),
+        (ITEM_RATERS, 1, distinct.exact_item_raters(1, today)),
+        (ITEM_RATERS, 3, distinct.exact_item_raters(3, today)),
+    ):
+        assert exact in (4000, 1500, 2000)
+        assert abs(distinct.estimate(metric, scope_id, today) - exact) <= BOUND * exact
+
+    # Sketches of earlier days only count in the windows that include them
+    distinct.record_ratings([(user_id, 1) for user_id in range(5001, 6001)], today - timedelta(days=10))
+    assert abs(distinct.estimate(ACTIVE_USERS, 0, window_start(7)) - 4000) <= BOUND * 4000
+    assert abs(distinct.estimate(ACTIVE_USERS, 0, window_start(30)) - 5000) <= BOUND * 5000
+
+    # A rebuild from the ratings only knows the day of their last write, and keeps the earlier days
+    distinct.record_ratings([(7001, 1)], today - timedelta(days=100))
+    assert distinct.rebuild(window_start(90)) == 5000
+    assert abs(distinct.estimate(ACTIVE_USERS, 0, window_start(30)) - 4000) <= BOUND * 4000
+    assert db.scalar(select(func.count()).where(DistinctSketchRegister.day < window_start(90))) == 2
+    assert distinct.prune(today + timedelta(days=1)) > 0
+    assert distinct.estimate(ACTIVE_USERS, 0, window_start(90)) == 0
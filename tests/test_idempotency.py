@@ -0,0 +1,118 @@
+import asyncio
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.api.idempotency import IdempotencyMiddleware
+from app.domain.base import Base
+from app.infrastructure.idempotency import (
+    DatabaseIdempotencyStore, IdempotencyRecord, IdempotencyStore, InMemoryIdempotencyStore
+)
+
+@pytest.fixture
+def database_store():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    yield DatabaseIdempotencyStore(sessionmaker(bind=engine))
+    engine.dispose()
+
+@pytest.mark.parametrize("store_name", ["memory", "database"])
+def test_store_claims_once(store_name, database_store):
+    store = database_store if store_name == "database" else InMemoryIdempotencyStore()
+    assert store.claim("key", "request", 60) is None
+    pending = store.claim("key", "request", 60)
+    assert pending.fingerprint == "request" and not pending.completed
+
+    store.complete("key", IdempotencyRecord("request", 201, [("content-type", "application/json")], b"{}"), 60)
+    stored = store.get("key")
+    assert (stored.status_code, stored.headers, stored.body) == (201, [("content-type", "application/json")], b"{}")
+
+    # Expired claims can be taken again
+    assert store.claim("other", "request", -1) is None
+    assert store.claim("other", "request", 60) is None
+    store.release("other")
+    assert store.get("other") is None
+
+def test_concurrent_retries_coalesce():
+    calls = []
+
+    async def endpoint(scope, receive, send):
+        calls.append((await receive())["body"])
+        await asyncio.sleep(0.05)
+        await send({"type": "http.response.start", "status": 201, "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": b'{"id": 1}'})
+
+    middleware = IdempotencyMiddleware(endpoint, InMemoryIdempotencyStore())
+
+    async def post(body: bytes):
+        scope = {"type": "http", "method": "POST", "path": "/items", "query_string": b"",
+                 "headers": [(b"idempotency-key", b"abc")]}
+        sent = []
+
+        async def receive():
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        async def send(message):
+            sent.append(message)
+
+        await middleware(scope, receive, send)
+        return sent
+
+    async def scenario():
+        return await asyncio.gather(post(b"{}"), post(b"{}"), post(b'{"other": 1}'))
+
+    first, retry, misuse = asyncio.run(scenario())
+    assert calls == [b"{}"]
+    assert first[0]["status"] == retry[0]["status"] == 201
+    assert retry[1]["body"] == b'{"id": 1}'
+    assert (b"idempotent-replayed", b"true") in retry[0]["headers"]
+    assert misuse[0]["status"] == 422
+
+def test_auth_routes_are_not_covered():
+    calls = []
+
+    async def endpoint(scope, receive, send):
+        calls.append(scope["path"])
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b'{"access_token": "secret"}'})
+
+    store = InMemoryIdempotencyStore()
+    middleware = IdempotencyMiddleware(endpoint, store)
+
+    async def post(path: str):
+        scope = {"type": "http", "method": "POST", "path": path, "query_string": b"",
+                 "headers": [(b"idempotency-key", b"abc")]}
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            pass
+
+        await middleware(scope, receive, send)
+
+    async def scenario():
+        for _ in range(2):
+            await post("/auth/token")
+
+    asyncio.run(scenario())
+    # Both requests reached the endpoint : nothing was replayed
+    assert calls == ["/auth/token", "/auth/token"]
+
+def test_stores_are_complete_and_bounded():
+    class PartialStore(IdempotencyStore):
+        def claim(self, key, fingerprint, lock_seconds):
+            return None
+
+    with pytest.raises(TypeError):
+        PartialStore()
+
+    # Bounded by the bytes of the bodies : the least recently stored go first
+    store = InMemoryIdempotencyStore(maxsize=10, max_bytes=10)
+    for key in ("a", "b", "c"):
+        assert store.claim(key, "request", 60) is None
+        store.complete(key, IdempotencyRecord("request", 201, [], b"12345"), 60)
+    assert store.get("a") is None
+    assert store.get("b").body == store.get("c").body == b"12345"
+    store.complete("d", IdempotencyRecord("request", 201, [], b"1234567890"), 60)
+    assert store.get("b") is None and store.get("c") is None and store.get("d") is not None
@@ -56,6 +56,40 @@ def test_create_and_get_item(client, user_auth, category_id):
     assert fetched_item["id"] == item_id
     assert fetched_item["name"] == item_payload["name"]
 
+def test_create_item_single_commit(client, user_auth, category_id, commits):
+    item_payload = {"name": "Unit of work item", "category_ids": [category_id], "tags": ["uow"]}
+    commits["count"] = 0
+    response = client.post("/items", json=item_payload, headers=user_auth["headers"])
+    assert response.status_code == 201, response.text
+    # The item, its stats, categories and tags are committed together
+    assert commits["count"] == 1
+
+    # A failing step rolls the whole item back
+    names_before = [item["name"] for item in client.get("/items", params={"limit": 100}).json()["items"]]
+    response = client.post(
+        "/items", json={"name": "Orphan item", "category_ids": [999999]}, headers=user_auth["headers"]
+    )
+    assert response.status_code == 400, response.text
+    names_after = [item["name"] for item in client.get("/items", params={"limit": 100}).json()["items"]]
+    assert "Orphan item" not in names_after
+    assert len(names_after) == len(names_before)
+
+def test_create_item_idempotency_key(client, user_auth, category_id):
+    item_payload = {"name": "Idempotent item", "category_ids": [category_id]}
+    headers = {**user_auth["headers"], "Idempotency-Key": "create-idempotent-item"}
+    first = client.post("/items", json=item_payload, headers=headers)
+    assert first.status_code == 201, first.text
+
+    retry = client.post("/items", json=item_payload, headers=headers)
+    assert retry.status_code == 201, retry.text
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json()["id"] == first.json()["id"]
+    names = [item["name"] for item in client.get("/items", params={"limit": 200}).json()["items"]]
+    assert names.count("Idempotent item") == 1
+
+    response = client.post("/items", json={**item_payload, "name": "Another item"}, headers=headers)
+    assert response.status_code == 422, response.text
+
 def test_list_items_with_filters(client, admin_auth, category_id):
     # Create a few items
     for i in range(3):
@@ -73,15 +107,56 @@ def test_list_items_with_filters(client, admin_auth, category_id):
     # By category
     response = client.get(f"/items?category_id={category_id}")
     assert response.status_code == 200, response.text
-    items = response.json()
+    items = response.json()["items"]
     assert len(items) > 0
     
     # By tag
     response = client.get("/items?tags=filter")
     assert response.status_code == 200, response.text
-    items = response.json()
+    items = response.json()["items"]
     assert len(items) > 0
 
+def test_list_items_keyset_pagination(client, admin_auth, category_id):
+    for i in range(5):
+        item_payload = {
+            "name": f"Paged Item {i}",
+            "description": f"Paged item description {i}",
+            "category_ids": [category_id],
+            "tags": ["paged"]
+        }
+        response = client.post("/items", json=item_payload, headers=admin_auth["headers"])
+        assert response.status_code == 201, response.text
+
+    # Walk the category two items at a time
+    seen = []
+    cursor = None
+    while True:
+        params = {"category_id": category_id, "limit": 2}
+        if cursor:
+            params["after"] = cursor
+        response = client.get("/items", params=params)
+        assert response.status_code == 200, response.text
+        page = response.json()
+        assert len(page["items"]) <= 2
+        seen.extend(item["id"] for item in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert len(seen) == 5
+    assert seen == sorted(seen)
+
+    # Tag filter is applied before paging
+    response = client.get("/items", params={"tags": "paged", "limit": 3})
+    assert response.status_code == 200, response.text
+    page = response.json()
+    assert len(page["items"]) == 3
+    assert page["next_cursor"] is not None
+
+    # Garbage cursors are rejected
+    response = client.get("/items", params={"after": "not-a-cursor"})
+    assert response.status_code == 400
+
 def test_update_item(client, admin_auth, category_id):
     # Create an item to update
     item_payload = {
@@ -127,4 +202,237 @@ def test_delete_item(client, admin_auth, category_id):
     
     # Verify it was deleted
     response = client.get(f"/items/{item_id}")
-    assert response.status_code == 400
\ No newline at end of file
+    assert response.status_code == 400
+
+
+def test_list_items_attaches_all_relations(client, admin_auth, category_id):
+    item_payload = {
+        "name": "Many Tags Item",
+        "description": "Item with several tags",
+        "category_ids": [category_id],
+        "tags": ["multi-a", "multi-b", "multi-c"]
+    }
+    response = client.post("/items", json=item_payload, headers=admin_auth["headers"])
+    assert response.status_code == 201, response.text
+    item_id = response.json()["id"]
+
+    response = client.get("/items", params={"tags": ["multi-a", "multi-c"]})
+    assert response.status_code == 200, response.text
+    items = [item for item in response.json()["items"] if item["id"] == item_id]
+    # Matching two tags must not duplicate the item
+    assert len(items) == 1
+    assert sorted(tag["name"] for tag in items[0]["tags"]) == ["multi-a", "multi-b", "multi-c"]
+    assert [category["id"] for category in items[0]["categories"]] == [category_id]
+    assert items[0]["count_rating"] == 0
+
+def test_conditional_get_item(client, user_auth, category_id, sql_statements):
+    item_payload = {
+        "name": "Conditional Item",
+        "description": "Item served with validators",
+        "category_ids": [category_id],
+        "tags": ["conditional"]
+    }
+    response = client.post("/items", json=item_payload, headers=user_auth["headers"])
+    assert response.status_code == 201, response.text
+    item_id = response.json()["id"]
+
+    response = client.get(f"/items/{item_id}")
+    assert response.status_code == 200, response.text
+    etag = response.headers["ETag"]
+    last_modified = response.headers["Last-Modified"]
+
+    # A fresh copy is revalidated with the marker query only
+    sql_statements.clear()
+    response = client.get(f"/items/{item_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["ETag"] == etag
+    assert len([s for s in sql_statements if s.lstrip().upper().startswith("SELECT")]) == 1
+
+    response = client.get(f"/items/{item_id}", headers={"If-Modified-Since": last_modified})
+    assert response.status_code == 304
+
+    # A rating changes the embedded stats, so the validator
+    response = client.get("/auth/me", headers=user_auth["headers"])
+    rating_payload = {"item_id": item_id, "user_id": response.json()["id"], "value": 3, "comment": "ok"}
+    response = client.post("/ratings", json=rating_payload, headers=user_auth["headers"])
+    assert response.status_code == 201, response.text
+    response = client.get(f"/items/{item_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["count_rating"] == 1
+    assert response.headers["ETag"] != etag
+
+    # So does renaming one of its tags
+    etag = response.headers["ETag"]
+    tag_id = next(t["id"] for t in response.json()["tags"] if t["name"] == "conditional")
+    response = client.put(f"/tags/{tag_id}", json={"name": "conditional-renamed"})
+    assert response.status_code == 200, response.text
+    response = client.get(f"/items/{item_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert "conditional-renamed" in [t["name"] for t in response.json()["tags"]]
+
+def test_conditional_list_and_ratings(client, user_auth, admin_auth, category_id):
+    response = client.get("/items", params={"limit": 5})
+    assert response.status_code == 200, response.text
+    etag = response.headers["ETag"]
+    assert client.get("/items", params={"limit": 5}, headers={"If-None-Match": etag}).status_code == 304
+    # The validator depends on the query
+    assert client.get("/items", params={"limit": 6}, headers={"If-None-Match": etag}).status_code == 200
+
+    item_payload = {"name": "Listed Item", "description": "Changes the catalog", "category_ids": [category_id]}
+    response = client.post("/items", json=item_payload, headers=admin_auth["headers"])
+    assert response.status_code == 201, response.text
+    item_id = response.json()["id"]
+    assert client.get("/items", params={"limit": 5}, headers={"If-None-Match": etag}).status_code == 200
+
+    response = client.get(f"/items/{item_id}/ratings", headers=user_auth["headers"])
+    assert response.status_code == 200, response.text
+    ratings_etag = response.headers["ETag"]
+    headers = {**user_auth["headers"], "If-None-Match": ratings_etag}
+    assert client.get(f"/items/{item_id}/ratings", headers=headers).status_code == 304
+
+    # Deletions leave no updated_at behind : the catalog version catches them
+    etag = client.get("/items", params={"limit": 5}).headers["ETag"]
+    assert client.delete(f"/items/{item_id}", headers=admin_auth["headers"]).status_code == 204
+    assert client.get("/items", params={"limit": 5}, headers={"If-None-Match": etag}).status_code == 200
+
+def test_search_items(client, admin_auth, category_id):
+    names = ["Quokka plush", "Quokka mug", "Wombat poster"]
+    ids = []
+    for name in names:
+        payload = {"name": name, "description": "Souvenir of a quokka trip", "category_ids": [category_id]}
+        response = client.post("/items", json=payload, headers=admin_auth["headers"])
+        assert response.status_code == 201, response.text
+        ids.append(response.json()["id"])
+
+    # Name matches rank above description-only matches, prefixes match
+    response = client.get("/items/search", params={"q": "quok"})
+    assert response.status_code == 200, response.text
+    found = [item["id"] for item in response.json()["items"]]
+    assert sorted(found[:2]) == sorted(ids[:2])
+    assert found[2] == ids[2]
+
+    # Every word must match
+    response = client.get("/items/search", params={"q": "quokka mug"})
+    assert [item["id"] for item in response.json()["items"]] == [ids[1]]
+
+    # Keyset pagination walks the same ranking
+    page = client.get("/items/search", params={"q": "quokka", "limit": 2}).json()
+    assert page["next_cursor"] is not None
+    rest = client.get("/items/search", params={"q": "quokka", "limit": 2, "after": page["next_cursor"]}).json()
+    assert [item["id"] for item in page["items"] + rest["items"]] == found
+    assert rest["next_cursor"] is None
+
+    # The index follows updates and deletions
+    response = client.put(f"/items/{ids[0]}", json={"name": "Koala plush", "description": "Souvenir", "image_url": "http://example.com/koala.jpg"}, headers=admin_auth["headers"])
+    assert response.status_code == 200, response.text
+    response = client.delete(f"/items/{ids[1]}", headers=admin_auth["headers"])
+    assert response.status_code == 204, response.text
+    response = client.get("/items/search", params={"q": "koala"})
+    assert [item["id"] for item in response.json()["items"]] == [ids[0]]
+    response = client.get("/items/search", params={"q": "mug"})
+    assert response.json()["items"] == []
+
+    assert client.get("/items/search", params={"q": "***"}).status_code == 400
+
+def test_list_items_tag_queries(client, admin_auth, category_id):
+    tagged = {"a+b": ["idx-a", "idx-b"], "a": ["idx-a"], "b+c": ["idx-b", "idx-c"]}
+    ids = {}
+    for key, tags in tagged.items():
+        payload = {"name": f"Tagged {key}", "description": "tag index", "category_ids": [category_id], "tags": tags}
+        response = client.post("/items", json=payload, headers=admin_auth["headers"])
+        assert response.status_code == 201, response.text
+        ids[key] = response.json()["id"]
+
+    def listed(**params):
+        response = client.get("/items", params={"category_id": category_id, **params})
+        assert response.status_code == 200, response.text
+        return [item["id"] for item in response.json()["items"]]
+
+    assert listed(all_tags=["idx-a", "idx-b"]) == [ids["a+b"]]
+    assert listed(tags=["idx-a", "idx-c"]) == [ids["a+b"], ids["a"], ids["b+c"]]
+    assert listed(tags=["idx-a", "idx-c"], exclude_tags=["idx-b"]) == [ids["a"]]
+    assert listed(exclude_tags=["idx-a"]) == [ids["b+c"]]
+
+    # Pages of the index walk chain with the usual cursor
+    page = client.get("/items", params={"tags": ["idx-b"], "limit": 1}).json()
+    rest = client.get("/items", params={"tags": ["idx-b"], "limit": 5, "after": page["next_cursor"]}).json()
+    assert [item["id"] for item in page["items"] + rest["items"]] == [ids["a+b"], ids["b+c"]]
+
+    # Retagging and deleting are reflected right away
+    response = client.put(f"/items/{ids['a']}/tags", json=["idx-b"])
+    assert response.status_code == 204, response.text
+    assert listed(all_tags=["idx-a"]) == [ids["a+b"]]
+    response = client.delete(f"/items/{ids['a+b']}", headers=admin_auth["headers"])
+    assert response.status_code == 204, response.text
+    assert listed(tags=["idx-b"]) == [ids["a"], ids["b+c"]]
+
+def test_sparse_fieldsets(client, admin_auth, category_id, sql_statements):
+    payload = {"name": "Sparse Item", "description": "Only some fields", "category_ids": [category_id], "tags": ["sparse"]}
+    response = client.post("/items", json=payload, headers=admin_auth["headers"])
+    assert response.status_code == 201, response.text
+    item_id = response.json()["id"]
+
+    def item_selects():
+        return [s for s in sql_statements if s.lstrip().upper().startswith("SELECT") and "FROM items" in s]
+
+    # Columns only : no stats join, no relation query
+    sql_statements.clear()
+    response = client.get("/items", params={"fields": "id,name", "limit": 2})
+    assert response.status_code == 200, response.text
+    assert set(response.json()["items"][0]) == {"id", "name"}
+    # Besides the catalog marker of the ETag
+    selects = [s for s in item_selects() if "ORDER BY" in s]
+    assert len(selects) == 1
+    assert "item_rating_stats" not in selects[0]
+    assert "description" not in selects[0]
+    assert not any("item_category" in s or "item_tag" in s for s in sql_statements)
+
+    # Aggregates join the stats, one relation loads one table
+    sql_statements.clear()
+    response = client.get(f"/items/{item_id}", params={"fields": "avg_rating,tags"})
+    assert response.status_code == 200, response.text
+    assert response.json() == {"id": item_id, "avg_rating": 0.0, "tags": [{"id": response.json()["tags"][0]["id"], "name": "sparse"}]}
+    assert any("item_tag" in s for s in sql_statements)
+    assert not any("item_category" in s for s in sql_statements)
+
+    # Cursors keep working without created_at in the output
+    page = client.get("/items", params={"fields": "id", "limit": 1}).json()
+    assert page["next_cursor"] is not None
+    rest = client.get("/items", params={"fields": "id", "limit": 1, "after": page["next_cursor"]}).json()
+    assert rest["items"][0]["id"] > page["items"][0]["id"]
+
+    assert client.get("/items", params={"fields": "id,password"}).status_code == 400
+
+def test_create_items_batch(client, admin_auth, category_id, sql_statements):
+    items = [
+        {"name": f"Batch item {i}", "description": "bulk", "category_ids": [category_id], "tags": ["bulk", f"bulk-{i % 3}", "bulk"]}
+        for i in range(30)
+    ]
+    items.append({"description": "no name"})
+    items.append({"name": "Unknown category", "category_ids": [999999]})
+
+    sql_statements.clear()
+    response = client.post("/items/batch", json=items, headers=admin_auth["headers"])
+    assert response.status_code == 200, response.text
+    # Set-based : the statements do not depend on the batch size (SQLite
+    # runs the ordered RETURNING insert row by row, with a single statement)
+    assert len(set(sql_statements)) < 15
+
+    body = response.json()
+    assert body["created"] == 30
+    assert body["failed"] == 2
+    assert "name" in body["results"][30]["error"]
+    assert body["results"][31]["error"] == "Some categories don't exist"
+
+    item_id = body["results"][4]["id"]
+    item = client.get(f"/items/{item_id}").json()
+    assert sorted(tag["name"] for tag in item["tags"]) == ["bulk", "bulk-1"]
+    assert [category["id"] for category in item["categories"]] == [category_id]
+    assert item["count_rating"] == 0
+
+    # Indexed like items created one by one
+    response = client.get("/items", params={"all_tags": ["bulk", "bulk-1"], "limit": 100})
+    assert len(response.json()["items"]) == 10
+    response = client.get("/items/search", params={"q": "batch item"})
+    assert item_id in [found["id"] for found in response.json()["items"]]
@@ -0,0 +1,87 @@
+import random
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.application.schemas.item_dto import ItemCreateDTO
+from app.application.schemas.rating_dto import RatingCreateDTO, RatingUpdateDTO
+from app.config import settings
+from app.domain.base import Base
+from app.domain.category import Category
+from app.domain.category_top_item import ALL_CATEGORIES
+from app.domain.item_category import item_category
+from app.domain.rating import Rating
+from app.domain.user import User
+from app.infrastructure.repositories.item_repository import ItemRepository
+from app.infrastructure.repositories.leaderboard_repository import LeaderboardRepository
+from app.infrastructure.repositories.rating_repository import RatingRepository
+
+@pytest.fixture
+def db(monkeypatch):
+    # Own database : the random ratings must not leak into the API tests
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    monkeypatch.setattr(settings, "LEADERBOARD_SIZE", 3)
+    monkeypatch.setattr(settings, "LEADERBOARD_PRIOR_MEAN", 3.0)
+    monkeypatch.setattr(settings, "LEADERBOARD_PRIOR_WEIGHT", 2.0)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+def expected_board(db, category_id):
+    """Brute force ranking computed from the ratings table"""
+    ratings = db.execute(select(Rating.item_id, Rating.value)).all()
+    if category_id != ALL_CATEGORIES:
+        members = set(db.scalars(select(item_category.c.item_id).where(item_category.c.category_id == category_id)))
+        ratings = [r for r in ratings if r.item_id in members]
+    totals = {}
+    for item_id, value in ratings:
+        rating_sum, rating_count = totals.get(item_id, (0.0, 0))
+        totals[item_id] = (rating_sum + value, rating_count + 1)
+    ranked = sorted(
+        ((LeaderboardRepository.score(*totals[item_id]), item_id) for item_id in totals),
+        key=lambda entry: (-entry[0], entry[1])
+    )
+    return [item_id for _, item_id in ranked[:settings.LEADERBOARD_SIZE]]
+
+def test_leaderboards_follow_rating_writes(db):
+    rng = random.Random(7)
+    categories = [Category(name="Books"), Category(name="Music")]
+    users = [User(name=f"u{i}", email=f"u{i}@example.com", hashed_password="x") for i in range(4)]
+    db.add_all(categories + users)
+    db.commit()
+
+    items = ItemRepository(db)
+    item_ids = []
+    for i in range(8):
+        item = items.create(ItemCreateDTO(name=f"Item {i}"))
+        items.set_categories(item, [categories[i % 2].id])
+        item_ids.append(item.id)
+
+    ratings = RatingRepository(db)
+    board_ids = [ALL_CATEGORIES] + [c.id for c in categories]
+    for _ in range(150):
+        existing = db.scalars(select(Rating)).all()
+        op = rng.random()
+        if op < 0.5 or not existing:
+            user, item_id = rng.choice(users), rng.choice(item_ids)
+            if not ratings.get_by_user_and_item(user.id, item_id):
+                ratings.create(RatingCreateDTO(user_id=user.id, item_id=item_id, value=rng.randint(0, 5)))
+        elif op < 0.75:
+            ratings.update(rng.choice(existing).id, RatingUpdateDTO(value=rng.randint(0, 5)))
+        elif op < 0.95:
+            ratings.delete(rng.choice(existing).id)
+        else:
+            item = items.get_by_id(rng.choice(item_ids))
+            items.set_categories(item, [rng.choice(categories).id])
+
+        leaderboard = LeaderboardRepository(db)
+        for board in board_ids:
+            assert [item_id for item_id, _ in leaderboard.top(board, 10)] == expected_board(db, board)
+
+    # Deleting a ranked item lets the next one in
+    ranked = LeaderboardRepository(db).top(ALL_CATEGORIES, 1)[0][0]
+    items.delete(ranked)
+    for board in board_ids:
+        assert [item_id for item_id, _ in LeaderboardRepository(db).top(board, 10)] == expected_board(db, board)
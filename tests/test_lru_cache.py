@@ -0,0 +1,96 @@
+import time
+import fakeredis
+import pytest
+from pydantic import TypeAdapter
+from app.application.schemas.tag_dto import TagDTO
+from app.infrastructure.cache import CacheRegion, InMemoryCacheBackend, LRUTTLCache, RedisCacheBackend
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUTTLCache("test-lru", maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" becomes the least recently used
+    cache.set("c", 3)
+
+    assert "b" not in cache
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.evictions == 1
+
+
+def test_entries_expire_after_ttl():
+    cache = LRUTTLCache("test-ttl", maxsize=10, ttl=0.05)
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    time.sleep(0.06)
+    assert cache.get("a") is None
+    assert cache.hits == 1
+    assert cache.misses == 1
+    assert len(cache) == 0
+
+
+def test_get_item_is_cached_and_invalidated(client, admin_auth):
+    from app.application.services.item_service import item_cache
+
+    response = client.post("/items", json={"name": "Cached Item", "tags": ["cached"]}, headers=admin_auth["headers"])
+    assert response.status_code == 201, response.text
+    item_id = response.json()["id"]
+
+    assert client.get(f"/items/{item_id}").status_code == 200
+    hits = item_cache.hits
+    assert client.get(f"/items/{item_id}").status_code == 200
+    assert item_cache.hits == hits + 1
+
+    # Changing the tags invalidates the entry
+    response = client.put(f"/items/{item_id}/tags", json=["recached"])
+    assert response.status_code == 204, response.text
+    misses = item_cache.misses
+    assert [t["name"] for t in client.get(f"/items/{item_id}").json()["tags"]] == ["recached"]
+    assert item_cache.misses == misses + 1
+
+
+def test_warm_cache_loads_most_rated_items(test_db):
+    from app.application.services.item_service import ItemService, item_cache
+
+    # Start from an empty backend
+    previous, item_cache._backend = item_cache._backend, InMemoryCacheBackend()
+    try:
+        backend = item_cache._backend
+        misses = item_cache.misses
+        loaded = ItemService(test_db).warm_cache(5)
+        assert item_cache.misses == misses + loaded
+        # Counted once, by the region
+        assert backend.entries.misses == 0
+    finally:
+        item_cache._backend = previous
+
+
+def test_versioned_region_reloads_after_invalidation():
+    region = CacheRegion("test-tags", 60, TypeAdapter(TagDTO), backend=InMemoryCacheBackend())
+    loads = []
+
+    def loader():
+        loads.append(1)
+        return TagDTO(id=1, name=f"tag v{len(loads)}")
+
+    assert region.get_or_load(1, loader).name == "tag v1"
+    assert region.get_or_load(1, loader).name == "tag v1"
+    region.invalidate([1])
+    assert region.get_or_load(1, loader).name == "tag v2"
+    assert len(loads) == 2
+
+
+def test_redis_backend_invalidates_across_workers():
+    server = fakeredis.FakeServer()
+    # Two workers : separate clients and regions, one Redis compatible server
+    worker_a = CacheRegion("test-shared", 60, TypeAdapter(TagDTO), RedisCacheBackend(client=fakeredis.FakeRedis(server=server)))
+    worker_b = CacheRegion("test-shared", 60, TypeAdapter(TagDTO), RedisCacheBackend(client=fakeredis.FakeRedis(server=server)))
+
+    assert worker_a.get_or_load(7, lambda: TagDTO(id=7, name="shared")).name == "shared"
+    # Served from Redis : the loader of worker B is never called
+    assert worker_b.get_or_load(7, lambda: pytest.fail("should be cached")).name == "shared"
+
+    worker_a.invalidate([7])
+    assert worker_b.get_or_load(7, lambda: TagDTO(id=7, name="renamed")).name == "renamed"
+    assert worker_a.get_or_load(7, lambda: pytest.fail("should be cached")).name == "renamed"
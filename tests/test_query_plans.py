@@ -0,0 +1,95 @@
+import re
+from datetime import date, datetime
+import pytest
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.domain.base import Base
+from app.domain.distinct_sketch import ACTIVE_USERS, ITEM_RATERS
+from app.domain.item import Item
+from app.domain.rating import Rating
+from app.domain.user import User
+from app.infrastructure.repositories.distinct_count_repository import DistinctCountRepository
+from app.infrastructure.repositories.item_rating_stats_repository import ItemRatingStatsRepository
+from app.infrastructure.repositories.rating_repository import RatingRepository
+from app.infrastructure.repositories.rating_rollup_repository import RatingRollupRepository
+from app.infrastructure.repositories.user_repository import UserRepository
+
+# A table read from end to end, without any index
+FULL_SCAN = re.compile(r"^SCAN (\w+)$")
+# Work queues, consumed whole on purpose
+QUEUES = {"rollup_dirty_hours"}
+
+# Hot queries, by repository : none of them may scan a whole table
+HOT_QUERIES = {
+    "ratings of an item": lambda db: RatingRepository(db).list_page(50, item_id=3),
+    "ratings of a user": lambda db: RatingRepository(db).list_page(50, user_id=3),
+    "rating of a user for an item": lambda db: RatingRepository(db).get_by_user_and_item(3, 3),
+    "recent ratings": lambda db: RatingRepository(db).get_recent_ratings(10),
+    "page of ratings": lambda db: RatingRepository(db).list_page(50, (datetime(2100, 1, 1), 1)),
+    "page of item ratings": lambda db: RatingRepository(db).list_page(50, item_id=3, min_value=2, max_value=4),
+    "page of commented item ratings": lambda db: RatingRepository(db).list_page(50, item_id=3, has_comment=True),
+    "page of user ratings": lambda db: RatingRepository(db).list_page(50, user_id=3, min_value=2),
+    "item summary": lambda db: (ItemRatingStatsRepository(db).summary(3), ItemRatingStatsRepository(db).histogram(3)),
+    "items rated by a user": lambda db: UserRepository(db).rated_item_ids(3),
+    "user growth": lambda db: UserRepository(db).get_user_growth(30),
+    "user engagement": lambda db: RatingRollupRepository(db).get_user_engagement(10, "day", datetime(2026, 1, 1)),
+    "rating distribution": lambda db: RatingRollupRepository(db).get_rating_distribution("hour", datetime(2026, 1, 1)),
+    "rating stats": lambda db: RatingRollupRepository(db).get_rating_stats("day", datetime(2026, 1, 1), datetime(2026, 2, 1)),
+    "rollup of the changed ratings": lambda db: RatingRollupRepository(db).roll_up(datetime(2100, 1, 1)),
+    "user stats": lambda db: UserRepository(db).get_user_stats(),
+    "active users": lambda db: DistinctCountRepository(db).estimate(ACTIVE_USERS, 0, date(2026, 1, 1)),
+    "item raters": lambda db: DistinctCountRepository(db).estimate(ITEM_RATERS, 3, date(2026, 1, 1)),
+    "exact item raters": lambda db: DistinctCountRepository(db).exact_item_raters(3, date(2026, 1, 1)),
+}
+
+@pytest.fixture(scope="module")
+def db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.execute(insert(User), [{"name": f"User {i}", "email": f"user{i}@example.com", "hashed_password": "x"} for i in range(50)])
+    session.execute(insert(Item), [{"name": f"Item {i}"} for i in range(20)])
+    session.execute(insert(Rating), [
+        {"user_id": user_id, "item_id": item_id, "value": 3} for user_id in range(1, 51) for item_id in range(1, 11)
+    ])
+    session.commit()
+    yield session
+    session.close()
+    engine.dispose()
+
+def query_plan(db, run):
+    """EXPLAIN QUERY PLAN of every statement run issues, one line per plan step"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    engine = db.get_bind()
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        run(db)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    with engine.connect() as connection:
+        return [
+            row.detail
+            for statement, parameters in statements
+            for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+        ]
+
+@pytest.mark.parametrize("name", sorted(HOT_QUERIES))
+def test_hot_query_uses_indexes(db, name):
+    plan = query_plan(db, HOT_QUERIES[name])
+    assert plan
+    # Subqueries (SCAN anon_1) are scanned once materialized, only tables matter
+    scans = [
+        step for step in plan
+        if (scan := FULL_SCAN.match(step)) and scan.group(1) in Base.metadata.tables and scan.group(1) not in QUEUES
+    ]
+    assert not scans, f"{name} scans a whole table: {plan}"
+
+@pytest.mark.parametrize("name", ["recent ratings", "page of ratings", "page of item ratings", "page of user ratings"])
+def test_ratings_read_in_index_order(db, name):
+    plan = query_plan(db, HOT_QUERIES[name])
+    assert not any("TEMP B-TREE FOR ORDER BY" in step for step in plan), plan
@@ -0,0 +1,71 @@
+import asyncio
+import pytest
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.application import rating_buffer
+from app.application.rating_buffer import RatingBuffer
+from app.application.schemas.rating_dto import RatingCreateDTO
+from app.domain.base import Base
+from app.domain.item import Item
+from app.domain.item_rating_stats import ItemRatingStats
+from app.domain.rating import Rating
+from app.domain.user import User
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine)
+    with factory() as session:
+        session.add_all([User(id=i, name=f"User {i}", email=f"user{i}@example.com", hashed_password="x") for i in range(1, 6)])
+        session.add_all([Item(id=1, name="Item 1"), ItemRatingStats(item_id=1, rating_sum=0.0, rating_count=0)])
+        session.commit()
+    yield factory
+    engine.dispose()
+
+def test_offer_applies_backpressure():
+    buffer = RatingBuffer(capacity=2)
+    assert buffer.offer(RatingCreateDTO(user_id=1, item_id=1, value=3))
+    assert buffer.offer(RatingCreateDTO(user_id=2, item_id=1, value=3))
+    assert not buffer.offer(RatingCreateDTO(user_id=3, item_id=1, value=3))
+    assert buffer.depth == 2
+
+def test_shutdown_drains_the_buffer(session_factory):
+    buffer = RatingBuffer(capacity=10)
+
+    async def serve():
+        buffer.start(session_factory)
+        for user_id in range(1, 6):
+            assert buffer.offer(RatingCreateDTO(user_id=user_id, item_id=1, value=user_id))
+        # Rejected when flushed, not when offered
+        assert buffer.offer(RatingCreateDTO(user_id=1, item_id=1, value=5))
+        await buffer.stop()
+
+    asyncio.run(serve())
+    assert buffer.depth == 0
+    with session_factory() as session:
+        assert session.scalar(select(func.count()).select_from(Rating)) == 5
+        stats = session.get(ItemRatingStats, 1)
+        assert (stats.rating_count, stats.rating_sum) == (5, 15)
+
+def test_failing_rating_does_not_stall_the_buffer(session_factory, monkeypatch):
+    ingest_ratings = rating_buffer.RatingService.ingest_ratings
+
+    def ingest_but_user_3(self, payloads):
+        if any(payload["user_id"] == 3 for payload in payloads):
+            raise RuntimeError("cannot write this row")
+        return ingest_ratings(self, payloads)
+
+    monkeypatch.setattr(rating_buffer.RatingService, "ingest_ratings", ingest_but_user_3)
+    buffer = RatingBuffer(capacity=10)
+    for user_id in range(1, 6):
+        assert buffer.offer(RatingCreateDTO(user_id=user_id, item_id=1, value=user_id))
+    dropped = REGISTRY.get_sample_value("rating_buffer_dropped_total")
+    with session_factory() as session:
+        buffer._drain(session)
+        # Retried one by one : only the failing rating is dropped
+        assert buffer.depth == 0
+        assert sorted(session.scalars(select(Rating.user_id))) == [1, 2, 4, 5]
+    assert REGISTRY.get_sample_value("rating_buffer_dropped_total") == dropped + 1
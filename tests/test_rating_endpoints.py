@@ -119,4 +119,377 @@ def test_delete_rating(client, user_auth, create_item):
 
     # Verify the rating was deleted
     response = client.get(f"/ratings/{rating_id}", headers=user_auth["headers"])
-    assert response.status_code == 404
\ No newline at end of file
+    assert response.status_code == 404
+
+
+def test_item_stats_follow_rating_writes(client, user_auth, admin_auth, create_item):
+    response = client.get("/auth/me", headers=user_auth["headers"])
+    user_id = response.json()["id"]
+
+    rating_payload = {"item_id": create_item, "user_id": user_id, "value": 2}
+    response = client.post("/ratings", json=rating_payload, headers=user_auth["headers"])
+    assert response.status_code == 201, response.text
+    rating_id = response.json()["id"]
+
+    item = client.get(f"/items/{create_item}").json()
+    assert item["count_rating"] == 1
+    assert item["avg_rating"] == 2
+
+    response = client.put(f"/ratings/{rating_id}", json={"value": 4.5}, headers=user_auth["headers"])
+    assert response.status_code == 200, response.text
+    item = client.get(f"/items/{create_item}").json()
+    assert item["count_rating"] == 1
+    assert item["avg_rating"] == 4.5
+
+    response = client.delete(f"/ratings/{rating_id}", headers=user_auth["headers"])
+    assert response.status_code == 204, response.text
+    item = client.get(f"/items/{create_item}").json()
+    assert item["count_rating"] == 0
+    assert item["avg_rating"] == 0
+
+def test_rating_insert_conflict_and_upsert(client, user_auth, create_item, sql_statements):
+    user_id = client.get("/auth/me", headers=user_auth["headers"]).json()["id"]
+    rating_payload = {"item_id": create_item, "user_id": user_id, "value": 3, "comment": "ok"}
+
+    sql_statements.clear()
+    response = client.post("/ratings", json=rating_payload, headers=user_auth["headers"])
+    assert response.status_code == 201, response.text
+    # Neither a lookup before the insert nor a reload after the commit
+    assert not any(s.lstrip().upper().startswith("SELECT") and "FROM ratings" in s for s in sql_statements)
+    rating_id = response.json()["id"]
+
+    response = client.post("/ratings", json=rating_payload, headers=user_auth["headers"])
+    assert response.status_code == 409, response.text
+
+    overwrite = {**rating_payload, "value": 5, "comment": None}
+    response = client.post("/ratings", params={"upsert": True}, json=overwrite, headers=user_auth["headers"])
+    assert response.status_code == 200, response.text
+    assert response.json()["id"] == rating_id
+    assert response.json()["value"] == 5
+    assert response.json()["comment"] is None
+
+    item = client.get(f"/items/{create_item}").json()
+    assert item["count_rating"] == 1
+    assert item["avg_rating"] == 5
+
+def test_ingest_ratings_batch(client, user_auth, admin_auth, create_item, monkeypatch):
+    from app.application.services.rating_service import settings
+    monkeypatch.setattr(settings, "RATING_BATCH_CHUNK_SIZE", 1)
+    user_id = client.get("/auth/me", headers=user_auth["headers"]).json()["id"]
+    admin_id = client.get("/auth/me", headers=admin_auth["headers"]).json()["id"]
+    response = client.post(
+        "/ratings", json={"item_id": create_item, "user_id": user_id, "value": 1}, headers=user_auth["headers"]
+    )
+    assert response.status_code == 201, response.text
+
+    rows = [
+        {"item_id": create_item, "user_id": admin_id, "value": 4, "comment": "imported"},
+        {"item_id": create_item, "user_id": user_id, "value": 5},
+        {"item_id": create_item, "user_id": admin_id, "value": 2},
+        {"item_id": 999999, "user_id": admin_id, "value": 2},
+        {"item_id": create_item, "user_id": 999999, "value": 2},
+        {"item_id": create_item, "user_id": admin_id, "value": 7},
+    ]
+    response = client.post("/ratings/batch", json=rows, headers=user_auth["headers"])
+    assert response.status_code == 403, response.text
+    response = client.post("/ratings/batch", json=rows, headers=admin_auth["headers"])
+    assert response.status_code == 200, response.text
+
+    body = response.json()
+    assert (body["created"], body["failed"]) == (1, 5)
+    assert [result["created"] for result in body["results"]] == [True, False, False, False, False, False]
+    assert "already rated" in body["results"][1]["error"]
+    assert "already rated" in body["results"][2]["error"]
+    assert body["results"][3]["error"] == "Item not found"
+    assert body["results"][4]["error"] == "User not found"
+    assert body["results"][5]["error"].startswith("value:")
+
+    item = client.get(f"/items/{create_item}").json()
+    assert item["count_rating"] == 2
+    assert item["avg_rating"] == 2.5
+
+
+def test_ingest_retries_pairs_taken_during_copy(client, user_auth, admin_auth, create_item, monkeypatch):
+    import sqlite3
+    from app.infrastructure.repositories.rating_repository import RatingRepository
+    user_id = client.get("/auth/me", headers=user_auth["headers"]).json()["id"]
+    admin_id = client.get("/auth/me", headers=admin_auth["headers"]).json()["id"]
+    response = client.post(
+        "/ratings", json={"item_id": create_item, "user_id": user_id, "value": 1}, headers=user_auth["headers"]
+    )
+    assert response.status_code == 201, response.text
+
+    class ConflictingCursor:
+        """A COPY that meets a pair rated by another request : the driver's own error"""
+        def copy_expert(self, statement, buffer):
+            raise sqlite3.IntegrityError("duplicate key value violates unique constraint")
+
+        def close(self):
+            pass
+
+    # The duplicate check runs before the other request commits, the first COPY after
+    cursors = iter([ConflictingCursor()])
+    monkeypatch.setattr(RatingRepository, "_copy_cursor", lambda self: next(cursors, None))
+    existing_pairs = RatingRepository.existing_pairs
+    checks = []
+
+    def late_existing_pairs(self, pairs):
+        checks.append(1)
+        return existing_pairs(self, pairs) if len(checks) > 1 else set()
+
+    monkeypatch.setattr(RatingRepository, "existing_pairs", late_existing_pairs)
+    rows = [
+        {"item_id": create_item, "user_id": admin_id, "value": 4},
+        {"item_id": create_item, "user_id": user_id, "value": 5},
+    ]
+    response = client.post("/ratings/batch", json=rows, headers=admin_auth["headers"])
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert (body["created"], body["failed"]) == (1, 1)
+    assert "already rated" in body["results"][1]["error"]
+
+
+def test_list_ratings_pages(client, user_auth, admin_auth, create_item):
+    user_id = client.get("/auth/me", headers=user_auth["headers"]).json()["id"]
+    admin_id = client.get("/auth/me", headers=admin_auth["headers"]).json()["id"]
+    rows = [
+        {"item_id": create_item, "user_id": user_id, "value": 2},
+        {"item_id": create_item, "user_id": admin_id, "value": 4.5, "comment": "Paged"},
+    ]
+    response = client.post("/ratings/batch", json=rows, headers=admin_auth["headers"])
+    assert response.json()["created"] == 2, response.text
+
+    # Walking the pages returns every rating once, most recent first
+    seen, after = [], None
+    while True:
+        params = {"limit": 2, **({"after": after} if after else {})}
+        response = client.get("/ratings", params=params, headers=admin_auth["headers"])
+        assert response.status_code == 200, response.text
+        page = response.json()
+        assert len(page["items"]) <= 2
+        seen.extend(page["items"])
+        after = page["next_cursor"]
+        if after is None:
+            break
+    keys = [(rating["created_at"], rating["id"]) for rating in seen]
+    assert keys == sorted(keys, reverse=True) and len(set(keys)) == len(keys)
+
+    response = client.get(f"/items/{create_item}/ratings", params={"limit": 1}, headers=user_auth["headers"])
+    page = response.json()
+    assert len(page["items"]) == 1 and page["next_cursor"]
+    filtered = client.get(
+        f"/items/{create_item}/ratings", params={"min_value": 4, "has_comment": True}, headers=user_auth["headers"]
+    ).json()
+    assert [rating["comment"] for rating in filtered["items"]] == ["Paged"]
+    assert filtered["next_cursor"] is None
+
+    response = client.get("/ratings", params={"after": "not-a-cursor"}, headers=admin_auth["headers"])
+    assert response.status_code == 400, response.text
+    response = client.get("/ratings", params={"limit": 10000}, headers=admin_auth["headers"])
+    assert response.status_code == 422, response.text
+
+def test_item_summary(client, test_db, user_auth, admin_auth, create_item):
+    from app.infrastructure.repositories.item_rating_stats_repository import ItemRatingStatsRepository
+    user_id = client.get("/auth/me", headers=user_auth["headers"]).json()["id"]
+    admin_id = client.get("/auth/me", headers=admin_auth["headers"]).json()["id"]
+    response = client.get(f"/items/{create_item}/summary")
+    assert response.status_code == 200, response.text
+    empty = response.json()
+    assert (empty["count"], empty["mean"], empty["last_rated_at"]) == (0, 0.0, None)
+    assert [bucket["value"] for bucket in empty["histogram"]] == [i / 2 for i in range(11)]
+
+    response = client.post(
+        "/ratings", json={"item_id": create_item, "user_id": user_id, "value": 3.7}, headers=user_auth["headers"]
+    )
+    rating_id = response.json()["id"]
+    client.post("/ratings/batch", json=[{"item_id": create_item, "user_id": admin_id, "value": 5}], headers=admin_auth["headers"])
+    response = client.get(f"/items/{create_item}/summary")
+    summary = response.json()
+    assert summary["count"] == 2 and summary["mean"] == pytest.approx(4.35)
+    assert {bucket["value"]: bucket["count"] for bucket in summary["histogram"] if bucket["count"]} == {3.5: 1, 5.0: 1}
+    assert summary["last_rated_at"]
+    assert client.get(f"/items/{create_item}/summary", headers={"If-None-Match": response.headers["ETag"]}).status_code == 304
+
+    response = client.put(f"/ratings/{rating_id}", json={"value": 1}, headers=user_auth["headers"])
+    assert response.status_code == 200, response.text
+    histogram = client.get(f"/items/{create_item}/summary").json()["histogram"]
+    assert {bucket["value"]: bucket["count"] for bucket in histogram if bucket["count"]} == {1.0: 1, 5.0: 1}
+    assert client.delete(f"/ratings/{rating_id}", headers=user_auth["headers"]).status_code == 204
+    summary = client.get(f"/items/{create_item}/summary").json()
+    assert summary["count"] == 1 and [bucket["count"] for bucket in summary["histogram"]] == [0] * 10 + [1]
+
+    # The incrementally maintained histogram matches a full rebuild
+    stats = ItemRatingStatsRepository(test_db)
+    maintained = stats.histogram(create_item)
+    stats.rebuild_histograms()
+    assert stats.histogram(create_item) == maintained
+    test_db.rollback()
+
+    assert client.get("/items/999999/summary").status_code == 404
+
+def test_rating_analytics_from_rollups(client, test_db, user_auth, admin_auth, create_item):
+    from sqlalchemy import func, select
+    from app.application.rating_rollup import roll_up_ratings
+    from app.domain.rating import Rating
+    user_id = client.get("/auth/me", headers=user_auth["headers"]).json()["id"]
+    client.post("/ratings", json={"item_id": create_item, "user_id": user_id, "value": 5}, headers=user_auth["headers"])
+
+    roll_up_ratings(test_db)
+    total = test_db.scalar(select(func.count()).select_from(Rating))
+    for granularity in ("hour", "day"):
+        params = {"granularity": granularity, "refresh": True}
+        response = client.get("/ratings/stats", params=params, headers=admin_auth["headers"])
+        assert response.status_code == 200, response.text
+        assert response.json()["totalCount"] == total
+    response = client.get("/ratings/distribution", params={"from": "2000-01-01T00:00:00Z"}, headers=admin_auth["headers"])
+    assert sum(bucket["count"] for bucket in response.json()) <= total
+    response = client.get("/users/engagement", params={"to": "2000-01-01T00:00:00Z"}, headers=admin_auth["headers"])
+    assert response.status_code == 200 and response.json() == []
+
+    period = {"from": "2026-01-02T00:00:00", "to": "2026-01-01T00:00:00"}
+    assert client.get("/ratings/stats", params=period, headers=admin_auth["headers"]).status_code == 400
+    assert client.get("/ratings/stats", params={"granularity": "week"}, headers=admin_auth["headers"]).status_code == 422
+
+def test_dashboard_snapshots(client, user_auth, admin_auth, create_item):
+    assert client.get("/users/stats", headers=user_auth["headers"]).status_code == 403
+    response = client.get("/users/stats", params={"refresh": True}, headers=admin_auth["headers"])
+    assert response.status_code == 200, response.text
+    assert response.headers["Age"] == "0"
+    total_users = response.json()["total_users"]
+
+    # Served from memory until refreshed
+    client.post("/auth/register", json={"name": "Snapshot", "email": "snapshot@example.com", "password": "password123"})
+    assert client.get("/users/stats", headers=admin_auth["headers"]).json()["total_users"] == total_users
+    response = client.get("/users/stats", params={"refresh": True}, headers=admin_auth["headers"])
+    assert response.json()["total_users"] == total_users + 1
+
+    for path in ("/ratings/stats", "/ratings/distribution"):
+        response = client.get(path, headers=admin_auth["headers"])
+        assert response.status_code == 200, response.text
+        assert "Age" in response.headers
+
+def test_distinct_counts(client, user_auth, admin_auth, create_item):
+    user_id = client.get("/auth/me", headers=user_auth["headers"]).json()["id"]
+    admin_id = client.get("/auth/me", headers=admin_auth["headers"]).json()["id"]
+    client.post("/ratings", json={"item_id": create_item, "user_id": user_id, "value": 4}, headers=user_auth["headers"])
+    client.post("/ratings/batch", json=[{"item_id": create_item, "user_id": admin_id, "value": 2}], headers=admin_auth["headers"])
+
+    for exact in (False, True):
+        response = client.get(f"/items/{create_item}/raters", params={"exact": exact})
+        assert response.status_code == 200, response.text
+        raters = response.json()
+        assert raters["exact"] is exact and (raters["relative_error"] > 0) is not exact
+        assert [(window["days"], window["count"]) for window in raters["windows"]] == [(1, 2), (7, 2), (30, 2), (90, 2)]
+    assert client.get("/items/999999/raters").status_code == 404
+
+    assert client.get("/users/active", headers=user_auth["headers"]).status_code == 403
+    estimated, exact = (
+        client.get("/users/active", params={"exact": exact}, headers=admin_auth["headers"]).json()["windows"]
+        for exact in (False, True)
+    )
+    assert [window["days"] for window in estimated] == [1, 7, 30, 90]
+    assert all(window["count"] >= 2 for window in estimated + exact)
+
+def test_write_behind_rating(client, test_db, user_auth, create_item, monkeypatch):
+    from app.api.endpoints.rating_endpoints import settings
+    from app.application.rating_buffer import rating_buffer
+    monkeypatch.setattr(settings, "RATING_WRITE_BEHIND", True)
+    user_id = client.get("/auth/me", headers=user_auth["headers"]).json()["id"]
+    rating_payload = {"item_id": create_item, "user_id": user_id, "value": 4}
+
+    response = client.post("/ratings", json=rating_payload, headers=user_auth["headers"])
+    assert response.status_code == 202, response.text
+    assert client.get(f"/items/{create_item}").json()["count_rating"] == 0
+
+    monkeypatch.setattr(settings, "RATING_BUFFER_SIZE", 1)
+    response = client.post("/ratings", json=rating_payload, headers=user_auth["headers"])
+    assert response.status_code == 503, response.text
+
+    assert rating_buffer.flush(test_db) == 1
+    assert client.get(f"/items/{create_item}").json()["count_rating"] == 1
+
+def test_item_stats_rebuild_fixes_drift(test_db, create_item):
+    from app.domain.item_rating_stats import ItemRatingStats
+    from app.infrastructure.repositories.item_rating_stats_repository import ItemRatingStatsRepository
+
+    stats = test_db.get(ItemRatingStats, create_item)
+    stats.rating_count = 42
+    test_db.commit()
+
+    repository = ItemRatingStatsRepository(test_db)
+    assert create_item in repository.find_drift()
+    assert repository.rebuild() >= 1
+    test_db.commit()
+    assert repository.find_drift() == []
+    test_db.expire_all()
+    assert test_db.get(ItemRatingStats, create_item).rating_count == 0
+
+def test_top_items_leaderboard(client, user_auth, create_category, create_item):
+    response = client.get("/auth/me", headers=user_auth["headers"])
+    user_id = response.json()["id"]
+
+    response = client.get("/items/top", params={"category_id": create_category})
+    assert response.status_code == 200, response.text
+    assert response.json() == []
+
+    rating_payload = {"item_id": create_item, "user_id": user_id, "value": 5}
+    response = client.post("/ratings", json=rating_payload, headers=user_auth["headers"])
+    assert response.status_code == 201, response.text
+
+    response = client.get("/items/top", params={"category_id": create_category})
+    assert response.status_code == 200, response.text
+    top = response.json()
+    assert [item["id"] for item in top] == [create_item]
+    # One rating barely moves the score away from the prior
+    assert 3.0 < top[0]["score"] < 5.0
+    assert top[0]["count_rating"] == 1
+
+    response = client.get("/items/top", params={"limit": 100})
+    assert create_item in [item["id"] for item in response.json()]
+
+def test_export_ratings_streams_ndjson_and_csv(client, user_auth, admin_auth, create_item, monkeypatch):
+    import csv
+    import io
+    import json
+    # conftest swaps app.config.settings : patch the object the service reads
+    from app.application.services.export_service import settings
+
+    response = client.get("/auth/me", headers=user_auth["headers"])
+    user_id = response.json()["id"]
+    rating_payload = {"item_id": create_item, "user_id": user_id, "value": 4, "comment": "line one, with a comma"}
+    response = client.post("/ratings", json=rating_payload, headers=user_auth["headers"])
+    assert response.status_code == 201, response.text
+    rating_id = response.json()["id"]
+
+    # One row per round trip : the stream spans several batches
+    monkeypatch.setattr(settings, "EXPORT_BATCH_SIZE", 1)
+    response = client.get("/ratings/export", headers=admin_auth["headers"])
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert len(rows) > 1
+    assert [row["id"] for row in rows] == sorted(row["id"] for row in rows)
+
+    response = client.get("/ratings/export", params={"item_id": create_item}, headers=admin_auth["headers"])
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["id"] for row in rows] == [rating_id]
+    assert rows[0]["comment"] == "line one, with a comma"
+
+    response = client.get("/ratings/export", params={"format": "csv", "user_id": user_id, "item_id": create_item}, headers=admin_auth["headers"])
+    assert response.headers["content-type"].startswith("text/csv")
+    records = list(csv.DictReader(io.StringIO(response.text)))
+    assert [int(r["id"]) for r in records] == [rating_id]
+    assert float(records[0]["value"]) == 4
+
+    response = client.get("/ratings/export", params={"since": "2999-01-01T00:00:00"}, headers=admin_auth["headers"])
+    assert response.text == ""
+
+    assert client.get("/ratings/export", headers=user_auth["headers"]).status_code == 403
+
+def test_export_items(client, admin_auth, create_category, create_item):
+    import json
+    response = client.get("/items/export", params={"category_id": create_category}, headers=admin_auth["headers"])
+    assert response.status_code == 200, response.text
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["id"] for row in rows] == [create_item]
+    assert set(rows[0]) == {"id", "name", "description", "image_url", "created_at", "updated_at", "avg_rating", "count_rating"}
@@ -0,0 +1,99 @@
+from datetime import datetime
+import pytest
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.domain.base import Base
+from app.domain.category import Category
+from app.domain.item import Item
+from app.domain.item_category import item_category
+from app.domain.rating import Rating
+from app.domain.rating_rollup import RatingRollup, UserRatingRollup
+from app.domain.user import User
+from app.application.schemas.rating_dto import RatingUpdateDTO
+from app.infrastructure.repositories.rating_repository import RatingRepository
+from app.infrastructure.repositories.rating_rollup_repository import RatingRollupRepository
+from app.infrastructure.repositories.user_repository import UserRepository
+
+JAN_1, JAN_2 = datetime(2026, 1, 1, 10, 15), datetime(2026, 1, 2, 8, 40)
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.execute(insert(User), [{"id": i, "name": f"User {i}", "email": f"user{i}@example.com", "hashed_password": "x"} for i in (1, 2, 3)])
+    session.execute(insert(Item), [{"id": 1, "name": "Item 1"}, {"id": 2, "name": "Item 2"}])
+    session.execute(insert(Category), [{"id": 1, "name": "Books"}, {"id": 2, "name": "Games"}])
+    session.execute(insert(item_category), [{"item_id": 1, "category_id": 1}, {"item_id": 2, "category_id": 2}])
+    session.execute(insert(Rating), [
+        {"user_id": 1, "item_id": 1, "value": 4, "created_at": JAN_1, "updated_at": JAN_1},
+        {"user_id": 2, "item_id": 1, "value": 4.5, "created_at": JAN_1, "updated_at": JAN_1},
+        {"user_id": 3, "item_id": 1, "value": 2, "created_at": JAN_2, "updated_at": JAN_2},
+        {"user_id": 1, "item_id": 2, "value": 1, "created_at": JAN_2, "updated_at": JAN_2},
+    ])
+    session.commit()
+    yield session
+    session.close()
+    engine.dispose()
+
+def snapshot(db):
+    return (
+        sorted(tuple(row) for row in db.execute(select(RatingRollup.__table__))),
+        sorted(tuple(row) for row in db.execute(select(UserRatingRollup.__table__))),
+    )
+
+def test_analytics_from_rollups(db):
+    rollups = RatingRollupRepository(db)
+    assert rollups.roll_up(datetime(2026, 1, 3)) == 2
+
+    distribution = {d.value: d.count for d in rollups.get_rating_distribution("day")}
+    assert distribution == {1: 1, 2: 1, 3: 0, 4: 1, 5: 1}
+    stats = rollups.get_rating_stats("day")
+    assert (stats.totalCount, stats.average, stats.topCategory.name, stats.topCategory.count) == (4, 2.9, "Books", 3)
+    # Only the hours of January 2nd
+    stats = rollups.get_rating_stats("hour", datetime(2026, 1, 2), datetime(2026, 1, 3))
+    assert (stats.totalCount, stats.average) == (2, 1.5)
+    engagement = rollups.get_user_engagement(1, "day")
+    assert (engagement[0].user_id, engagement[0].ratings_count, str(engagement[0].last_activity)) == (1, 2, "2026-01-02")
+
+def test_roll_up_follows_updates_and_deletions(db):
+    rollups = RatingRollupRepository(db)
+    rollups.roll_up(datetime(2026, 1, 3))
+    assert rollups.roll_up(datetime(2026, 1, 3)) == 0
+
+    # Seen through the dirty hours marked by the repository writes
+    ratings = RatingRepository(db)
+    ratings.update(db.scalar(select(Rating.id).where(Rating.user_id == 3)), RatingUpdateDTO(value=5))
+    ratings.delete(db.scalar(select(Rating.id).where(Rating.user_id == 1, Rating.item_id == 2)))
+    assert rollups.roll_up(datetime(2026, 1, 5)) == 1
+    db.commit()
+
+    stats = rollups.get_rating_stats("day")
+    assert (stats.totalCount, stats.average) == (3, 4.5)
+    incremental = snapshot(db)
+    rollups.rebuild(datetime(2026, 1, 5))
+    assert snapshot(db) == incremental
+
+def test_roll_up_follows_user_deletions(db):
+    rollups = RatingRollupRepository(db)
+    rollups.roll_up(datetime(2026, 1, 3))
+    db.commit()
+
+    # The ratings of the user go with it, on both days
+    assert UserRepository(db).delete(1)
+    assert rollups.roll_up(datetime(2026, 1, 4)) == 2
+    db.commit()
+
+    stats = rollups.get_rating_stats("day")
+    assert (stats.totalCount, stats.average) == (2, 3.2)
+    assert sorted(e.user_id for e in rollups.get_user_engagement(10, "day")) == [2, 3]
+    incremental = snapshot(db)
+    rollups.rebuild(datetime(2026, 1, 4))
+    assert snapshot(db) == incremental
+
+def test_concurrent_run_is_skipped(db):
+    rollups = RatingRollupRepository(db)
+    assert rollups._claim(None, datetime(2026, 1, 3))
+    assert not rollups._claim(None, datetime(2026, 1, 3))
+    assert not rollups._claim(datetime(2026, 1, 1), datetime(2026, 1, 4))
@@ -0,0 +1,88 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import sessionmaker
+from app.api.main import app
+from app.api.security import create_access_token
+from app.domain.base import Base
+from app.domain.item import Item
+from app.domain.item_tag import item_tag
+from app.domain.tag import Tag
+from app.infrastructure import database
+from app.infrastructure.cache import InMemoryCacheBackend
+from app.infrastructure.read_routing import ReadRouter
+from app.infrastructure.tag_index import TagIndex, iter_bits
+
+# Two SQLite files stand in for the primary and its replicas : each holds an
+# item named after it, so a listing tells which one answered
+
+@pytest.fixture
+def engines(tmp_path):
+    engines = {}
+    for name in ("primary", "replica-0", "replica-1"):
+        engine = create_engine(f"sqlite:///{tmp_path / name}.db", connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=engine)
+        with engine.begin() as connection:
+            connection.execute(insert(Item).values(name=name))
+        engines[name] = engine
+    yield engines
+    for engine in engines.values():
+        engine.dispose()
+
+def router(engines, replicas, **options):
+    primary = sessionmaker(autocommit=False, autoflush=False, bind=engines["primary"])
+    return ReadRouter(primary, [engines[name] for name in replicas], backend=InMemoryCacheBackend(), **options)
+
+def answered_by(db):
+    return db.get_bind().url.database.rsplit("/", 1)[-1].removesuffix(".db")
+
+def test_replica_selection(engines):
+    round_robin = router(engines, ["replica-0", "replica-1"])
+    assert [answered_by(round_robin.session()) for _ in range(4)] == ["replica-0", "replica-1"] * 2
+
+    least_busy = router(engines, ["replica-0", "replica-1"], selection="least-busy")
+    with engines["replica-0"].connect():
+        assert {answered_by(least_busy.session()) for _ in range(4)} == {"replica-1"}
+    assert {answered_by(least_busy.session()) for _ in range(4)} == {"replica-0", "replica-1"}
+
+    assert answered_by(router(engines, []).session()) == "primary"
+    with pytest.raises(ValueError):
+        router(engines, ["replica-0"], selection="random")
+
+def test_reads_follow_own_writes(engines, monkeypatch):
+    read_router = router(engines, ["replica-0"], sticky_seconds=60)
+    monkeypatch.setattr(database, "SessionLocal", read_router.session_factory)
+    monkeypatch.setattr(database, "read_router", read_router)
+    client = TestClient(app)
+    writer, reader = (
+        {"Authorization": f"Bearer {create_access_token({'sub': f'{name}@example.com'})}"} for name in ("writer", "reader")
+    )
+
+    def listed(headers):
+        return [item["name"] for item in client.get("/items", headers=headers).json()["items"]]
+
+    assert listed(writer) == ["replica-0"]
+    response = client.post("/categories", json={"name": "Sticky", "description": "Written on the primary"}, headers=writer)
+    assert response.status_code == 201, response.text
+    # The writer now reads the primary, where its write is, the others still the replica
+    assert listed(writer) == ["primary"]
+    assert listed(reader) == ["replica-0"]
+    # Another token of the same user, e.g. after a refresh, follows the same writes
+    refreshed = {"Authorization": f"Bearer {create_access_token({'sub': 'writer@example.com', 'role': 'user'})}"}
+    assert listed(refreshed) == ["primary"]
+    # Invalid credentials fall back to the address, which wrote nothing
+    assert listed({"Authorization": "Bearer forged"}) == ["replica-0"]
+
+def test_tag_index_loads_from_the_primary(engines):
+    read_router = router(engines, ["replica-0"])
+    with read_router.session_factory() as primary:
+        primary.add(Tag(id=1, name="fresh"))
+        primary.flush()
+        primary.execute(insert(item_tag).values(item_id=1, tag_id=1))
+        primary.commit()
+    # The replica lags behind : the tag is not there yet
+    replica = read_router.session()
+    assert answered_by(replica) == "replica-0"
+    assert replica.scalar(select(Tag.id)) is None
+    assert list(iter_bits(TagIndex().query(replica, any_tags=["fresh"]))) == [1]
+    replica.close()
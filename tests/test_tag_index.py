@@ -0,0 +1,67 @@
+import pytest
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.domain.base import Base
+from app.domain.item import Item
+from app.domain.item_tag import item_tag
+from app.domain.tag import Tag
+from app.domain.catalog_version import ITEM_TAGS
+from app.infrastructure.repositories.catalog_version_repository import CatalogVersionRepository
+from app.infrastructure.tag_index import TagIndex, bitmap_of, iter_bits
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.add_all([Item(id=i, name=f"Item {i}") for i in (1, 2, 3, 70)] + [Tag(id=1, name="red"), Tag(id=2, name="big")])
+    session.flush()
+    session.execute(insert(item_tag), [
+        {"item_id": 1, "tag_id": 1}, {"item_id": 2, "tag_id": 1}, {"item_id": 2, "tag_id": 2}, {"item_id": 70, "tag_id": 2},
+    ])
+    session.commit()
+    yield session
+    session.close()
+    engine.dispose()
+
+def test_iter_bits():
+    bitmap = (1 << 3) | (1 << 64) | (1 << 65)
+    assert list(iter_bits(bitmap)) == [3, 64, 65]
+    assert list(iter_bits(bitmap, 3)) == [64, 65]
+    assert list(iter_bits(bitmap, 65)) == []
+    assert bitmap_of([65, 3, 64, 3]) == bitmap
+    assert bitmap_of([]) == 0
+
+def test_tag_queries(db):
+    index = TagIndex()
+    assert list(iter_bits(index.query(db, all_tags=["red", "big"]))) == [2]
+    assert list(iter_bits(index.query(db, any_tags=["red", "big"]))) == [1, 2, 70]
+    assert list(iter_bits(index.query(db, exclude_tags=["red"]))) == [3, 70]
+    assert list(iter_bits(index.query(db, all_tags=["unknown"]))) == []
+
+def test_workers_see_each_other_changes(db, monkeypatch):
+    # No shared cache backend : the catalog version in the database tells the workers apart
+    clock = [1000.0]
+    monkeypatch.setattr("app.infrastructure.tag_index.time.monotonic", lambda: clock[0])
+    writer, reader = TagIndex(reload_interval=1.0), TagIndex(reload_interval=1.0)
+    assert list(iter_bits(reader.query(db, all_tags=["big"]))) == [2, 70]
+    writer.query(db)
+    reloads = []
+    monkeypatch.setattr(reader, "reload", lambda db, reload=reader.reload: reloads.append(1) or reload(db))
+
+    # The writer applies its changes in place, the reader reloads from item_tag
+    for item_id in (1, 3):
+        db.execute(insert(item_tag).values(item_id=item_id, tag_id=2))
+        CatalogVersionRepository(db).bump(ITEM_TAGS)
+        db.commit()
+        writer.set_item_tags(item_id, ["red", "big"] if item_id == 1 else ["big"])
+    assert list(iter_bits(writer.query(db, all_tags=["big"]))) == [1, 2, 3, 70]
+    # Reloads are rate-limited : stale within the interval, then one reload for both writes
+    assert list(iter_bits(reader.query(db, all_tags=["big"]))) == [2, 70]
+    clock[0] += 1.0
+    assert list(iter_bits(reader.query(db, all_tags=["big"]))) == [1, 2, 3, 70]
+    assert len(reloads) == 1
+    clock[0] += 1.0
+    reader.query(db)
+    assert len(reloads) == 1
@@ -92,8 +92,9 @@ def test_list_user_ratings(client, user_auth_headers):
     # Test listing ratings for the current user
     response = client.get(f"/users/{user['id']}/ratings", headers=user_auth_headers)  # Assuming user ID 1
     assert response.status_code == 200, response.text
-    ratings = response.json()
-    assert isinstance(ratings, list)
+    page = response.json()
+    assert isinstance(page["items"], list)
+    assert all(rating["user_id"] == user["id"] for rating in page["items"])
 
 
 def test_get_recommendations(client, user_auth_headers):